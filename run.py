@@ -1,13 +1,23 @@
-if __name__ == '__main__':
-    from scanner.controller import run, logger, scanner_class_dict, t
-
-    ref_dict = {i: j for i, j in enumerate(scanner_class_dict)}
-    try:
-        print(ref_dict)
-        filter_number = int(input(f'Enter number: '))
-        logger.debug(f'Selected filter: {ref_dict[filter_number]}')
-        run(ref_dict[filter_number])
-    except (ValueError, KeyError) as e:
-        logger.exception(e)
-        logger.debug(f'Invalid input, it must be in {list(ref_dict.keys())}')
-        t.sleep(3)
+import sys
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Non interactive use, e.g. python run.py scan candle_breakout --start-date 2022-01-01
+        from scanner.cli import main
+
+        main(sys.argv[1:])
+        sys.exit()
+
+    from scanner.controller import run, logger, scanner_class_dict, t
+
+    ref_dict = {i: j for i, j in enumerate(scanner_class_dict)}
+    try:
+        print(ref_dict)
+        filter_number = int(input(f'Enter number: '))
+        logger.debug(f'Selected filter: {ref_dict[filter_number]}')
+        run_id = input('Enter run id to resume an interrupted run (leave empty to start a new run): ').strip()
+        run(ref_dict[filter_number], run_id=run_id or None)
+    except (ValueError, KeyError) as e:
+        logger.exception(e)
+        logger.debug(f'Invalid input, it must be in {list(ref_dict.keys())}')
+        t.sleep(3)
@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import time as t
+from collections import namedtuple
+from datetime import date
+
+from scanner.settings import logger, ARCHIVE_BUDGET_MB, ARCHIVE_MAX_AGE_DAYS
+from scanner.store import BarStore
+from scanner.timeindex import NS_PER_DAY
+
+Partition = namedtuple('Partition', ['directory', 'name', 'bytes', 'accessed'])
+
+
+class ArchiveManager:
+    # Keeps the bar archive inside a disk budget. Partitions not read for max_age days go first, then the least
+    # recently read ones until the archive fits, their days are fetched again when a scan needs them. Monthly
+    # partitions of past years are compacted into one file per year, and checksums in the catalogs are verified.
+    def __init__(self, store=None, budget=ARCHIVE_BUDGET_MB * 2 ** 20, max_age=ARCHIVE_MAX_AGE_DAYS):
+        self.store = store or BarStore()
+        self.budget = budget
+        self.max_age = max_age
+
+    def get_directories(self):
+        # Directory of every symbol and time frame
+        if not os.path.exists(self.store.root):
+            return
+        for time_frame in sorted(os.scandir(self.store.root), key=lambda entry: entry.name):
+            if not time_frame.is_dir() or time_frame.name == 'splits':
+                continue
+            for symbol in sorted(os.scandir(time_frame.path), key=lambda entry: entry.name):
+                if symbol.is_dir():
+                    yield self.store.root / time_frame.name / symbol.name
+
+    def get_partitions(self):
+        partitions = []
+        for directory in self.get_directories():
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.pickle'):
+                    stat = entry.stat()
+                    partitions.append(Partition(directory, entry.name, stat.st_size, stat.st_atime_ns))
+        return partitions
+
+    def stats(self):
+        # Per time frame: symbols, partitions, bytes, monthly partitions a compaction would join and days since the
+        # least recently read partition was read
+        now = t.time_ns()
+        current_year = str(date.today().year)
+        stats = dict()
+        for partition in self.get_partitions():
+            time_frame = partition.directory.parent.name
+            entry = stats.setdefault(time_frame, {'symbols': set(), 'partitions': 0, 'bytes': 0, 'compactable': 0,
+                                                  'idle_days': 0})
+            entry['symbols'].add(partition.directory.name)
+            entry['partitions'] += 1
+            entry['bytes'] += partition.bytes
+            if len(partition.name) == len('YYYY-MM.pickle') and partition.name[:4] < current_year:
+                entry['compactable'] += 1
+            entry['idle_days'] = max(entry['idle_days'], (now - partition.accessed) / NS_PER_DAY)
+        for entry in stats.values():
+            entry['symbols'] = len(entry['symbols'])
+        return stats
+
+    def evict(self, dry_run=False):
+        # Removes partitions idle for longer than max_age days and then the least recently read ones until the
+        # archive is within the budget, returns (partitions, bytes) removed
+        partitions = sorted(self.get_partitions(), key=lambda partition: partition.accessed)
+        total = sum(partition.bytes for partition in partitions)
+        oldest = t.time_ns() - self.max_age * NS_PER_DAY if self.max_age else None
+        removed, removed_bytes = 0, 0
+        for partition in partitions:
+            too_old = oldest is not None and partition.accessed < oldest
+            if not too_old and (not self.budget or total <= self.budget):
+                break
+            if not dry_run:
+                self.store.remove_partition(partition.directory, partition.name)
+            total -= partition.bytes
+            removed += 1
+            removed_bytes += partition.bytes
+        return removed, removed_bytes
+
+    def compact(self, dry_run=False):
+        # Joins the monthly partitions of every past year, returns the number of years compacted
+        current_year = str(date.today().year)
+        compacted = 0
+        for directory in self.get_directories():
+            years = dict()
+            for entry in os.scandir(directory):
+                if len(entry.name) == len('YYYY-MM.pickle') and entry.name.endswith('.pickle'):
+                    years.setdefault(entry.name[:4], []).append(entry.name)
+            for year, names in sorted(years.items()):
+                # A single month is only worth it when it joins a year compacted before
+                if year >= current_year or (len(names) < 2 and not os.path.exists(directory / f'{year}.pickle')):
+                    continue
+                if not dry_run:
+                    self.store.compact(directory, year)
+                compacted += 1
+        return compacted
+
+    def gc(self, compact=True, dry_run=False):
+        removed, removed_bytes = self.evict(dry_run=dry_run)
+        compacted = self.compact(dry_run=dry_run) if compact else 0
+        logger.debug(f'Archive gc{" (dry run)" if dry_run else ""}: {removed} partitions '
+                     f'({removed_bytes / 2 ** 20:.1f} MB) evicted, {compacted} years compacted')
+        return removed, removed_bytes, compacted
+
+    def verify(self, repair=False):
+        # Checks every partition against the checksum in its catalog. Partitions without one (archived before the
+        # catalog) are checked to load. With repair, broken partitions are removed so they are fetched again,
+        # catalog entries of missing files are dropped and checksums of partitions that load are recorded.
+        counts = {'ok': 0, 'untracked': 0, 'corrupt': 0, 'missing': 0}
+        for directory in self.get_directories():
+            catalog = self.store.get_catalog(directory)
+            names = {entry.name for entry in os.scandir(directory) if entry.name.endswith('.pickle')}
+            recorded = dict()
+            for name in sorted(names):
+                with open(directory / name, 'rb') as f:
+                    data = f.read()
+                expected = catalog['partitions'].get(name)
+                if expected is not None:
+                    ok = expected == [len(data), hashlib.sha1(data).hexdigest()]
+                    counts['ok' if ok else 'corrupt'] += 1
+                else:
+                    try:
+                        pickle.loads(data)
+                        ok = True
+                        counts['untracked'] += 1
+                        recorded[name] = [len(data), hashlib.sha1(data).hexdigest()]
+                    except Exception:
+                        ok = False
+                        counts['corrupt'] += 1
+                if not ok:
+                    logger.debug(f'Corrupt partition {directory / name}')
+                    if repair:
+                        self.store.remove_partition(directory, name)
+            missing = [name for name in catalog['partitions'] if name not in names]
+            counts['missing'] += len(missing)
+            for name in missing:
+                logger.debug(f'Missing partition {directory / name}')
+            if repair:
+                for name in missing:
+                    self.store.remove_partition(directory, name)
+                if recorded:
+                    catalog = self.store.get_catalog(directory)
+                    catalog['partitions'].update(recorded)
+                    self.store.put_catalog(directory, catalog)
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py cache', description='Size, eviction and checks of the bar archive')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='size of the archive per time frame')
+    sub = subparsers.add_parser('gc', help='evict least recently read partitions and compact past years')
+    sub.add_argument('--budget-mb', type=int, default=ARCHIVE_BUDGET_MB,
+                     help='disk budget, SCANNER_ARCHIVE_BUDGET_MB by default, 0 for none')
+    sub.add_argument('--max-age-days', type=int, default=ARCHIVE_MAX_AGE_DAYS,
+                     help='evict partitions not read for this long, SCANNER_ARCHIVE_MAX_AGE_DAYS by default')
+    sub.add_argument('--no-compact', action='store_true')
+    sub.add_argument('--dry-run', action='store_true', help='only log what would be evicted and compacted')
+    sub = subparsers.add_parser('verify', help='check partitions against their checksums')
+    sub.add_argument('--repair', action='store_true',
+                     help='remove broken partitions so they are fetched again and record missing checksums')
+    args = parser.parse_args(argv)
+
+    if args.command == 'stats':
+        manager = ArchiveManager()
+        stats = manager.stats()
+        print('Time frame     symbols  partitions          MB  compactable  idle days')
+        for time_frame, entry in sorted(stats.items()):
+            print(f'{time_frame:<12}{entry["symbols"]:>10}{entry["partitions"]:>12}{entry["bytes"] / 2 ** 20:>12.1f}'
+                  f'{entry["compactable"]:>13}{entry["idle_days"]:>11.1f}')
+        total = sum(entry['bytes'] for entry in stats.values())
+        budget = f' of {manager.budget / 2 ** 20:.0f} MB budget' if manager.budget else ', no budget'
+        print(f'Total {total / 2 ** 20:.1f} MB{budget}')
+    elif args.command == 'gc':
+        ArchiveManager(budget=args.budget_mb * 2 ** 20, max_age=args.max_age_days).gc(compact=not args.no_compact,
+                                                                                     dry_run=args.dry_run)
+    else:
+        counts = ArchiveManager().verify(repair=args.repair)
+        print(', '.join(f'{count} {name}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
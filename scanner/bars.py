@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from scanner.features import compute_feature
+from scanner.settings import TZ
+from scanner.timeindex import NS_PER_DAY, NS_PER_MINUTE, closest, day_table, key_to_date, window
+
+
+class Bars:
+    # Intraday bars of one symbol as contiguous numpy arrays instead of a tz-aware DataFrame. time is epoch ns,
+    # day/day_start/day_offset form the day table: US/Eastern date of each day as days since epoch, the position
+    # its first bar has, and the UTC offset used to get wall clock minutes. Slices are views on the same memory
+    # and look up features in the cache of the bars they were taken from.
+    __slots__ = ['time', 'open', 'high', 'low', 'close', 'volume', 'day', 'day_start', 'day_offset', 'features',
+                 'base', 'offset']
+
+    def __init__(self, time, open, high, low, close, volume, day, day_start, day_offset, base=None, offset=0):
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.day = day
+        self.day_start = day_start
+        self.day_offset = day_offset
+        self.features = dict()
+        self.base = base
+        self.offset = offset
+
+    @classmethod
+    def from_frame(cls, df, dtype=np.float64):
+        # float32 prices halve the memory again but round prices to about 7 significant digits
+        index = df.index if df.index.tz is not None else df.index.tz_localize(TZ)
+        time = index.asi8
+        wall = index.tz_convert(TZ).tz_localize(None).asi8
+        day, day_start = day_table(wall // NS_PER_DAY)
+        first = day_start[:-1]
+        return cls(time=time, open=df['open'].to_numpy(dtype), high=df['high'].to_numpy(dtype),
+                   low=df['low'].to_numpy(dtype), close=df['close'].to_numpy(dtype),
+                   volume=df['volume'].to_numpy(np.int64), day=day.astype(np.int32), day_start=day_start,
+                   day_offset=wall[first] - time[first])
+
+    def to_frame(self):
+        index = pd.DatetimeIndex(self.time, tz='UTC').tz_convert(TZ)
+        index.name = 'time'
+        return pd.DataFrame({'open': self.open, 'high': self.high, 'low': self.low, 'close': self.close,
+                             'volume': self.volume}, index=index)
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def nbytes(self):
+        arrays = [self.time, self.open, self.high, self.low, self.close, self.volume, self.day, self.day_start,
+                  self.day_offset, *self.features.values()]
+        return sum(a.nbytes for a in arrays)
+
+    @property
+    def number_of_days(self):
+        return len(self.day)
+
+    def __getitem__(self, key):
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError('Bars only support contiguous slices')
+        if stop <= start:
+            start = stop = first = last = 0
+            day_start = np.zeros(1, dtype=np.int64)
+        else:
+            first = np.searchsorted(self.day_start, start, 'right') - 1
+            last = np.searchsorted(self.day_start, stop, 'left')
+            day_start = np.clip(self.day_start[first:last + 1] - start, 0, stop - start)
+        return Bars(time=self.time[start:stop], open=self.open[start:stop], high=self.high[start:stop],
+                    low=self.low[start:stop], close=self.close[start:stop], volume=self.volume[start:stop],
+                    day=self.day[first:last], day_start=day_start, day_offset=self.day_offset[first:last],
+                    base=self.base if self.base is not None else self, offset=self.offset + start)
+
+    def get_day(self, i):
+        return self[self.day_start[i]:self.day_start[i + 1]]
+
+    def day_range(self, first_day, last_day=None):
+        # Positions of the bars of every day with first_day <= day key <= last_day, open ended without last_day
+        return window(self.day, self.day_start, first_day, last_day)
+
+    def days_between(self, first_day, last_day=None):
+        return self[slice(*self.day_range(first_day, last_day))]
+
+    def closest(self, column, price, start=0, stop=None):
+        # Position of the bar in [start, stop) whose column is closest to price
+        return closest(getattr(self, column), price, start, stop)
+
+    def minutes(self):
+        # Wall clock minute of the day of every bar, 570 is 09:30
+        offsets = np.repeat(self.day_offset, np.diff(self.day_start))
+        return ((self.time + offsets) % NS_PER_DAY) // NS_PER_MINUTE
+
+    def between(self, start_minute, end_minute):
+        # Like DataFrame.between_time, both ends included, e.g. between(570, 959) is 09:30 - 15:59
+        minutes = self.minutes()
+        if self.number_of_days <= 1:
+            return self[np.searchsorted(minutes, start_minute, 'left'):np.searchsorted(minutes, end_minute, 'right')]
+        keep = (minutes >= start_minute) & (minutes <= end_minute)
+        kept = np.concatenate([[0], np.cumsum(keep)])
+        return Bars(time=self.time[keep], open=self.open[keep], high=self.high[keep], low=self.low[keep],
+                    close=self.close[keep], volume=self.volume[keep], day=self.day, day_start=kept[self.day_start],
+                    day_offset=self.day_offset)
+
+    def feature(self, spec):
+        # Array of the feature over these bars, spec as in scanner.features.FEATURES
+        if self.base is not None:
+            return self.base.feature(spec)[self.offset:self.offset + len(self)]
+        if spec not in self.features:
+            self.features[spec] = compute_feature(self, spec)
+        return self.features[spec]
+
+    def features_at(self, i, group):
+        # Values at bar i of a group of features, keyed by output column name
+        return {name: self.feature(spec)[i] for name, spec in group.items()}
+
+    def position(self, time):
+        # Index of the first bar at or after time, epoch ns
+        return int(np.searchsorted(self.time, time, 'left'))
+
+    def timestamp(self, i):
+        return pd.Timestamp(self.time[i], tz='UTC').tz_convert(TZ)
+
+    def dates(self):
+        return [key_to_date(key) for key in self.day]
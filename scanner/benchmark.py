@@ -0,0 +1,189 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time as t
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from scanner.clients.synthetic import SyntheticClient
+from scanner.metrics import metrics
+from scanner.registry import scanner_class_names, get_scanner_class
+from scanner.settings import logger, TZ, BENCHMARKS_DIR
+
+# Data sizes as (number of symbols, years of history), the minute bar scanners do about 25k bars/s
+BENCHMARK_SIZES = {'small': (4, 0.25), 'medium': (8, 1), 'large': (40, 5)}
+# Fixed end of history so every run scans exactly the same bars
+HISTORY_END = '2021-12-31'
+
+# Values of the params sheets in parameters/, dates are set per data size
+BENCHMARK_PARAMS = {
+    'candle_breakout': {'minimum_price': 10, 'maximum_price': 20000, 'minimum_average_turnover': 0,
+                        'minimum_average_volume': 0, 'minimum_traded_volume': 100000, 'daily_breakout_period': 10,
+                        'weekly_breakout_period': 5, 'monthly_breakout_period': 2},
+    'multi_day_runners': {'minimum_price': 0.3, 'maximum_price': 15, 'minimum_average_turnover': 1000000,
+                          'minimum_average_volume': 100000, 'multi_day_runners_period': 3},
+    'dip_buy_days': {'minimum_price': 0.1, 'maximum_price': 2000, 'minimum_average_turnover': 0,
+                     'minimum_average_volume': 3500, 'minimum_traded_volume': 100000,
+                     'minimum_first_move_size_percent': 5, 'minimum_red_candles': 2,
+                     'minimum_bounce_size_percent': 5},
+    'pm_am_breakout': {'minimum_price': 1, 'maximum_price': 150000, 'minimum_average_turnover': 0,
+                       'minimum_average_volume': 0, 'minimum_traded_volume': 100000,
+                       'ah_pm_breakout_in_pre_market': False},
+    'gap_down_dip_bought': {'minimum_price': 0.1, 'maximum_price': 100000, 'minimum_average_turnover': 1000000,
+                            'minimum_average_volume': 0, 'minimum_gap_down_percent': 3,
+                            'minimum_dip_bought_percent': 1, 'minimum_range': 1, 'minimum_traded_volume': 100000},
+    'dip_buys_intraday': {'minimum_price': 0, 'maximum_price': 200000, 'minimum_average_turnover': 0,
+                          'minimum_average_volume': 0, 'minimum_eod_dip_percent': 4,
+                          'minimum_eod_dip_bought_percent': 2, 'minimum_range': 0.25,
+                          'minimum_traded_volume': 1000000},
+    'delisting_pre_notice': {'minimum_price': 0.1, 'maximum_price': 15, 'minimum_average_turnover': 0,
+                             'minimum_average_volume': 0, 'minimum_move_size': 70, 'minimum_move_volume': 1000000,
+                             'move_days': 5},
+    'delisting_post_notice': {'minimum_price': 0.1, 'maximum_price': 15, 'minimum_average_turnover': 0,
+                              'minimum_average_volume': 0, 'minimum_move_size': 80, 'minimum_move_volume': 1000000,
+                              'move_days': 5},
+    'reverse_split': {'minimum_price': 0.1, 'maximum_price': 1500, 'minimum_average_turnover': 0,
+                      'minimum_average_volume': 0, 'minimum_move_size': 50, 'minimum_move_volume': 100000,
+                      'move_days': 2},
+}
+
+
+def get_client(size_name, seed):
+    number_of_symbols, years = BENCHMARK_SIZES[size_name]
+    history_start = str((pd.Timestamp(HISTORY_END) - pd.Timedelta(days=round(365.25 * years) - 1)).date())
+    client = SyntheticClient(history_start=history_start, history_end=HISTORY_END,
+                             number_of_symbols=number_of_symbols, seed=seed)
+    # Bars are generated up front so generation isn't part of any scanner's timing
+    for symbol in client.symbols:
+        client.generate(symbol)
+    return client
+
+
+def scan(client, filter_name, symbols, params):
+    scanner_class = get_scanner_class(filter_name)
+    hits = 0
+    for symbol in symbols:
+        res = scanner_class(client=client, symbol=symbol, **params).run()
+        if res is not None:
+            hits += len(res)
+    return hits
+
+
+def run_filter(client, filter_name, size_name, measure_memory=True):
+    params = dict(BENCHMARK_PARAMS[filter_name], start_date=client.history_start, end_date=client.history_end,
+                  adjusted=False)
+    symbols = client.symbols
+    if filter_name == 'reverse_split':
+        params['rs_split_df'] = client.get_reverse_splits()
+        symbols = [s for s in symbols if s in params['rs_split_df'].index]
+
+    served = client.bars_served
+    start, cpu = t.perf_counter(), t.process_time()
+    hits = scan(client, filter_name, symbols, params)
+    seconds, cpu_seconds = t.perf_counter() - start, t.process_time() - cpu
+    bars = client.bars_served - served
+
+    # Separate pass, tracing allocations slows everything down too much to time the same pass
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        scan(client, filter_name, symbols, params)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    metrics.snapshot()
+    return {'filter': filter_name, 'size': size_name, 'symbols': len(symbols), 'bars': bars,
+            'seconds': round(seconds, 4), 'cpu_seconds': round(cpu_seconds, 4),
+            'bars_per_second': round(bars / seconds, 1) if seconds else None,
+            'peak_memory_mb': round(peak_memory / 2 ** 20, 2) if peak_memory is not None else None, 'hits': hits}
+
+
+def run_benchmarks(sizes, filters, seed=0, measure_memory=True):
+    results = []
+    for size_name in sizes:
+        client = get_client(size_name, seed)
+        for filter_name in filters:
+            result = run_filter(client, filter_name, size_name, measure_memory)
+            logger.info(f'{size_name:<7} {filter_name:<22} {result["bars_per_second"] or 0:>12,.0f} bars/s  '
+                        f'{result["peak_memory_mb"] or 0:>9.1f} MB  {result["hits"]:>6} hits')
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold, seed):
+    # Throughput down or peak memory up by more than threshold, or different hits on the same data, are regressions
+    previous = {(r['size'], r['filter']): r for r in baseline['results']}
+    same_data = baseline.get('seed') == seed
+    regressions = []
+    for r in results:
+        base = previous.get((r['size'], r['filter']))
+        if base is None:
+            continue
+        name = f'{r["size"]}/{r["filter"]}'
+        if base['bars_per_second'] and r['bars_per_second'] is not None and \
+                r['bars_per_second'] < base['bars_per_second'] * (1 - threshold):
+            regressions.append(f'{name}: {r["bars_per_second"]:,.0f} bars/s, baseline {base["bars_per_second"]:,.0f}')
+        if base['peak_memory_mb'] and r['peak_memory_mb'] is not None and \
+                r['peak_memory_mb'] > base['peak_memory_mb'] * (1 + threshold):
+            regressions.append(f'{name}: {r["peak_memory_mb"]} MB peak memory, baseline {base["peak_memory_mb"]} MB')
+        if same_data and r['hits'] != base['hits']:
+            regressions.append(f'{name}: {r["hits"]} hits, baseline {base["hits"]}')
+    return regressions
+
+
+def save(results, name, seed):
+    if not os.path.exists(BENCHMARKS_DIR):
+        os.mkdir(BENCHMARKS_DIR)
+    path = BENCHMARKS_DIR / f'{name}.json'
+    with open(path, 'w') as f:
+        json.dump({'created': str(datetime.now(tz=TZ)), 'seed': seed, 'python': platform.python_version(),
+                   'pandas': pd.__version__, 'numpy': np.__version__, 'results': results}, f, indent=1)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py bench', description='Benchmark every scanner on synthetic data')
+    parser.add_argument('--sizes', default='small',
+                        help=f'comma separated data sizes, any of {", ".join(BENCHMARK_SIZES)}')
+    parser.add_argument('--filters', default=','.join(scanner_class_names),
+                        help='comma separated filters, all by default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory pass')
+    parser.add_argument('--name', help='results are saved to benchmarks/<name>.json, a timestamp by default')
+    parser.add_argument('--baseline', help='saved results to compare with, exits with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed relative drop in bars/s or rise in peak memory, default 0.1')
+    parser.add_argument('--verbose', action='store_true', help='keep the scanners debug logging on')
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    filters = [f.strip() for f in args.filters.split(',') if f.strip()]
+    unknown = [s for s in sizes if s not in BENCHMARK_SIZES] + [f for f in filters if f not in scanner_class_names]
+    if unknown:
+        parser.error(f'unknown sizes or filters: {unknown}')
+
+    # Per symbol debug messages would be a good part of what gets measured
+    if not args.verbose:
+        logger.setLevel(logging.INFO)
+    results = run_benchmarks(sizes, filters, seed=args.seed, measure_memory=not args.no_memory)
+    path = save(results, args.name or datetime.now(tz=TZ).strftime('%Y%m%d_%H%M%S'), args.seed)
+    logger.info(f'Benchmark results saved to {path}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.seed)
+        for regression in regressions:
+            logger.info(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+        logger.info(f'No regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,182 @@
+import argparse
+import sys
+
+from scanner.registry import definition_names, scanner_class_names
+from scanner.settings import logger, QUEUE_DIR
+
+# Heavy modules (pandas, polygon, scanners) are only imported once a command actually needs them
+
+# Commands that parse their own arguments
+passthrough_commands = ['history', 'worker', 'bench', 'import', 'serve', 'rules', 'outcomes', 'cache']
+
+
+def parse_value(value):
+    for cast in [int, float]:
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_pairs(pairs, option):
+    parsed = dict()
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep or not key.strip():
+            raise argparse.ArgumentTypeError(f'{option} expects key=value, got {pair}')
+        parsed[key.strip()] = value.strip()
+    return parsed
+
+
+def scan(args):
+    from scanner import controller
+
+    controller.pause_seconds = 0
+    params_files = parse_pairs(args.params_file, '--params-file')
+    unknown = [f for f in params_files if f not in args.filters]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'--params-file given for filters not being run: {unknown}')
+    overrides = {k: parse_value(v) for k, v in parse_pairs(args.set, '--set').items()}
+    for key in ['start_date', 'end_date', 'output_file', 'output_formats', 'ticker_types']:
+        if getattr(args, key) is not None:
+            overrides[key] = getattr(args, key)
+    for filter_name in args.filters:
+        logger.debug(f'Selected filter: {filter_name}')
+        controller.run(filter_name, queue_dir=args.queue_dir, unit_size=args.unit_size, run_id=args.run_id,
+                       params_file=params_files.get(filter_name), overrides=overrides, dry_run=args.dry_run,
+                       prefetch=args.prefetch, profile=args.profile, profile_top=args.profile_top)
+
+
+def list_filters(args):
+    for filter_name in [*scanner_class_names, *definition_names()]:
+        print(filter_name)
+
+
+def history(args):
+    from scanner import results_db
+    results_db.main(args.history_args)
+
+
+def worker(args):
+    from scanner import worker as scan_worker
+    scan_worker.main(args.worker_args)
+
+
+def bench(args):
+    from scanner import benchmark
+    benchmark.main(args.bench_args)
+
+
+def import_flat_files(args):
+    from scanner import importer
+    importer.main(args.import_args)
+
+
+def outcomes(args):
+    from scanner import outcomes as scan_outcomes
+    scan_outcomes.main(args.outcomes_args)
+
+
+def rules(args):
+    from scanner import rules as scan_rules
+    scan_rules.main(args.rules_args)
+
+
+def cache(args):
+    from scanner import archive
+    archive.main(args.cache_args)
+
+
+def serve(args):
+    from scanner import server
+    server.main(args.serve_args)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='run.py', description='Stock scanner')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    filter_names = [*scanner_class_names, *definition_names()]
+    sub = subparsers.add_parser('scan', help='run one or more filters one after another')
+    sub.add_argument('filters', nargs='+', choices=filter_names, metavar='filter',
+                     help=f'one or more of {", ".join(filter_names)}')
+    sub.add_argument('--params-file', action='append', metavar='FILTER=PATH',
+                     help='params workbook of a filter, default parameters/<filter>.xlsx')
+    sub.add_argument('--start-date')
+    sub.add_argument('--end-date')
+    sub.add_argument('--output-file', help='name used in output file names')
+    sub.add_argument('--output-formats', help='comma separated list of xlsx, csv, parquet, arrow, sqlite')
+    sub.add_argument('--ticker-types', help='comma separated ticker types, e.g. CS,ETF')
+    sub.add_argument('--set', action='append', metavar='PARAMETER=VALUE',
+                     help='replace any value of the params sheet, can be repeated')
+    sub.add_argument('--run-id', help='resume an interrupted run')
+    sub.add_argument('--queue-dir', default=QUEUE_DIR, help='shared queue directory for multi host runs')
+    sub.add_argument('--unit-size', type=int, default=10, help='symbols per work unit on a shared queue')
+    sub.add_argument('--dry-run', action='store_true',
+                     help='only log the api requests, download size and time the bars of the run would take')
+    sub.add_argument('--prefetch', action='store_true',
+                     help='fetch all bars first, daily ones before minute ones of symbols passing the daily filters')
+    sub.add_argument('--profile', nargs='*', metavar='SCANNER',
+                     help='profile the scans, of the given filters or scanner classes only when any are listed')
+    sub.add_argument('--profile-top', type=int, default=10, help='symbols whose profiles are kept, the slowest')
+    sub.set_defaults(func=scan)
+
+    sub = subparsers.add_parser('list', help='list available filters')
+    sub.set_defaults(func=list_filters)
+
+    sub = subparsers.add_parser('history', help='query results of past runs, see history -h', add_help=False)
+    sub.add_argument('history_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=history)
+
+    sub = subparsers.add_parser('worker', help='pull work units from a shared queue, see worker -h', add_help=False)
+    sub.add_argument('worker_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=worker)
+
+    sub = subparsers.add_parser('bench', help='benchmark the scanners on synthetic data, see bench -h', add_help=False)
+    sub.add_argument('bench_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=bench)
+
+    sub = subparsers.add_parser('import', help='load day flat files into the bar archive, see import -h',
+                                add_help=False)
+    sub.add_argument('import_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=import_flat_files)
+
+    sub = subparsers.add_parser('serve', help='keep a scanner running for scan requests over http, see serve -h',
+                                add_help=False)
+    sub.add_argument('serve_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=serve)
+
+    sub = subparsers.add_parser('rules', help='scans defined as expressions over bars, see rules -h', add_help=False)
+    sub.add_argument('rules_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=rules)
+
+    sub = subparsers.add_parser('outcomes', help='what happened after the hits of past runs, see outcomes -h',
+                                add_help=False)
+    sub.add_argument('outcomes_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=outcomes)
+
+    sub = subparsers.add_parser('cache', help='bar archive size, eviction and checks (stats, gc, verify), see cache -h',
+                                add_help=False)
+    sub.add_argument('cache_args', nargs=argparse.REMAINDER)
+    sub.set_defaults(func=cache)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = get_parser()
+    if argv and argv[0] in passthrough_commands:
+        # Handed over as is, argparse would otherwise try to match options that come first against its own
+        args = parser.parse_args(argv[:1])
+        setattr(args, f'{argv[0]}_args', argv[1:])
+    else:
+        args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,8 +1,12 @@
-from abc import ABCMeta, abstractmethod
-
-
-class DataClient(metaclass=ABCMeta):
-
-    @abstractmethod
-    def get_data(self, *args, **kwargs):
-        pass
+from abc import ABCMeta, abstractmethod
+
+
+class DataClient(metaclass=ABCMeta):
+
+    @abstractmethod
+    def get_data(self, *args, **kwargs):
+        pass
+
+    def get_summary(self, symbol, start_date, end_date, adjusted=False):
+        # Summary of the daily bars of the range (see BarStore.summary) when it can be had without loading them
+        return None
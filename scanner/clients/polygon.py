@@ -1,140 +1,301 @@
-import os
-import pickle
-from datetime import datetime
-from typing import Union
-from urllib.parse import urlparse, parse_qs
-
-import pandas as pd
-import requests
-from polygon import RESTClient
-
-from scanner.clients.base import DataClient
-from scanner.settings import logger, TZ, DATA_DIR
-
-
-class PolygonClient(DataClient):
-    def __init__(self, api_key, archive_data, use_archived_data):
-        self.api_key = api_key
-        self.archive_data = archive_data
-        self.use_archived_data = use_archived_data
-
-    def get_all_exchanges(self):
-        with RESTClient(self.api_key) as client:
-            res = client.stocks_equities_exchanges()
-            return [(i.name, i.mic) for i in res.exchange if hasattr(i, 'mic')]
-
-    def get_all_symbols(self, market='stocks', ticker_types=None, limit=1000):
-        ticker_types = ['CS'] if ticker_types is None else ticker_types
-        all_tickers = []
-        with RESTClient(self.api_key) as client:
-            for t in ticker_types:
-                cursor = None
-                while True:
-                    params = {'cursor': cursor} if cursor else {}
-                    resp = client.reference_tickers_v3(market=market, limit=limit, type=t, **params)
-                    all_tickers.extend(resp.results)
-                    if hasattr(resp, 'count') and resp.count == 1000 and hasattr(resp, 'next_url'):
-                        cursor = parse_qs(urlparse(resp.next_url).query)['cursor'][0]
-                    else:
-                        break
-                    
-        all_tickers = [
-            {'symbol': i['ticker'], 'type': i.get('type', ''), 'exchange': i.get('primary_exchange', ''),
-             'name': i['name'],
-             'currency': i['currency_name'], 'locale': i['locale']} for i in all_tickers]
-        return all_tickers
-
-    def get_ticker_details(self, symbol, date):
-        results = dict()
-        results['market_cap'] = ''
-        results['share_class_shares_outstanding'] = ''
-        results['weighted_shares_outstanding'] = ''
-        results['sector'] = ''
-        results['industry'] = ''
-        return results
-        with RESTClient(self.api_key) as client:
-            try:
-                res = client.reference_ticker_details_vx(symbol=symbol, date=date).results
-                results['market_cap'] = res.get('market_cap', '')
-                results['share_class_shares_outstanding'] = res.get('share_class_shares_outstanding', '')
-                results['weighted_shares_outstanding'] = res.get('weighted_shares_outstanding', '')
-            except (requests.exceptions.HTTPError, TypeError, AttributeError) as e:
-                logger.exception(e)
-                results['market_cap'] = ''
-                results['share_class_shares_outstanding'] = ''
-                results['weighted_shares_outstanding'] = ''
-            try:
-                res = vars(client.reference_ticker_details(symbol=symbol, date=date))
-                results['sector'] = res.get('sector', '')
-                results['industry'] = res.get('industry', '')
-            except (requests.exceptions.HTTPError, TypeError) as e:
-                logger.exception(e)
-                results['sector'] = ''
-                results['industry'] = ''
-            return results
-
-    def get_ticker_news(self, symbol, published_utc):
-        with RESTClient(self.api_key) as client:
-            res = client.reference_ticker_news_v2(ticker=symbol, published_utc=published_utc, sort='published_utc',
-                                                  order='desc')
-            return res.results
-
-    def get_data(self, symbol: str, start_date: str, end_date: str, time_frame: str, multiplier: int,
-                 limit: int = 50000, adjusted: bool = False, sort: str = 'asc',
-                 outside_normal_session: bool = True) -> Union[pd.DataFrame, None]:
-        file_name = f'{symbol}_{multiplier}{time_frame}_{start_date}_{end_date}_{adjusted}_' \
-                    f'{outside_normal_session}'.replace('/', '-')
-        if self.use_archived_data:
-            try:
-                with open(DATA_DIR / f'{file_name}.pickle', 'rb') as data:
-                    data = pickle.load(data)
-                    if len(data):
-                        return data
-            except FileNotFoundError as e:
-                pass
-                # logger.debug(e)
-                # logger.debug(f'{symbol}: data file not found, fetching new data...')
-
-        cur_min = None
-        # Send request to api for data
-        with RESTClient(self.api_key) as client:
-            while True:
-                try:
-                    if cur_min is None or cur_min != datetime.now().minute:
-                        resp = client.stocks_equities_aggregates(ticker=symbol, multiplier=multiplier,
-                                                                 timespan=time_frame, from_=start_date, to=end_date,
-                                                                 adjusted=adjusted, sort=sort, limit=limit)
-                        # Convert data to pandas data frame
-                        df = pd.DataFrame(resp.results)
-                        break
-                except requests.exceptions.HTTPError as e:
-                    logger.exception(e)
-                    cur_min = datetime.now().minute
-                    logger.debug(f'symbol: {symbol}, time_frame: {time_frame}, '
-                                 f'Polygon api per minute request limit reached, '
-                                 f'waiting for next minute to start to make new requests')
-                except Exception as e:
-                    logger.exception(e)
-                    return
-
-        # Convert to timestamp to specified timezone datetime
-        df['time'] = df['t'].apply(lambda x: datetime.fromtimestamp(x / 1000).astimezone(tz=TZ))
-
-        # Set time column as index
-        df = df.set_index('time')
-
-        # Rearrange and Rename columns
-        df = df[["o", "h", "l", "c", "v"]]
-        df.columns = ["open", "high", "low", "close", "volume"]
-
-        # adjust data based normal market or normal + after market
-        if not outside_normal_session and time_frame in ['hour', 'minute']:
-            df = df.between_time('9:00', '15:59') if time_frame == 'hour' else df.between_time('9:30', '15:59')
-
-        if self.archive_data:
-            # Create data directory if not already exists
-            if not os.path.exists(DATA_DIR):
-                os.mkdir(DATA_DIR)
-            with open(DATA_DIR / f'{file_name}.pickle', 'wb') as data:
-                pickle.dump(df, data)
-        return df
+import threading
+import time as t
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Union
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import requests
+from polygon import RESTClient
+
+from scanner.clients.base import DataClient
+from scanner.metrics import metrics
+from scanner.settings import logger, TZ, API_REQUESTS_PER_MINUTE, FETCH_THREADS
+from scanner.store import BarStore, adjust_for_splits, regular_session
+from scanner.timeindex import day_key, key_to_date
+from scanner.trading_calendar import get_calendar
+
+# Most bars a session can have per time frame with pre and after market, 04:00 - 20:00
+BARS_PER_DAY = {'minute': 16 * 60, 'hour': 16, 'day': 1, 'week': 1 / 5, 'month': 1 / 20}
+
+
+def get_split_ratio(split):
+    # What prices before the ex date are multiplied by (see store.adjust_for_splits). Polygon's ratio is
+    # forfactor / tofactor, 0.25 for a 4 for 1 split (forfactor 1, tofactor 4) and 10 for a 1 for 10 reverse split
+    if split.get('ratio'):
+        return split['ratio']
+    if split.get('forfactor') and split.get('tofactor'):
+        return split['forfactor'] / split['tofactor']
+    return None
+
+
+class RateLimiter:
+    # At most `per_minute` calls in any 60 seconds across the threads of a process, no limit when 0
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.per_minute:
+            return
+        while True:
+            with self.lock:
+                now = t.monotonic()
+                while self.calls and now - self.calls[0] >= 60:
+                    self.calls.popleft()
+                if len(self.calls) < self.per_minute:
+                    self.calls.append(now)
+                    return
+                delay = 60 - (now - self.calls[0])
+            t.sleep(delay)
+
+
+class PolygonClient(DataClient):
+    def __init__(self, api_key, archive_data, use_archived_data, store=None,
+                 requests_per_minute=API_REQUESTS_PER_MINUTE, fetch_threads=FETCH_THREADS):
+        self.api_key = api_key
+        self.archive_data = archive_data
+        self.use_archived_data = use_archived_data
+        self.store = store or BarStore()
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.fetch_threads = fetch_threads
+
+    def get_all_exchanges(self):
+        with RESTClient(self.api_key) as client:
+            res = client.stocks_equities_exchanges()
+            return [(i.name, i.mic) for i in res.exchange if hasattr(i, 'mic')]
+
+    def get_all_symbols(self, market='stocks', ticker_types=None, limit=1000):
+        ticker_types = ['CS'] if ticker_types is None else ticker_types
+        all_tickers = []
+        with RESTClient(self.api_key) as client:
+            for t in ticker_types:
+                cursor = None
+                while True:
+                    params = {'cursor': cursor} if cursor else {}
+                    resp = client.reference_tickers_v3(market=market, limit=limit, type=t, **params)
+                    all_tickers.extend(resp.results)
+                    if hasattr(resp, 'count') and resp.count == 1000 and hasattr(resp, 'next_url'):
+                        cursor = parse_qs(urlparse(resp.next_url).query)['cursor'][0]
+                    else:
+                        break
+                    
+        all_tickers = [
+            {'symbol': i['ticker'], 'type': i.get('type', ''), 'exchange': i.get('primary_exchange', ''),
+             'name': i['name'],
+             'currency': i['currency_name'], 'locale': i['locale']} for i in all_tickers]
+        return all_tickers
+
+    def get_ticker_details(self, symbol, date):
+        with metrics.stage('ticker_details'):
+            return self.fetch_ticker_details(symbol, date)
+
+    def fetch_ticker_details(self, symbol, date):
+        results = dict()
+        results['market_cap'] = ''
+        results['share_class_shares_outstanding'] = ''
+        results['weighted_shares_outstanding'] = ''
+        results['sector'] = ''
+        results['industry'] = ''
+        return results
+        with RESTClient(self.api_key) as client:
+            try:
+                res = client.reference_ticker_details_vx(symbol=symbol, date=date).results
+                results['market_cap'] = res.get('market_cap', '')
+                results['share_class_shares_outstanding'] = res.get('share_class_shares_outstanding', '')
+                results['weighted_shares_outstanding'] = res.get('weighted_shares_outstanding', '')
+            except (requests.exceptions.HTTPError, TypeError, AttributeError) as e:
+                logger.exception(e)
+                results['market_cap'] = ''
+                results['share_class_shares_outstanding'] = ''
+                results['weighted_shares_outstanding'] = ''
+            try:
+                res = vars(client.reference_ticker_details(symbol=symbol, date=date))
+                results['sector'] = res.get('sector', '')
+                results['industry'] = res.get('industry', '')
+            except (requests.exceptions.HTTPError, TypeError) as e:
+                logger.exception(e)
+                results['sector'] = ''
+                results['industry'] = ''
+            return results
+
+    def get_ticker_news(self, symbol, published_utc):
+        with RESTClient(self.api_key) as client:
+            res = client.reference_ticker_news_v2(ticker=symbol, published_utc=published_utc, sort='published_utc',
+                                                  order='desc')
+            return res.results
+
+    def get_archive_sizes(self, time_frame: str = 'minute', multiplier: int = 1) -> dict:
+        # Bytes of archived data per symbol, used to estimate how heavy a symbol is to scan
+        return self.store.sizes(time_frame, multiplier)
+
+    def get_data_version(self, symbol: str, start_date: str, end_date: str, time_frame: str, multiplier: int,
+                         adjusted: bool = False, outside_normal_session: bool = True) -> Union[str, None]:
+        # Fingerprint of the archived data get_data would return, None when it would have to be fetched
+        if not self.use_archived_data:
+            return None
+        return self.store.version(symbol, start_date, end_date, time_frame, multiplier, adjusted)
+
+    def get_summary(self, symbol, start_date, end_date, adjusted=False):
+        # Only when every session of the range is archived, and for adjusted bars only when no split in the
+        # up to date split table changes them
+        if not self.use_archived_data:
+            return None
+        calendar = get_calendar()
+        for missing_start, missing_end in self.store.missing(symbol, start_date, end_date, 'day', 1):
+            if len(calendar.sessions_between(day_key(missing_start), day_key(missing_end))):
+                return None
+        if adjusted:
+            splits = self.store.get_splits(symbol)
+            if splits is None or splits[0] < str(pd.Timestamp.now(tz=TZ).date()) or \
+                    any(ex_date > str(start_date)[:10] for ex_date, _ in splits[1]):
+                return None
+        return self.store.summary(symbol, start_date, end_date)
+
+    def get_splits(self, symbol):
+        # [(ex date, ratio)] of the symbol, fetched at most once a day
+        today = str(pd.Timestamp.now(tz=TZ).date())
+        stored = self.store.get_splits(symbol) if self.use_archived_data else None
+        if stored is not None and stored[0] >= today:
+            return stored[1]
+        with RESTClient(self.api_key) as client:
+            try:
+                with metrics.stage('splits_api_request'):
+                    results = client.reference_stock_splits(symbol).results or []
+            except Exception as e:
+                logger.exception(e)
+                return stored[1] if stored is not None else []
+        splits = []
+        for split in results:
+            ratio = get_split_ratio(split)
+            if split.get('exDate') and ratio:
+                splits.append((split['exDate'], ratio))
+        if self.archive_data:
+            self.store.put_splits(symbol, splits, today)
+        return splits
+
+    def get_data(self, symbol: str, start_date: str, end_date: str, time_frame: str, multiplier: int,
+                 limit: int = 50000, adjusted: bool = False, sort: str = 'asc',
+                 outside_normal_session: bool = True) -> Union[pd.DataFrame, None]:
+        # Raw bars with all sessions are archived once, adjusted and regular session only views are derived
+        if self.use_archived_data:
+            missing = self.store.missing(symbol, start_date, end_date, time_frame, multiplier)
+        else:
+            missing = [(start_date, end_date)]
+        metrics.incr(f'{time_frame}_cache_miss' if missing else f'{time_frame}_cache_hit')
+
+        frames = []
+        for missing_start, missing_end in missing:
+            df = self.fetch_data(symbol, missing_start, missing_end, time_frame, multiplier, limit, sort)
+            if df is None:
+                return
+            if self.archive_data:
+                self.store.write(symbol, df, missing_start, missing_end, time_frame, multiplier)
+            frames.append(df)
+        if self.use_archived_data:
+            stored = self.store.read(symbol, start_date, end_date, time_frame, multiplier)
+            if stored is not None:
+                frames.append(stored)
+        frames = [df for df in frames if len(df)]
+        if not frames:
+            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        if len(frames) > 1:
+            df = df[~df.index.duplicated(keep='first')].sort_index()
+
+        with metrics.stage(f'{time_frame}_ingestion'):
+            if adjusted:
+                df = adjust_for_splits(df, self.get_splits(symbol))
+            # adjust data based normal market or normal + after market
+            if not outside_normal_session:
+                df = regular_session(df, time_frame)
+        return df
+
+    @staticmethod
+    def get_chunks(start_date, end_date, time_frame, multiplier, limit=50000):
+        # Sessions from start_date through end_date split into ranges whose bars stay under the limit, sized for
+        # extended hours every session so the api never has to truncate a response. No ranges without sessions.
+        bars_per_day = BARS_PER_DAY.get(time_frame, 1) / multiplier
+        days_per_chunk = max(1, int(limit * 0.9 / bars_per_day))
+        sessions = get_calendar().sessions_between(day_key(start_date), day_key(end_date))
+        if not len(sessions):
+            return []
+        if len(sessions) <= days_per_chunk:
+            return [(str(start_date)[:10], str(end_date)[:10])]
+        starts = [str(key_to_date(day)) for day in sessions[::days_per_chunk]]
+        starts[0] = str(start_date)[:10]
+        ends = [str(key_to_date(day_key(day) - 1)) for day in starts[1:]] + [str(end_date)[:10]]
+        return list(zip(starts, ends))
+
+    def fetch_data(self, symbol, start_date, end_date, time_frame, multiplier, limit=50000, sort='asc'):
+        # Unadjusted bars with all sessions from the api, long ranges are fetched in chunks concurrently
+        chunks = self.get_chunks(start_date, end_date, time_frame, multiplier, limit)
+        if not chunks:
+            metrics.incr(f'{time_frame}_api_request_skipped')
+            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+        with metrics.stage(f'{time_frame}_api_request'):
+            if len(chunks) == 1 or self.fetch_threads <= 1:
+                results = [self.fetch_chunk(symbol, *chunk, time_frame, multiplier, limit, sort) for chunk in chunks]
+            else:
+                with ThreadPoolExecutor(min(self.fetch_threads, len(chunks))) as executor:
+                    results = list(executor.map(
+                        lambda chunk: self.fetch_chunk(symbol, *chunk, time_frame, multiplier, limit, sort), chunks))
+        if any(result is None for result in results):
+            return
+
+        with metrics.stage(f'{time_frame}_ingestion'):
+            # Convert data to pandas data frame
+            df = pd.DataFrame([row for result in results for row in result])
+            if not len(df):
+                return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+            if len(chunks) > 1:
+                df = df.drop_duplicates('t').sort_values('t', ascending=sort == 'asc')
+
+            # Convert to timestamp to specified timezone datetime
+            df['time'] = pd.to_datetime(df['t'], unit='ms', utc=True).dt.tz_convert(TZ)
+
+            # Set time column as index
+            df = df.set_index('time')
+
+            # Rearrange and Rename columns
+            df = df[["o", "h", "l", "c", "v"]]
+            df.columns = ["open", "high", "low", "close", "volume"]
+        return df
+
+    def fetch_chunk(self, symbol, start_date, end_date, time_frame, multiplier, limit, sort):
+        # Rows of one aggregates request, None on errors other than the rate limit
+        while True:
+            self.rate_limiter.wait()
+            try:
+                with RESTClient(self.api_key) as client:
+                    resp = client.stocks_equities_aggregates(ticker=symbol, multiplier=multiplier,
+                                                             timespan=time_frame, from_=start_date, to=end_date,
+                                                             adjusted=False, sort=sort, limit=limit)
+                metrics.incr(f'{time_frame}_api_chunk')
+                break
+            except requests.exceptions.HTTPError as e:
+                logger.exception(e)
+                logger.debug('symbol: %s, time_frame: %s, Polygon api per minute request limit reached, '
+                             'waiting for next minute to start to make new requests', symbol, time_frame)
+                t.sleep(60 - datetime.now().second)
+            except Exception as e:
+                logger.exception(e)
+                return
+        rows = resp.results or []
+        if len(rows) >= limit:
+            # Denser than planned for, split the range again rather than lose the bars past the limit
+            days = pd.date_range(start_date, end_date)
+            if len(days) > 1:
+                middle = days[len(days) // 2]
+                first = self.fetch_chunk(symbol, start_date, str((middle - pd.Timedelta(days=1)).date()),
+                                         time_frame, multiplier, limit, sort)
+                second = self.fetch_chunk(symbol, str(middle.date()), end_date, time_frame, multiplier, limit, sort)
+                if first is None or second is None:
+                    return
+                return first + second if sort == 'asc' else second + first
+            logger.warning('%s: %s bars of %s %s truncated at the %s bar limit', symbol, time_frame, start_date,
+                           end_date, limit)
+        return rows
@@ -0,0 +1,160 @@
+import zlib
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from scanner.clients.base import DataClient
+from scanner.settings import TZ
+
+# Extended hours minute grid, 04:00 - 19:59
+SESSION_MINUTES = 16 * 60
+PRE_MARKET_MINUTES = 330
+REGULAR_MINUTES = 390
+
+
+class SyntheticClient(DataClient):
+    # Deterministic daily and extended hours minute bars for benchmarks, no network or archive involved. The same
+    # seed, symbol and history always give the same bars, densities control how often each pattern shows up.
+    def __init__(self, history_start: str, history_end: str, symbols=None, number_of_symbols: int = 10,
+                 seed: int = 0, gap_density: float = 0.1, dip_density: float = 0.1, breakout_density: float = 0.05,
+                 penny_fraction: float = 0.25, reverse_split_fraction: float = 0.25):
+        self.history_start = history_start
+        self.history_end = history_end
+        self.symbols = symbols or [f'SYN{i:04d}' for i in range(number_of_symbols)]
+        self.seed = seed
+        self.gap_density = gap_density
+        self.dip_density = dip_density
+        self.breakout_density = breakout_density
+        self.penny_fraction = penny_fraction
+        self.reverse_split_fraction = reverse_split_fraction
+        self.bars = dict()
+        self.splits = dict()
+        self.bars_served = 0
+
+    def get_rng(self, symbol):
+        return np.random.default_rng(zlib.crc32(f'{self.seed}:{symbol}'.encode()))
+
+    def is_selected(self, symbol, fraction, rng):
+        # Spread evenly over the listed symbols so even a handful of them gets its share of penny stocks and splits
+        if symbol not in self.symbols:
+            return rng.random() < fraction
+        i = self.symbols.index(symbol)
+        return int((i + 1) * fraction) > int(i * fraction)
+
+    def generate(self, symbol):
+        rng = self.get_rng(symbol)
+        days = pd.bdate_range(self.history_start, self.history_end)
+        n_days = len(days)
+        penny = self.is_selected(symbol, self.penny_fraction, rng)
+        start_price = rng.uniform(0.3, 3) if penny else np.exp(rng.uniform(np.log(3), np.log(500)))
+
+        # Minute log returns, calmer outside regular hours
+        sigma = np.full(SESSION_MINUTES, 0.0012)
+        sigma[:PRE_MARKET_MINUTES] = sigma[PRE_MARKET_MINUTES + REGULAR_MINUTES:] = 0.0005
+        returns = rng.normal(0, 1, (n_days, SESSION_MINUTES)) * sigma
+
+        gap_size = rng.choice([-1, 1], n_days) * rng.uniform(0.03, 0.15, n_days)
+        returns[:, 0] += np.where(rng.random(n_days) < self.gap_density, gap_size, 0)
+
+        # Breakout days trend up through the regular session, dips sell off and recover intraday
+        breakout = rng.random(n_days) < self.breakout_density
+        trend = np.zeros(SESSION_MINUTES)
+        trend[PRE_MARKET_MINUTES:PRE_MARKET_MINUTES + REGULAR_MINUTES] = 1 / REGULAR_MINUTES
+        returns += np.outer(breakout * rng.uniform(0.05, 0.2, n_days), trend)
+        path = np.cumsum(returns, axis=1)
+        dip = np.flatnonzero(rng.random(n_days) < self.dip_density)
+        if len(dip):
+            bottom = PRE_MARKET_MINUTES + rng.integers(30, REGULAR_MINUTES - 120, len(dip))
+            depth = rng.uniform(0.05, 0.15, len(dip))
+            minutes = np.arange(SESSION_MINUTES)
+            down = np.clip((minutes[None, :] - (bottom - 60)[:, None]) / 60, 0, 1)
+            up = np.clip((minutes[None, :] - bottom[:, None]) / 90, 0, 1)
+            path[dip] -= (down - up * rng.uniform(0.5, 1, len(dip))[:, None]) * depth[:, None]
+
+        # Penny stocks drift below $1 for a while
+        drift = np.zeros(n_days)
+        if penny:
+            drift = -np.sin(np.linspace(0, np.pi, n_days)) * rng.uniform(0.5, 1.5)
+        day_start = np.log(start_price) + np.concatenate([[0], np.cumsum(path[:-1, -1])]) + drift
+        close = np.exp(day_start[:, None] + path).ravel()
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        wiggle = np.abs(rng.normal(0, 0.0008, (2, close.size)))
+        high = np.maximum(open_, close) * (1 + wiggle[0])
+        low = np.minimum(open_, close) * (1 - wiggle[1])
+
+        shape = np.full(SESSION_MINUTES, 0.05)
+        shape[PRE_MARKET_MINUTES:PRE_MARKET_MINUTES + REGULAR_MINUTES] = \
+            1 + 2 * np.cos(np.linspace(0, np.pi, REGULAR_MINUTES)) ** 2
+        base_volume = np.exp(rng.uniform(np.log(200), np.log(20000)))
+        volume = (rng.lognormal(0, 0.5, (n_days, SESSION_MINUTES)) * shape * base_volume
+                  * (1 + 2 * breakout)[:, None]).astype(np.int64).ravel()
+
+        # Raw prices jump by the ratio on the split date, adjusted prices are continuous
+        ratio = 1
+        if self.is_selected(symbol, self.reverse_split_fraction, rng) and n_days > 20:
+            split_day = int(rng.integers(10, n_days - 10))
+            ratio = int(rng.choice([5, 10, 20]))
+            self.splits[symbol] = (days[split_day], ratio)
+            factor = np.ones(n_days)
+            factor[split_day:] = ratio
+            factor = np.repeat(factor, SESSION_MINUTES)
+            open_, high, low, close = [a * factor for a in [open_, high, low, close]]
+            volume = (volume / factor).astype(np.int64)
+
+        index = (np.repeat(days.values, SESSION_MINUTES) +
+                 np.tile(np.arange(4 * 60, 20 * 60) * np.timedelta64(1, 'm'), n_days))
+        minute = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume},
+                              index=pd.DatetimeIndex(index).tz_localize(TZ))
+        minute.index.name = 'time'
+        regular = minute.between_time('09:30', '15:59')
+        daily = regular.groupby(regular.index.date).agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'})
+        daily['volume'] = minute['volume'].groupby(minute.index.date).sum()
+        daily.index = pd.DatetimeIndex(daily.index).tz_localize(TZ)
+        daily.index.name = 'time'
+        self.bars[symbol] = daily, minute
+        return self.bars[symbol]
+
+    def get_reverse_splits(self):
+        # Same layout as rs_list.xlsx after it's loaded by the controller
+        for symbol in self.symbols:
+            if symbol not in self.bars:
+                self.generate(symbol)
+        rows = [{'symbol': s, 'date': d, 'split_ratio': f'1-{r}'} for s, (d, r) in self.splits.items()]
+        return pd.DataFrame(rows, columns=['symbol', 'date', 'split_ratio']).set_index('symbol')
+
+    def get_all_symbols(self, market='stocks', ticker_types=None, limit=1000):
+        return [{'symbol': s, 'type': 'CS', 'exchange': 'XSYN', 'name': s, 'currency': 'usd', 'locale': 'us'}
+                for s in self.symbols]
+
+    def get_all_exchanges(self):
+        return [('Synthetic Exchange', 'XSYN')]
+
+    def get_ticker_details(self, symbol, date):
+        return {'market_cap': '', 'share_class_shares_outstanding': '', 'weighted_shares_outstanding': '',
+                'sector': '', 'industry': ''}
+
+    def get_archive_sizes(self, time_frame: str = 'minute', multiplier: int = 1) -> dict:
+        return dict()
+
+    def get_data_version(self, *args, **kwargs):
+        return None
+
+    def get_data(self, symbol: str, start_date: str, end_date: str, time_frame: str, multiplier: int,
+                 limit: int = 50000, adjusted: bool = False, sort: str = 'asc',
+                 outside_normal_session: bool = True) -> Union[pd.DataFrame, None]:
+        daily, minute = self.bars[symbol] if symbol in self.bars else self.generate(symbol)
+        df = daily if time_frame == 'day' else minute
+        df = df[(df.index >= pd.Timestamp(start_date, tz=TZ)) &
+                (df.index < pd.Timestamp(end_date, tz=TZ) + pd.Timedelta(days=1))]
+        if adjusted and symbol in self.splits:
+            split_date, ratio = self.splits[symbol]
+            df = df.copy()
+            after = df.index >= pd.Timestamp(split_date, tz=TZ)
+            df.loc[after, ['open', 'high', 'low', 'close']] /= ratio
+            df.loc[after, 'volume'] = (df.loc[after, 'volume'] * ratio).astype(np.int64)
+        if not outside_normal_session and time_frame == 'minute':
+            df = df.between_time('9:30', '15:59')
+        self.bars_served += len(df)
+        return df
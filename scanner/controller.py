@@ -1,147 +1,322 @@
-import json
-import multiprocessing
-
-from concurrent.futures import ThreadPoolExecutor
-import os
-import time as t
-from datetime import datetime
-
-import pandas as pd
-from dateutil.parser import parse
-
-from scanner.clients.polygon import PolygonClient
-from scanner.scanner import CandleBreakOut, MultiDayRunners, DipBuyDays, PreMarketAfterMarketBreakout, \
-    GapDownDipBought, DipBuysIntraday, DelistingPreNotice, DelistingPostNotice, ReverseSplit
-from scanner.settings import logger, TZ, BASE_DIR, CONFIG_DIR, RECORDS_DIR
-
-scanner_class_dict = {'candle_breakout': CandleBreakOut, 'multi_day_runners': MultiDayRunners,
-                      'dip_buy_days': DipBuyDays, 'pm_am_breakout': PreMarketAfterMarketBreakout,
-                      'gap_down_dip_bought': GapDownDipBought, 'dip_buys_intraday': DipBuysIntraday,
-                      'delisting_pre_notice': DelistingPreNotice, 'delisting_post_notice': DelistingPostNotice,
-                      'reverse_split': ReverseSplit}
-
-
-class Controller:
-    def __init__(self, scan_instances, tickers_df, params_df, scan_name, output_file):
-        self.scan_instances = scan_instances
-        self.tickers_df = tickers_df
-        self.params_df = params_df
-        self.output_file = output_file
-        self.scan_name = scan_name
-
-    @staticmethod
-    def run_instance(obj):
-        return obj.run()
-
-    def run(self):
-        logger.debug('Running Scanner...')
-        pool = multiprocessing.Pool(processes=multiprocessing.cpu_count())  # Use all available CPU cores
-        res = pool.map(self.run_instance, self.scan_instances)
-        pool.close()
-        pool.join()
-  
-        if not len(res):
-            logger.debug('No Results Found')
-            t.sleep(3)
-            return
-        if not os.path.exists(RECORDS_DIR):
-            os.mkdir(RECORDS_DIR)
-        filter_dir = RECORDS_DIR / self.scan_name
-        if not os.path.exists(filter_dir):
-            os.mkdir(filter_dir)
-        df = pd.concat(res, axis=0)
-        df = pd.merge(self.tickers_df, df, on='symbol', how='inner')
-        logger.debug('Backtest done, exporting results to excel...')
-        file = filter_dir / f'{self.scan_name}_{self.output_file}_{datetime.now(tz=TZ)}.xlsx'.replace(' ',
-                                                                                                      '_').replace(':',
-                                                                                                                   '_')
-        with pd.ExcelWriter(file) as writer:
-            df.to_excel(writer, sheet_name='Results', index=False)
-            self.params_df.to_excel(writer, sheet_name='Parameters', index=False)
-
-        logger.debug(f'Done, check {file} for results')
-        t.sleep(3)
-
-
-def run(filter_name):
-    # Parameters
-    try:
-        params = params_df = pd.read_excel(BASE_DIR / f'parameters/{filter_name}.xlsx', engine='openpyxl',
-                                           sheet_name='params')
-    except (FileNotFoundError, ValueError) as e:
-        logger.exception(e)
-        logger.debug(f"Make sure file {filter_name}.xlsx with params and symbols sheets exists in parameters folder")
-        t.sleep(3)
-        return
-
-    try:
-        # Read api details
-        with open(CONFIG_DIR / 'config.json') as config:
-            config = json.load(config)
-            api_key = config['polygon_api_key']
-    except (FileNotFoundError, KeyError) as e:
-        logger.exception(e)
-        logger.debug('Make sure config.json file exists in config folder with required api details')
-        t.sleep(3)
-        return
-
-    # Base parameters
-    params.index = params['parameter']
-    params = params.to_dict()['value']
-    try:
-        params['start_date'] = str(parse(str(params['start_date'])).date())
-        params['end_date'] = str(parse(str(params['end_date'])).date())
-    except Exception as e:
-        logger.exception(e)
-        logger.debug('Please enter start_time and end_time in correct format')
-        t.sleep(3)
-        return
-    output_file = params['output_file'].strip()
-    del params['output_file']
-    params['adjusted'] = True if params['adjusted'].strip().lower() == 'yes' else False
-    if 'ah_pm_breakout_in_pre_market' in params:
-        ah_pm_breakout_in_pre_market = params['ah_pm_breakout_in_pre_market']
-        params[
-            'ah_pm_breakout_in_pre_market'] = True if ah_pm_breakout_in_pre_market.strip().lower() == 'yes' else False
-
-    # Ticker types
-    ticker_types = [s.strip().upper() for s in params['ticker_types'].split(',') if s.strip()]
-    del params['ticker_types']
-    if not len(ticker_types):
-        logger.debug('Please provide ticker types')
-        t.sleep(3)
-        return
-
-    # Symbols
-    data_client = PolygonClient(api_key=api_key, archive_data=True, use_archived_data=True)
-    tickers = data_client.get_all_symbols(ticker_types=ticker_types)
-    symbols = [s['symbol'] for s in tickers]
-
-    if filter_name == 'reverse_split':
-        try:
-            reverse_split_df = pd.read_excel(BASE_DIR / 'rs_list.xlsx')
-            reverse_split_df = reverse_split_df[['RS Date', 'Symbol', 'Split Ratio']]
-            reverse_split_df.columns = ['date', 'symbol', 'split_ratio']
-            reverse_split_df = reverse_split_df.set_index('symbol')
-        except (FileNotFoundError, KeyError, ValueError) as e:
-            logger.exception(e)
-            logger.debug('Make sure file rs_split.xlsx exists in main folder and contains required columns '
-                         'with right names')
-            return
-
-        symbols = [s for s in symbols if s in reverse_split_df.index]
-        if not len(symbols):
-            logger.debug('No reverse split data found for in rs_list.xlsx for given symbols and ticker types')
-            return
-        params['rs_split_df'] = reverse_split_df
-
-    tickers_df = pd.DataFrame(data=tickers)
-    exchanges = data_client.get_all_exchanges()
-    exchanges = pd.DataFrame(exchanges)
-    exchanges.columns = ['exchange_name', 'exchange']
-    tickers_df = pd.merge(tickers_df, exchanges, how='inner', on='exchange')
-    scanner_class = scanner_class_dict[filter_name]   #symbols
-    scan_instances = [scanner_class(client=data_client, symbol=s, **params) for s in ['TSLA','AMD','AAPL','NVDA','GOOGL']] 
-    controller = Controller(scan_instances=scan_instances, tickers_df=tickers_df, params_df=params_df,
-                            output_file=output_file, scan_name=filter_name)
-    controller.run()
+import json
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time as t
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+from dateutil.parser import parse
+
+from scanner.archive import ArchiveManager
+from scanner.clients.polygon import PolygonClient
+from scanner.journal import RunJournal
+from scanner.metrics import metrics
+from scanner.planner import FetchPlanner
+from scanner.profiling import get_profile_dir, report as profile_report
+from scanner.queues.base import QueueTimeout
+from scanner.queues.filesystem import FileQueue
+from scanner.queues.local import LocalQueue
+from scanner.registry import definition_names, scanner_class_names, get_scanner_class
+from scanner.result_cache import ResultCache
+from scanner.results_db import ResultsDB
+from scanner.scheduler import TaskScheduler
+from scanner.settings import (logger, TZ, BASE_DIR, CONFIG_DIR, RECORDS_DIR, QUEUE_DIR, ARCHIVE_BUDGET_MB,
+                              ARCHIVE_MAX_AGE_DAYS)
+from scanner.sinks.arrow import ArrowSink
+from scanner.sinks.csv import CsvSink
+from scanner.sinks.excel import ExcelSink
+from scanner.sinks.parquet import ParquetSink
+from scanner.sinks.sqlite import SqliteSink
+from scanner.utils import get_params_hash
+
+scanner_class_dict = {filter_name: get_scanner_class(filter_name)
+                      for filter_name in [*scanner_class_names, *definition_names()]}
+
+pause_seconds = 3
+reference_data_cache = dict()
+
+sink_class_dict = {'xlsx': ExcelSink, 'excel': ExcelSink, 'csv': CsvSink, 'parquet': ParquetSink,
+                   'sqlite': SqliteSink, 'arrow': ArrowSink}
+
+
+class Controller:
+    def __init__(self, scan_instances, tickers_df, params_df, scan_name, output_file, queue=None, unit_size=1,
+                 journal=None, result_cache=None, output_formats=None, results_db=None, run_id=None,
+                 profile_dir=None, profile_top=10):
+        self.scan_instances = scan_instances
+        self.tickers_df = tickers_df
+        self.params_df = params_df
+        self.output_file = output_file
+        self.scan_name = scan_name
+        self.queue = queue if queue is not None else LocalQueue()
+        self.unit_size = unit_size
+        self.journal = journal
+        self.result_cache = result_cache
+        self.output_formats = output_formats or ['xlsx']
+        self.results_db = results_db
+        self.run_id = run_id
+        self.profile_dir = profile_dir
+        self.profile_top = profile_top
+
+    @staticmethod
+    def run_instance(obj):
+        return obj.run()
+
+    def run(self):
+        logger.debug('Running Scanner...')
+        client = self.scan_instances[0].client if len(self.scan_instances) else None
+        scheduler = TaskScheduler(scan_name=self.scan_name, client=client)
+        done = self.journal.load() if self.journal is not None else {}
+
+        if not os.path.exists(RECORDS_DIR):
+            os.mkdir(RECORDS_DIR)
+        filter_dir = RECORDS_DIR / self.scan_name
+        if not os.path.exists(filter_dir):
+            os.mkdir(filter_dir)
+        file_name = f'{self.scan_name}_{self.output_file}_{datetime.now(tz=TZ)}'.replace(' ', '_').replace(':', '_')
+        # Results are streamed to every output as symbols complete instead of being collected until the end
+        sinks = self.get_sinks(filter_dir / file_name)
+        for obj in self.scan_instances:
+            if obj.symbol in done:
+                self.export(done[obj.symbol], sinks)
+
+        # Heaviest symbols first, in small units so no worker is left holding a chunk of big names
+        tasks = [(i, self.scan_instances[i], self.result_cache) for i in scheduler.order(self.scan_instances)
+                 if self.scan_instances[i].symbol not in done]
+        if done:
+            logger.debug(f'Resuming run, {len(tasks)} of {len(self.scan_instances)} symbols left to scan')
+        units = [tasks[i:i + self.unit_size] for i in range(0, len(tasks), self.unit_size)]
+        self.queue.submit(units)
+        try:
+            for index, result, elapsed, stats in self.queue.results():
+                metrics.merge(stats)
+                scheduler.record(self.scan_instances[index].symbol, elapsed)
+                if self.journal is not None:
+                    self.journal.append(self.scan_instances[index].symbol, result)
+                self.export(result, sinks)
+        except QueueTimeout as e:
+            # Results so far are exported and journaled, the same run id picks up the rest
+            logger.debug(f'{e}. Run again with run id {self.run_id} once workers are running')
+            raise
+        finally:
+            self.queue.close()
+            if self.journal is not None:
+                self.journal.close()
+            scheduler.save()
+            for sink in sinks:
+                sink.write_params(self.params_df)
+                sink.close()
+            if self.results_db is not None:
+                self.results_db.close()
+            metrics_file = metrics.write(f'{self.scan_name}_{self.run_id}')
+            logger.debug(f'Run metrics written to {metrics_file}\n{metrics.summary()}')
+            if self.profile_dir is not None:
+                profile_report(self.profile_dir, self.profile_top)
+
+        files = [sink.file for sink in sinks if sink.rows]
+        if not len(files):
+            logger.debug('No Results Found')
+            pause()
+            return
+        logger.debug(f'Done, check {", ".join(map(str, files))} for results')
+        pause()
+
+    def get_sinks(self, path):
+        sinks = []
+        for output_format in self.output_formats:
+            if output_format not in sink_class_dict:
+                logger.debug(f'Unknown output format {output_format}, it must be in {list(sink_class_dict)}')
+                continue
+            try:
+                sinks.append(sink_class_dict[output_format](path))
+            except ImportError:
+                continue
+        if not len(sinks):
+            logger.debug('No usable output format given, exporting results to excel')
+            sinks.append(ExcelSink(path))
+        return sinks
+
+    def export(self, result, sinks):
+        if result is None or not len(result):
+            return
+        with metrics.stage('merge', symbol=result['symbol'].iloc[0]):
+            df = pd.merge(self.tickers_df, result, on='symbol', how='inner')
+        with metrics.stage('export', symbol=result['symbol'].iloc[0]):
+            for sink in sinks:
+                sink.write(df)
+            if self.results_db is not None:
+                self.results_db.add_hits(self.run_id, self.scan_name, df)
+
+
+@lru_cache(maxsize=None)
+def get_api_key():
+    try:
+        # Read api details
+        with open(CONFIG_DIR / 'config.json') as config:
+            config = json.load(config)
+            return config['polygon_api_key']
+    except (FileNotFoundError, KeyError) as e:
+        logger.exception(e)
+        logger.debug('Make sure config.json file exists in config folder with required api details')
+
+
+def pause():
+    # Keeps messages readable when run from a double clicked console window, disabled for batch runs
+    t.sleep(pause_seconds)
+
+
+def get_reference_data(data_client, ticker_types):
+    # Symbol universe and exchanges only change daily, fetched once per process and ticker types
+    key = tuple(ticker_types)
+    if key not in reference_data_cache:
+        with metrics.stage('symbol_listing'):
+            tickers = data_client.get_all_symbols(ticker_types=ticker_types)
+            exchanges = pd.DataFrame(data_client.get_all_exchanges())
+        exchanges.columns = ['exchange_name', 'exchange']
+        reference_data_cache[key] = tickers, exchanges
+    return reference_data_cache[key]
+
+
+def get_params(filter_name, params_file=None, overrides=None):
+    # (params sheet, parsed parameters) with the overrides applied, None when the sheet can't be used
+    params_file = params_file or BASE_DIR / f'parameters/{filter_name}.xlsx'
+    try:
+        params = params_df = pd.read_excel(params_file, engine='openpyxl', sheet_name='params')
+    except (FileNotFoundError, ValueError) as e:
+        logger.exception(e)
+        logger.debug(f"Make sure file {params_file} with params and symbols sheets exists")
+        return
+
+    # Values given on the command line replace the sheet's, also in the parameters sheet of the output
+    for key, value in (overrides or {}).items():
+        if key in set(params_df['parameter']):
+            params_df.loc[params_df['parameter'] == key, 'value'] = value
+        else:
+            params_df = pd.concat([params_df, pd.DataFrame([{'parameter': key, 'value': value}])], ignore_index=True)
+    params = params_df.copy()
+
+    # Base parameters
+    params.index = params['parameter']
+    params = params.to_dict()['value']
+    try:
+        params['start_date'] = str(parse(str(params['start_date'])).date())
+        params['end_date'] = str(parse(str(params['end_date'])).date())
+    except Exception as e:
+        logger.exception(e)
+        logger.debug('Please enter start_time and end_time in correct format')
+        return
+    params['output_file'] = params['output_file'].strip()
+    # Optional comma separated list like "parquet, csv", excel when not given
+    output_formats = params.pop('output_formats', 'xlsx')
+    params['output_formats'] = [f.strip().lower().lstrip('.') for f in str(output_formats).split(',')
+                                if f.strip() and not pd.isna(output_formats)]
+    params['adjusted'] = True if params['adjusted'].strip().lower() == 'yes' else False
+    if 'ah_pm_breakout_in_pre_market' in params:
+        ah_pm_breakout_in_pre_market = params['ah_pm_breakout_in_pre_market']
+        params[
+            'ah_pm_breakout_in_pre_market'] = True if ah_pm_breakout_in_pre_market.strip().lower() == 'yes' else False
+
+    # Ticker types
+    params['ticker_types'] = [s.strip().upper() for s in params['ticker_types'].split(',') if s.strip()]
+    if not len(params['ticker_types']):
+        logger.debug('Please provide ticker types')
+        return
+    return params_df, params
+
+
+def get_reverse_split_df():
+    try:
+        reverse_split_df = pd.read_excel(BASE_DIR / 'rs_list.xlsx')
+        reverse_split_df = reverse_split_df[['RS Date', 'Symbol', 'Split Ratio']]
+        reverse_split_df.columns = ['date', 'symbol', 'split_ratio']
+        return reverse_split_df.set_index('symbol')
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        logger.exception(e)
+        logger.debug('Make sure file rs_split.xlsx exists in main folder and contains required columns '
+                     'with right names')
+
+
+def run(filter_name, queue_dir=QUEUE_DIR, unit_size=10, run_id=None, params_file=None, overrides=None,
+        dry_run=False, prefetch=False, profile=None, profile_top=10):
+    # profile: names of filters or scanner classes to profile, empty for all of them, None to profile nothing
+    # Parameters
+    loaded = get_params(filter_name, params_file, overrides)
+    if loaded is None:
+        pause()
+        return
+    params_df, params = loaded
+
+    api_key = get_api_key()
+    if api_key is None:
+        pause()
+        return
+
+    output_file = params.pop('output_file')
+    output_formats = params.pop('output_formats')
+    ticker_types = params.pop('ticker_types')
+
+    # Symbols
+    data_client = PolygonClient(api_key=api_key, archive_data=True, use_archived_data=True)
+    tickers, exchanges = get_reference_data(data_client, ticker_types)
+    symbols = [s['symbol'] for s in tickers]
+
+    if filter_name == 'reverse_split':
+        reverse_split_df = get_reverse_split_df()
+        if reverse_split_df is None:
+            return
+
+        symbols = [s for s in symbols if s in reverse_split_df.index]
+        if not len(symbols):
+            logger.debug('No reverse split data found for in rs_list.xlsx for given symbols and ticker types')
+            return
+        params['rs_split_df'] = reverse_split_df
+
+    tickers_df = pd.DataFrame(data=tickers)
+    tickers_df = pd.merge(tickers_df, exchanges, how='inner', on='exchange')
+    scanner_class = scanner_class_dict[filter_name]   #symbols
+    scan_instances = [scanner_class(client=data_client, symbol=s, **params) for s in ['TSLA','AMD','AAPL','NVDA','GOOGL']] 
+
+    # Requests, archive bytes and time the bars of this run cost, optionally fetched before any scan starts
+    if dry_run or prefetch:
+        planner = FetchPlanner(data_client)
+        fetches = planner.plan(scan_instances)
+        logger.debug(f'Fetch plan of {filter_name} for {len(scan_instances)} symbols:\n'
+                     f'{planner.report(fetches, scan_instances)}')
+        if dry_run:
+            return
+        with metrics.stage('prefetch'):
+            planner.execute(fetches, scan_instances)
+
+    # Same run id, scanner and parameters pick up where an interrupted run stopped
+    run_id = run_id or datetime.now(tz=TZ).strftime('%Y%m%d_%H%M%S')
+    params_hash = get_params_hash(params)
+    journal = RunJournal(run_id=run_id, scan_name=filter_name, params_hash=params_hash)
+    logger.debug(f'Run id: {run_id}, enter it again to resume this run if it gets interrupted')
+
+    # Profiled runs scan every symbol, cached results would leave nothing to profile
+    profile_dir = None
+    if profile is not None and (not profile or filter_name in profile or
+                                getattr(scanner_class, '__name__', None) in profile):
+        profile_dir = get_profile_dir(filter_name, run_id)
+        for obj in scan_instances:
+            obj.profile = (str(profile_dir), profile_top)
+        logger.debug(f'Profiling the {profile_top} slowest symbols into {profile_dir}')
+    result_cache = ResultCache(params_hash=params_hash) if profile_dir is None else None
+
+    # Hits of every run are also kept in one indexed database for queries across runs
+    results_db = ResultsDB()
+    results_db.add_run(run_id=run_id, filter_name=filter_name, params_hash=params_hash, output_file=output_file)
+
+    # Without a queue directory everything runs in a local process pool, one symbol per unit
+    queue = FileQueue(queue_dir) if queue_dir else LocalQueue()
+    controller = Controller(scan_instances=scan_instances, tickers_df=tickers_df, params_df=params_df,
+                            output_file=output_file, scan_name=filter_name, queue=queue,
+                            unit_size=unit_size if queue_dir else 1, journal=journal,
+                            result_cache=result_cache, output_formats=output_formats, results_db=results_db,
+                            run_id=run_id, profile_dir=profile_dir, profile_top=profile_top)
+    controller.run()
+
+    # Bars read by this run were just marked as used, the least recently read ones go if the archive is too big
+    if ARCHIVE_BUDGET_MB or ARCHIVE_MAX_AGE_DAYS:
+        ArchiveManager(data_client.store).gc(compact=False)
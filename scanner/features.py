@@ -0,0 +1,65 @@
+import numpy as np
+
+# Columns added to scan records from the bar they are about, output column name -> (kind, bar column, bars).
+# Computed once per symbol over all its minute bars and shared by every record and slice, so another horizon is
+# just one more entry here, e.g. 'price_change_30min': ('forward_change', 'close', 30).
+FEATURES = {
+    'breakout': {
+        'price_change_5min': ('forward_change', 'close', 5),
+        'price_change_15min': ('forward_change', 'close', 15),
+        'volume_change_5min': ('forward_change', 'volume', 5),
+        'volume_change_15min': ('forward_change', 'volume', 15),
+    },
+    'dip_buy': {
+        'first_5min_volume_after_dip': ('forward_sum', 'volume', 5),
+        'first_15min_volume_after_dip': ('forward_sum', 'volume', 15),
+        'price_change_first_5min_after_dip': ('forward_change', 'close', 5),
+        'price_change_first_15min_after_dip': ('forward_change', 'close', 15),
+    },
+}
+
+
+def forward_change(values, periods):
+    # Percent change from each bar to the one `periods` later, rounded like the scanners always did. Same as
+    # (series.pct_change(periods).shift(-periods) * 100).round(3)
+    result = np.full(len(values), np.nan)
+    if len(values) > periods:
+        current = values[:-periods].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[:-periods] = np.round((values[periods:] / current - 1) * 100, 3)
+    return result
+
+
+def backward_change(values, periods):
+    # Percent change from the bar `periods` earlier
+    result = np.full(len(values), np.nan)
+    if len(values) > periods:
+        result[periods:] = forward_change(values, periods)[:-periods]
+    return result
+
+
+def forward_sum(values, periods):
+    # Sum of the next `periods` values, same as series.rolling(periods, min_periods=1).sum().shift(-periods)
+    result = np.full(len(values), np.nan)
+    if len(values) > periods:
+        total = np.concatenate([[0], np.cumsum(values)])
+        result[:-periods] = total[periods + 1:] - total[1:-periods]
+    return result
+
+
+def backward_sum(values, periods):
+    # Sum of the previous `periods` values, the bar itself not included
+    result = np.full(len(values), np.nan)
+    if len(values) > periods:
+        total = np.concatenate([[0], np.cumsum(values)])
+        result[periods:] = total[periods:-1] - total[:-periods - 1]
+    return result
+
+
+feature_kinds = {'forward_change': forward_change, 'backward_change': backward_change, 'forward_sum': forward_sum,
+                 'backward_sum': backward_sum}
+
+
+def compute_feature(bars, spec):
+    kind, column, periods = spec
+    return feature_kinds[kind](getattr(bars, column), periods)
@@ -0,0 +1,158 @@
+import multiprocessing
+import queue as queue_module
+
+from scanner.clients.polygon import BARS_PER_DAY
+from scanner.memory import get_rss, get_total_memory
+from scanner.planner import BYTES_PER_BAR
+from scanner.scheduler import run_timed_task
+from scanner.settings import logger, MEMORY_BUDGET_MB
+from scanner.timeindex import day_key
+from scanner.trading_calendar import get_calendar
+
+# Memory a scan takes per bar it reads: the frame, its numpy arrays and the intermediate results of the scan
+MEMORY_PER_BAR = 200
+# Weight of the latest task when learning how far off the estimates are
+SCALE_SMOOTHING = 0.3
+
+
+def get_budget(budget_mb=MEMORY_BUDGET_MB):
+    # Bytes the worker processes may take together, 0 is three quarters of physical memory, None when that isn't
+    # known either
+    if budget_mb:
+        return budget_mb * 2 ** 20
+    total = get_total_memory()
+    return int(total * 0.75) if total else None
+
+
+def get_governor(processes, budget=None):
+    # Governor of a pool of processes, None without a budget or where resident memory can't be read (no psutil and
+    # no /proc), estimates alone would only hold the pool back
+    budget = budget or get_budget()
+    if not budget or get_rss() is None:
+        return None
+    return MemoryGovernor(budget, processes)
+
+
+class MemoryGovernor:
+    # Keeps the worker processes of a pool inside a memory budget. Every task gets an estimate from the bars it
+    # reads, a task is admitted while the larger of the workers' resident memory and their idle memory plus the
+    # estimates of the running tasks leaves room for it. Tasks that don't fit are deferred and smaller ones run
+    # first, a task too big for the budget on its own runs once nothing else does. Tasks aren't split, the scans
+    # look back over their whole range so parts of it don't give the same hits.
+    def __init__(self, budget, workers):
+        self.budget = budget
+        self.scale = 1.0
+        self.idle = None
+        self.workers = workers
+        self.running = dict()
+        self.peak = 0
+        self.deferred = 0
+        self.alone = 0
+        self.samples = 0
+        self.rss_sum = 0
+
+    def estimate(self, obj):
+        # Bytes a scan instance is expected to add to a worker
+        fetch_range = obj.get_fetch_range()
+        if fetch_range is None:
+            return 0
+        start_date, end_date = (str(value)[:10] for value in fetch_range)
+        sessions = len(get_calendar().sessions_between(day_key(start_date), day_key(end_date)))
+        client = obj.client
+        store = getattr(client, 'store', None) if getattr(client, 'use_archived_data', False) else None
+        bars = 0
+        for time_frame in obj.time_frames:
+            time_frame_bars = sessions * BARS_PER_DAY.get(time_frame, 1)
+            if store is not None:
+                # Sparse symbols have far fewer bars than a bar every minute of extended hours
+                stored = store.size(obj.symbol, start_date, end_date, time_frame, 1)
+                if stored:
+                    time_frame_bars = min(time_frame_bars, stored // BYTES_PER_BAR)
+            bars += time_frame_bars
+        return int(bars * MEMORY_PER_BAR)
+
+    def sample(self):
+        # Resident memory of all worker processes, None where it can't be read
+        sizes = [get_rss(process.pid) for process in multiprocessing.active_children()]
+        sizes = [size for size in sizes if size is not None]
+        if not sizes:
+            return None
+        rss = sum(sizes)
+        self.peak = max(self.peak, rss)
+        self.samples += 1
+        self.rss_sum += rss
+        if self.idle is None:
+            self.idle = rss
+        return rss
+
+    def used(self):
+        committed = (self.idle or 0) + sum(self.running.values())
+        rss = self.sample()
+        return committed if rss is None else max(rss, committed)
+
+    def admit(self, pending):
+        # Position in pending of the next task to start, None to wait for a running one to finish
+        if not self.running:
+            if self.fits(pending[0][1], self.used()):
+                return 0
+            self.alone += 1
+            logger.debug('Task of %s (%.0f MB estimated) exceeds the memory budget, running it alone',
+                         pending[0][0][1].symbol, pending[0][1] / 2 ** 20)
+            return 0
+        used = self.used()
+        # Tasks beyond the number of workers would only wait in the pool, they are admitted once one is free
+        if len(self.running) >= self.workers:
+            return None
+        for position, (_, estimate) in enumerate(pending):
+            if self.fits(estimate, used):
+                if position:
+                    self.deferred += 1
+                return position
+        return None
+
+    def fits(self, estimate, used):
+        return used + estimate * self.scale <= self.budget
+
+    def start(self, key, estimate):
+        self.running[key] = estimate * self.scale
+
+    def finish(self, key, estimate, stats):
+        # Learns how far off the estimates are from the peak of the task stage the worker reported, only from
+        # tasks that got to scanning, the ones ruled out by their daily bars never read what was estimated
+        self.running.pop(key, None)
+        stages = {row[0]: row for row in stats or [] if len(row) > 6}
+        if not estimate or self.idle is None or 'run_scan' not in stages or not stages.get('task', [0] * 7)[6]:
+            return
+        grown = max(0, stages['task'][6] - self.idle / self.workers)
+        self.scale = SCALE_SMOOTHING * max(grown / estimate, 0.1) + (1 - SCALE_SMOOTHING) * self.scale
+
+    def report(self):
+        average = self.rss_sum / self.samples if self.samples else 0
+        return (f'Memory budget {self.budget / 2 ** 20:.0f} MB, workers peaked at {self.peak / 2 ** 20:.0f} MB '
+                f'and averaged {average / 2 ** 20:.0f} MB, {self.deferred} tasks deferred, {self.alone} run alone, '
+                f'estimates scaled by {self.scale:.2f}')
+
+
+def governed_imap(pool, tasks, governor):
+    # Like pool.imap_unordered(run_timed_task, tasks) with tasks only started while the governor admits them,
+    # heaviest first as they are ordered
+    done = queue_module.Queue()
+    pending = [(task, governor.estimate(task[1])) for task in tasks]
+    started = dict()
+    key = 0
+    while pending or started:
+        while pending:
+            position = governor.admit(pending)
+            if position is None:
+                break
+            task, estimate = pending.pop(position)
+            governor.start(key, estimate)
+            started[key] = estimate
+            pool.apply_async(run_timed_task, (task,), callback=lambda res, key=key: done.put((key, res, None)),
+                             error_callback=lambda e, key=key: done.put((key, None, e)))
+            key += 1
+        finished, res, error = done.get()
+        governor.finish(finished, started.pop(finished), res[3] if error is None else None)
+        if error is not None:
+            raise error
+        yield res
@@ -0,0 +1,129 @@
+import argparse
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scanner.metrics import metrics
+from scanner.settings import logger, TZ
+from scanner.store import BarStore
+from scanner.timeindex import day_key, key_to_date
+from scanner.trading_calendar import get_calendar
+
+# Columns of the flat files, one file per day with the bars of every ticker, window_start is epoch ns
+FLAT_FILE_COLUMNS = {'ticker': str, 'volume': np.float64, 'open': np.float64, 'close': np.float64,
+                     'high': np.float64, 'low': np.float64, 'window_start': np.int64}
+
+
+def find_flat_files(directory, start_date=None, end_date=None):
+    # {date: path} of the day files under directory, named like 2023-01-03.csv.gz as in the flat file buckets
+    files = dict()
+    for path in Path(directory).rglob('*.csv*'):
+        match = re.match(r'(\d{4}-\d{2}-\d{2})\.csv(\.gz)?$', path.name)
+        if match is None:
+            continue
+        if (start_date and match.group(1) < start_date) or (end_date and match.group(1) > end_date):
+            continue
+        files[match.group(1)] = path
+    return dict(sorted(files.items()))
+
+
+def get_runs(dates):
+    # Dates split into runs of consecutive sessions, a missing day file ends a run
+    calendar = get_calendar()
+    runs = []
+    for date in dates:
+        if runs and calendar.next_session(day_key(runs[-1][-1])) >= day_key(date):
+            runs[-1].append(date)
+        else:
+            runs.append([date])
+    return runs
+
+
+class FlatFileImporter:
+    # Streams day files of all tickers into the bar store in chunks of rows. Bars are buffered per run of
+    # consecutive days and written per symbol once a month is done or the buffer reaches the memory limit.
+    def __init__(self, store=None, time_frame='minute', chunk_rows=500000, memory_limit=2 ** 30):
+        self.store = store or BarStore()
+        self.time_frame = time_frame
+        self.chunk_rows = chunk_rows
+        self.memory_limit = memory_limit
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.symbols = set()
+        self.rows = 0
+
+    def read(self, path):
+        for chunk in pd.read_csv(path, usecols=list(FLAT_FILE_COLUMNS), dtype=FLAT_FILE_COLUMNS,
+                                 chunksize=self.chunk_rows):
+            yield chunk
+
+    def flush(self, start_date, end_date):
+        # Buffered bars into the store, start_date - end_date marked as fetched for every symbol in them
+        if not self.buffer:
+            return
+        with metrics.stage('import_write'):
+            df = pd.concat(self.buffer, ignore_index=True)
+            self.buffer, self.buffered_bytes = [], 0
+            df = df.sort_values(['ticker', 'window_start'], kind='stable')
+            tickers = df['ticker'].to_numpy()
+            bounds = np.flatnonzero(tickers[1:] != tickers[:-1]) + 1
+            for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(df)]])):
+                part = df.iloc[start:stop]
+                symbol = tickers[start]
+                bars = pd.DataFrame({'open': part['open'].to_numpy(), 'high': part['high'].to_numpy(),
+                                     'low': part['low'].to_numpy(), 'close': part['close'].to_numpy(),
+                                     'volume': part['volume'].to_numpy()},
+                                    index=pd.DatetimeIndex(part['window_start'].to_numpy(), tz='UTC').tz_convert(TZ))
+                bars.index.name = 'time'
+                self.store.write(symbol, bars, start_date, end_date, self.time_frame, 1)
+                self.symbols.add(symbol)
+        logger.debug(f'Imported {len(df)} bars of {start_date} - {end_date}, {len(self.symbols)} symbols so far')
+
+    def run(self, files):
+        # files as returned by find_flat_files
+        for run in get_runs(list(files)):
+            start_date = run[0]
+            for i, date in enumerate(run):
+                with metrics.stage('import_read'):
+                    for chunk in self.read(files[date]):
+                        chunk = chunk[chunk['ticker'].notna()]
+                        self.buffer.append(chunk)
+                        self.buffered_bytes += chunk.memory_usage(deep=True).sum()
+                        self.rows += len(chunk)
+                last = i == len(run) - 1
+                if last or self.buffered_bytes >= self.memory_limit or run[i + 1][:7] != date[:7]:
+                    # Through the day before the next session, so the weekend after a Friday is covered as well
+                    end_date = date if last else str(key_to_date(day_key(run[i + 1]) - 1))
+                    self.flush(start_date, end_date)
+                    start_date = run[i + 1] if not last else None
+        return self.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py import',
+                                     description='Load day flat files of all tickers into the bar archive')
+    parser.add_argument('directory', help='folder with the day files, e.g. a copy of us_stocks_sip/minute_aggs_v1')
+    parser.add_argument('--time-frame', choices=['minute', 'day'], default='minute')
+    parser.add_argument('--start-date')
+    parser.add_argument('--end-date')
+    parser.add_argument('--chunk-rows', type=int, default=500000, help='rows parsed at a time')
+    parser.add_argument('--memory-mb', type=int, default=1024,
+                        help='bars buffered before they are written to the archive')
+    args = parser.parse_args(argv)
+
+    files = find_flat_files(args.directory, args.start_date, args.end_date)
+    if not files:
+        parser.error(f'no day files like 2023-01-03.csv.gz found in {args.directory}')
+    logger.debug(f'Importing {len(files)} day files of {args.time_frame} bars from {args.directory}')
+    importer = FlatFileImporter(time_frame=args.time_frame, chunk_rows=args.chunk_rows,
+                                memory_limit=args.memory_mb * 2 ** 20)
+    with metrics.stage('import'):
+        rows = importer.run(files)
+    logger.debug(f'Imported {rows} bars of {len(importer.symbols)} symbols\n{metrics.summary()}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+import os
+import pickle
+
+from scanner.settings import logger, JOURNAL_DIR
+
+
+class RunJournal:
+    # Append-only file of per-symbol results, so an interrupted run can be resumed with the same run id
+    def __init__(self, run_id, scan_name, params_hash, journal_dir=JOURNAL_DIR):
+        self.run_id = run_id
+        self.path = journal_dir / str(run_id) / f'{scan_name}_{params_hash}.journal'
+        self.file = None
+
+    def load(self):
+        results = dict()
+        if not os.path.exists(self.path):
+            return results
+        good_offset = 0
+        with open(self.path, 'rb') as f:
+            while True:
+                try:
+                    symbol, res = pickle.load(f)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, AttributeError, IndexError) as e:
+                    logger.debug(f'Journal {self.path}: dropping partially written entry ({e})')
+                    break
+                results[symbol] = res
+                good_offset = f.tell()
+        # Cut off whatever a crash left half written so new entries stay readable
+        if good_offset != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_offset)
+        logger.debug(f'Run {self.run_id}: {len(results)} symbols already done according to journal {self.path}')
+        return results
+
+    def append(self, symbol, res):
+        if self.file is None:
+            os.makedirs(self.path.parent, exist_ok=True)
+            self.file = open(self.path, 'ab')
+        pickle.dump((symbol, res), self.file)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
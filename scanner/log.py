@@ -0,0 +1,78 @@
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+from contextlib import contextmanager
+
+# Kept free of scanner imports, scanner.settings builds the logger with these
+
+
+class LazyFileHandler(logging.FileHandler):
+    # File handler opening the file, and creating its folder, with the first record instead of when it's made
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class JsonFormatter(logging.Formatter):
+    # One json object per line, for log shippers and jq
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'process': record.processName,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    # Lets the first `burst` records of every message through, then one in `rates[level]`. Messages are logged
+    # with lazy % formatting so all symbols share one format string, which is what's counted.
+    def __init__(self, rates, burst=20):
+        super().__init__()
+        self.rates = rates
+        self.burst = burst
+        self.counts = dict()
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1)
+        if rate <= 1:
+            return True
+        key = (record.levelno, record.msg)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        return count <= self.burst or not count % rate
+
+
+def parse_sampling(value):
+    # "DEBUG=20,INFO=5" -> {10: 20, 20: 5}
+    rates = dict()
+    for pair in (value or '').split(','):
+        level, sep, rate = pair.partition('=')
+        if sep and level.strip():
+            rates[logging.getLevelName(level.strip().upper())] = int(rate)
+    return rates
+
+
+def init_worker_logging(queue):
+    # Pool initializer, records go to the parent's listener instead of the inherited file and stream handlers
+    from scanner.settings import logger
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(queue))
+
+
+@contextmanager
+def log_listener(logger):
+    # Single writer in the parent for the records of all pool workers, so lines are never interleaved
+    queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(queue, *logger.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield queue
+    finally:
+        listener.stop()
@@ -0,0 +1,34 @@
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Kept free of scanner imports, scanner.metrics samples memory with these
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_rss(pid=None):
+    # Resident memory of a process (this one by default) in bytes, None where it can't be read: psutil when it's
+    # installed, /proc on linux otherwise
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid or "self"}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_total_memory():
+    # Physical memory in bytes, None when unknown
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * PAGE_SIZE
+    except (AttributeError, ValueError, OSError):
+        return None
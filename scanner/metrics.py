@@ -0,0 +1,128 @@
+import json
+import os
+import time as t
+from contextlib import contextmanager
+
+from scanner.memory import get_rss
+from scanner.settings import logger, METRICS_DIR
+
+
+def to_mb(n):
+    return round(n / 2 ** 20, 1)
+
+
+class Metrics:
+    # Wall time, cpu time, counts and resident memory per (stage, scanner, symbol). Each process keeps its own
+    # instance, workers send a snapshot back with every task which the parent merges. Nested stages are timed
+    # inclusively. Memory is sampled when a stage ends, the peak of a stage includes the samples of the stages
+    # inside it, and is that of one process.
+    def __init__(self):
+        self.stages = dict()
+        self.scanner = None
+        self.symbol = None
+        self.track_memory = get_rss() is not None
+        self.high_water = 0
+
+    @contextmanager
+    def task(self, scanner, symbol):
+        # Stages recorded inside, e.g. by the data client, are attributed to this scanner and symbol
+        previous = self.scanner, self.symbol
+        self.scanner, self.symbol = scanner, symbol
+        try:
+            yield
+        finally:
+            self.scanner, self.symbol = previous
+
+    def get_entry(self, name, scanner, symbol):
+        key = (name, scanner or self.scanner, symbol or self.symbol)
+        if key not in self.stages:
+            # count, wall, cpu, peak rss, sum of the rss samples
+            self.stages[key] = [0, 0.0, 0.0, 0, 0]
+        return self.stages[key]
+
+    @contextmanager
+    def stage(self, name, scanner=None, symbol=None):
+        wall, cpu = t.perf_counter(), t.process_time()
+        outer_high_water, self.high_water = self.high_water, 0
+        try:
+            yield
+        finally:
+            entry = self.get_entry(name, scanner, symbol)
+            entry[0] += 1
+            entry[1] += t.perf_counter() - wall
+            entry[2] += t.process_time() - cpu
+            if self.track_memory:
+                rss = get_rss() or 0
+                self.high_water = max(self.high_water, rss)
+                entry[3] = max(entry[3], self.high_water)
+                entry[4] += rss
+            self.high_water = max(outer_high_water, self.high_water)
+
+    def incr(self, name, n=1, scanner=None, symbol=None):
+        self.get_entry(name, scanner, symbol)[0] += n
+
+    def snapshot(self, reset=True):
+        rows = [(name, scanner, symbol, *entry) for (name, scanner, symbol), entry in self.stages.items()]
+        if reset:
+            self.stages = dict()
+        return rows
+
+    def merge(self, rows):
+        for name, scanner, symbol, count, wall, cpu, *memory in rows or []:
+            entry = self.get_entry(name, scanner, symbol)
+            entry[0] += count
+            entry[1] += wall
+            entry[2] += cpu
+            if memory:
+                entry[3] = max(entry[3], memory[0])
+                entry[4] += memory[1]
+
+    def totals(self, by):
+        # by: tuple of positions of (name, scanner, symbol) to group on
+        totals = dict()
+        for key, (count, wall, cpu, peak, rss) in self.stages.items():
+            group = tuple(key[i] for i in by)
+            total = totals.setdefault(group, [0, 0.0, 0.0, 0, 0])
+            total[0] += count
+            total[1] += wall
+            total[2] += cpu
+            total[3] = max(total[3], peak)
+            total[4] += rss
+        return totals
+
+    def write(self, file_name):
+        if not os.path.exists(METRICS_DIR):
+            os.mkdir(METRICS_DIR)
+        path = METRICS_DIR / f'{file_name}.json'
+        stage_totals = [{'stage': name, 'count': count, 'wall': round(wall, 6), 'cpu': round(cpu, 6),
+                         'peak_mb': to_mb(peak), 'avg_mb': to_mb(rss / count if count else 0)}
+                        for (name,), (count, wall, cpu, peak, rss) in sorted(self.totals((0,)).items())]
+        rows = [{'stage': name, 'scanner': scanner, 'symbol': symbol, 'count': count, 'wall': round(wall, 6),
+                 'cpu': round(cpu, 6), 'peak_mb': to_mb(peak), 'avg_mb': to_mb(rss / count if count else 0)}
+                for name, scanner, symbol, count, wall, cpu, peak, rss in self.snapshot(reset=False)]
+        with open(path, 'w') as f:
+            json.dump({'stages': stage_totals, 'details': rows}, f, indent=1)
+        return path
+
+    def summary(self, top_n=10, task_stage='task'):
+        # Memory columns are per process: the peak is the largest worker, the average is over the stage's ends
+        lines = ['Stage                      count        wall s         cpu s    peak MB     avg MB']
+        stage_totals = sorted(self.totals((0,)).items(), key=lambda x: x[1][1], reverse=True)
+        for (name,), (count, wall, cpu, peak, rss) in stage_totals:
+            memory = f'{to_mb(peak):>11.1f}{to_mb(rss / count):>11.1f}' if peak else ''
+            lines.append(f'{name:<24}{count:>8}{wall:>14.2f}{cpu:>14.2f}{memory}')
+        symbol_totals = sorted(((key, v) for key, v in self.totals((0, 2)).items() if key[0] == task_stage),
+                               key=lambda x: x[1][1], reverse=True)[:top_n]
+        if symbol_totals:
+            lines.append(f'Slowest {len(symbol_totals)} symbols (wall s): ' +
+                         ', '.join(f'{symbol} {wall:.2f}' for (_, symbol), (_, wall, *_) in symbol_totals))
+        slowest = sorted(((key, v) for key, v in self.totals((0, 2)).items()
+                          if key[0] != task_stage and key[1] is not None),
+                         key=lambda x: x[1][1], reverse=True)[:top_n]
+        if slowest:
+            lines.append(f'Slowest {len(slowest)} symbol stages (wall s): ' +
+                         ', '.join(f'{symbol}/{name} {wall:.2f}' for (name, symbol), (_, wall, *_) in slowest))
+        return '\n'.join(lines)
+
+
+metrics = Metrics()
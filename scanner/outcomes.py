@@ -0,0 +1,256 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from scanner.bars import Bars
+from scanner.metrics import metrics
+from scanner.results_db import ResultsDB, TIME_COLUMNS, PRICE_COLUMNS
+from scanner.settings import logger, TZ
+from scanner.store import merge_ranges
+from scanner.timeindex import NS_PER_DAY, NS_PER_MINUTE, day_key, day_keys, key_to_date
+from scanner.trading_calendar import get_calendar
+
+# What happened after each hit, horizon name -> (kind, n): the next n minutes, the rest of the regular session of
+# the hit ('close') or through the regular close of the nth session after the hit day
+HORIZONS = {'5min': ('minutes', 5), '15min': ('minutes', 15), '1h': ('minutes', 60), 'eod': ('close', 0),
+            '1d': ('sessions', 1), '5d': ('sessions', 5)}
+# Per horizon, in percent of the hit price: return to the last bar, max favorable and adverse excursion, and
+# minutes from the hit to the highest high and lowest low
+OUTCOME_COLUMNS = ['return', 'mfe', 'mae', 'minutes_to_high', 'minutes_to_low']
+REPORT_PERCENTILES = [10, 25, 50, 75, 90]
+NAT = np.iinfo(np.int64).min
+
+
+class SparseTable:
+    # Position of the maximum of values over any range [start, stop) of up to `longest` values, for a whole array
+    # of ranges at once in constant time each. Table k holds the position of the maximum of the 2 ** k values
+    # from every position, a range is covered by two of those. Ties go to the first position.
+    def __init__(self, values, longest):
+        self.values = values
+        self.table = [np.arange(len(values), dtype=np.int64)]
+        k = 1
+        while 2 ** k <= min(longest, len(values)):
+            previous, half = self.table[-1], 2 ** (k - 1)
+            left, right = previous[:-half], previous[half:]
+            self.table.append(np.where(values[left] >= values[right], left, right))
+            k += 1
+
+    def argmax(self, start, stop):
+        # start < stop
+        length = stop - start
+        levels = np.floor(np.log2(length)).astype(np.int64)
+        result = np.empty(len(start), dtype=np.int64)
+        for k in np.unique(levels):
+            selected = levels == k
+            left = self.table[k][start[selected]]
+            right = self.table[k][stop[selected] - 2 ** k]
+            result[selected] = np.where(self.values[left] >= self.values[right], left, right)
+        return result
+
+
+def normalize_hits(df):
+    # Hits of any scanner (a results file, ResultsDB.query) -> symbol, signal time, price and direction. Hits of
+    # daily bars (at midnight) are taken at the regular close of their day, when the signal is known.
+    time_columns = [c for c in TIME_COLUMNS if c in df.columns]
+    price_columns = [c for c in PRICE_COLUMNS if c in df.columns]
+    if not time_columns or not price_columns or 'symbol' not in df.columns:
+        raise ValueError(f'hits need symbol, one of {TIME_COLUMNS} and one of {PRICE_COLUMNS}')
+    # Tables of several scanners have each one's columns, the first one set is used per hit
+    times = pd.to_datetime(df[time_columns].applymap(ResultsDB.to_local_time).bfill(axis=1).iloc[:, 0])
+    prices = df[price_columns].apply(pd.to_numeric, errors='coerce').bfill(axis=1).iloc[:, 0]
+    wall = times.fillna(pd.Timestamp(0)).to_numpy().astype(np.int64)
+    days = wall // NS_PER_DAY
+    daily = wall % NS_PER_DAY == 0
+    _, _, closes, _ = get_calendar().session_minutes(days)
+    wall = np.where(daily, days * NS_PER_DAY + closes.astype(np.int64) * NS_PER_MINUTE, wall)
+    signal = pd.DatetimeIndex(wall).tz_localize(TZ, ambiguous='NaT', nonexistent='NaT').asi8.copy()
+    signal[times.isna().to_numpy()] = NAT
+    side = df['side'].to_numpy() if 'side' in df.columns else np.full(len(df), None)
+    return pd.DataFrame({'symbol': df['symbol'].to_numpy(), 'signal_ns': signal, 'day': days,
+                         'daily': daily, 'price': prices.to_numpy(np.float64),
+                         'direction': np.where(side == 'lower', -1, 1)}, index=df.index)
+
+
+def get_horizon_ends(hits, horizons):
+    # Epoch ns each horizon of every hit ends at (exclusive)
+    calendar = get_calendar()
+    ends = dict()
+    for name, (kind, n) in horizons.items():
+        if kind == 'minutes':
+            ends[name] = hits['signal_ns'].to_numpy() + n * NS_PER_MINUTE
+            continue
+        days = hits['day'].to_numpy() if kind == 'close' else calendar.sessions_after(hits['day'].to_numpy(), n)
+        _, _, closes, _ = calendar.session_minutes(days)
+        wall = days * NS_PER_DAY + closes.astype(np.int64) * NS_PER_MINUTE
+        ends[name] = pd.DatetimeIndex(wall).tz_localize(TZ, ambiguous='NaT', nonexistent='NaT').asi8
+    return ends
+
+
+def measure(bars, hits, ends):
+    # Outcome columns of hits of one symbol, all covered by the bars, windows start with the bar after the signal
+    time = bars.time
+    entry = hits['price'].to_numpy(np.float64)
+    direction = hits['direction'].to_numpy()
+    signal = hits['signal_ns'].to_numpy()
+    start = np.searchsorted(time, signal + np.where(hits['daily'].to_numpy(), 0, NS_PER_MINUTE), 'left')
+    stops = {name: np.maximum(np.searchsorted(time, end, 'left'), start) for name, end in ends.items()}
+    longest = max([int((stop - start).max()) for stop in stops.values()] + [1])
+    highs = SparseTable(bars.high, longest)
+    lows = SparseTable(-bars.low, longest)
+    columns = dict()
+    for name, stop in stops.items():
+        valid = (stop > start) & (entry > 0)
+        first, last = start[valid], stop[valid]
+        high_position, low_position = highs.argmax(first, last), lows.argmax(first, last)
+        price = entry[valid]
+        up = (bars.high[high_position] / price - 1) * 100
+        down = (bars.low[low_position] / price - 1) * 100
+        long = direction[valid] > 0
+        values = {'return': (bars.close[last - 1] / price - 1) * 100 * direction[valid],
+                  'mfe': np.where(long, up, -down), 'mae': np.where(long, down, -up),
+                  'minutes_to_high': (time[high_position] - signal[valid]) / NS_PER_MINUTE,
+                  'minutes_to_low': (time[low_position] - signal[valid]) / NS_PER_MINUTE}
+        for column in OUTCOME_COLUMNS:
+            result = np.full(len(hits), np.nan)
+            result[valid] = np.round(values[column], 3)
+            columns[f'{name}_{column}'] = result
+    return pd.DataFrame(columns, index=hits.index)
+
+
+class OutcomeAnalyzer:
+    # Outcomes of many hits in one pass per symbol: the minute bars of all its hits are read as few merged ranges
+    # from the archive and every horizon of every hit is measured on them at once
+    def __init__(self, client, horizons=None, adjusted=False):
+        self.client = client
+        self.horizons = horizons or HORIZONS
+        self.adjusted = adjusted
+
+    def get_ranges(self, hits, ends):
+        # Merged date ranges the bars of the hits are needed for, a hit's range ends with its longest horizon
+        last = np.max(np.column_stack(list(ends.values())), axis=1)
+        last_days = day_keys(pd.DatetimeIndex(last, tz='UTC').tz_convert(TZ))
+        ranges = [(key_to_date(first), key_to_date(max(first, last_day)))
+                  for first, last_day in zip(hits['day'], last_days)]
+        return merge_ranges(ranges)
+
+    def analyze(self, df):
+        # df: hits of any scanner, returned with the outcome columns of every horizon added
+        df = df.reset_index(drop=True)
+        hits = normalize_hits(df)
+        hits = hits[hits['signal_ns'] != NAT]
+        ends = get_horizon_ends(hits, self.horizons)
+        frames = []
+        for symbol, positions in hits.groupby('symbol', sort=False).indices.items():
+            symbol_hits = hits.iloc[positions]
+            symbol_ends = {name: end[positions] for name, end in ends.items()}
+            for first, last in self.get_ranges(symbol_hits, symbol_ends):
+                with metrics.stage('outcome_fetch', symbol=symbol):
+                    bars = self.client.get_data(symbol=symbol, start_date=str(first), end_date=str(last),
+                                                time_frame='minute', multiplier=1, adjusted=self.adjusted)
+                if bars is None or not len(bars):
+                    continue
+                days = symbol_hits['day'].to_numpy()
+                selected = np.flatnonzero((days >= day_key(first)) & (days <= day_key(last)))
+                with metrics.stage('outcome_measure', symbol=symbol):
+                    frames.append(measure(Bars.from_frame(bars), symbol_hits.iloc[selected],
+                                          {name: end[selected] for name, end in symbol_ends.items()}))
+        outcomes = pd.concat(frames) if frames else pd.DataFrame(index=df.index[:0])
+        columns = [f'{name}_{column}' for name in self.horizons for column in OUTCOME_COLUMNS]
+        return pd.concat([df, outcomes.reindex(index=df.index, columns=columns)], axis=1)
+
+
+def report(df, horizons=None, by=None):
+    # Distribution of the outcomes per group of hits (scan and parameter set when known) and horizon
+    horizons = horizons or HORIZONS
+    by = by or [c for c in ['filter_name', 'scan_name', 'params_hash'] if c in df.columns] or ['symbol']
+    rows = []
+    for key, group in df.groupby(by, dropna=False, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        for name in horizons:
+            returns = group[f'{name}_return'].dropna()
+            if not len(returns):
+                continue
+            row = dict(zip(by, key), horizon=name, hits=len(returns),
+                       win_rate=round((returns > 0).mean() * 100, 1), mean=round(returns.mean(), 3))
+            row.update({f'p{p}': round(value, 3) for p, value in
+                        zip(REPORT_PERCENTILES, np.percentile(returns, REPORT_PERCENTILES))})
+            for column in ['mfe', 'mae', 'minutes_to_high', 'minutes_to_low']:
+                row[f'median_{column}'] = round(group[f'{name}_{column}'].median(), 3)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def parse_horizons(value):
+    # e.g. 5min,1h,eod,3d
+    horizons = dict()
+    for name in [v.strip() for v in value.split(',') if v.strip()]:
+        if name in HORIZONS:
+            horizons[name] = HORIZONS[name]
+        elif name[:-3].isdigit() and name.endswith('min'):
+            horizons[name] = ('minutes', int(name[:-3]))
+        elif name[:-1].isdigit() and name.endswith('h'):
+            horizons[name] = ('minutes', int(name[:-1]) * 60)
+        elif name[:-1].isdigit() and name.endswith('d'):
+            horizons[name] = ('sessions', int(name[:-1]))
+        else:
+            raise argparse.ArgumentTypeError(f'unknown horizon {name}, e.g. 30min, 2h, eod or 10d')
+    return horizons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py outcomes',
+                                     description='Returns and excursions after the hits of past runs or a results file')
+    parser.add_argument('--hits', help='results file (csv, parquet or xlsx) instead of the results database')
+    parser.add_argument('--run', nargs='+', dest='run_ids')
+    parser.add_argument('--scan', nargs='+', dest='scan_names')
+    parser.add_argument('--symbol', nargs='+', dest='symbols')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--horizons', type=parse_horizons, default=HORIZONS,
+                        help=f'comma separated, default {",".join(HORIZONS)}')
+    parser.add_argument('--adjusted', action='store_true', help='split adjusted bars')
+    parser.add_argument('--csv', help='write every hit with its outcomes to this csv file')
+    parser.add_argument('--report-csv', help='write the report to this csv file instead of printing it')
+    args = parser.parse_args(argv)
+
+    if args.hits:
+        readers = {'.csv': pd.read_csv, '.parquet': pd.read_parquet, '.xlsx': pd.read_excel}
+        df = readers.get(args.hits[args.hits.rfind('.'):], pd.read_csv)(args.hits)
+    else:
+        db = ResultsDB()
+        try:
+            df = db.query(symbols=args.symbols, scan_names=args.scan_names, run_ids=args.run_ids, start=args.start,
+                          end=args.end, full_records=True)
+            runs = db.runs()[['run_id', 'filter_name', 'params_hash']]
+        finally:
+            db.close()
+        df = df.merge(runs, on=['run_id', 'filter_name'], how='left')
+    if not len(df):
+        logger.debug('No hits found')
+        return
+
+    from scanner.clients.polygon import PolygonClient
+    from scanner.controller import get_api_key
+    api_key = get_api_key()
+    if api_key is None:
+        return
+    client = PolygonClient(api_key=api_key, archive_data=True, use_archived_data=True)
+    with metrics.stage('outcomes'):
+        df = OutcomeAnalyzer(client, args.horizons, args.adjusted).analyze(df)
+    logger.debug(f'Outcomes of {len(df)} hits measured\n{metrics.summary()}')
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        logger.debug(f'{len(df)} hits written to {args.csv}')
+    result = report(df, args.horizons)
+    if args.report_csv:
+        result.to_csv(args.report_csv, index=False)
+        logger.debug(f'{len(result)} rows written to {args.report_csv}')
+    else:
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+            print(result.to_string(index=False) if len(result) else 'No outcomes, are minute bars archived?')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
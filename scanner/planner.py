@@ -0,0 +1,136 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from scanner.clients.polygon import BARS_PER_DAY
+from scanner.settings import logger, TZ, API_REQUESTS_PER_MINUTE, FETCH_THREADS
+from scanner.store import adjust_for_splits, merge_ranges
+from scanner.timeindex import day_key
+from scanner.trading_calendar import get_calendar
+
+# Raw bar in the archive, epoch time plus open, high, low, close and volume
+BYTES_PER_BAR = 48
+# Typical round trip of one aggregates request
+SECONDS_PER_REQUEST = 1.0
+
+Fetch = namedtuple('Fetch', ['symbol', 'time_frame', 'start_date', 'end_date'])
+
+
+class FetchPlanner:
+    # Bars a run needs as one fetch per symbol and time frame, what of it is archived already and what the rest
+    # costs. Executing the plan fetches all daily bars first and minute bars only for symbols passing the daily
+    # filters of at least one scan, so the scans themselves read everything from the archive.
+    def __init__(self, client, requests_per_minute=API_REQUESTS_PER_MINUTE, fetch_threads=FETCH_THREADS):
+        self.client = client
+        self.requests_per_minute = requests_per_minute
+        self.fetch_threads = max(1, fetch_threads)
+
+    def plan(self, scan_instances):
+        # {(symbol, time frame): Fetch}, the ranges of all scans of a symbol joined
+        ranges = dict()
+        for obj in scan_instances:
+            fetch_range = obj.get_fetch_range()
+            if fetch_range is None:
+                continue
+            start, end = (pd.Timestamp(value).date() for value in fetch_range)
+            for time_frame in obj.time_frames:
+                ranges.setdefault((obj.symbol, time_frame), []).append((start, end))
+        fetches = dict()
+        for (symbol, time_frame), symbol_ranges in ranges.items():
+            joined = merge_ranges(symbol_ranges)
+            fetches[symbol, time_frame] = Fetch(symbol, time_frame, str(joined[0][0]), str(joined[-1][1]))
+        return fetches
+
+    def get_missing(self, fetch):
+        if not self.client.use_archived_data:
+            return [(fetch.start_date, fetch.end_date)]
+        return self.client.store.missing(fetch.symbol, fetch.start_date, fetch.end_date, fetch.time_frame, 1)
+
+    def estimate(self, fetch):
+        # (requests, bytes) of the missing part of a fetch, bytes assume a bar every minute of extended hours
+        # of every session
+        missing = self.get_missing(fetch)
+        requests = sum(len(self.client.get_chunks(start, end, fetch.time_frame, 1)) for start, end in missing)
+        calendar = get_calendar()
+        sessions = sum(len(calendar.sessions_between(day_key(start), day_key(end))) for start, end in missing)
+        bars = sessions * BARS_PER_DAY[fetch.time_frame]
+        return requests, int(bars * BYTES_PER_BAR)
+
+    def get_seconds(self, requests):
+        seconds = requests * SECONDS_PER_REQUEST / self.fetch_threads
+        if self.requests_per_minute:
+            seconds = max(seconds, requests * 60 / self.requests_per_minute)
+        return seconds
+
+    def get_archived_daily(self, obj, start_date, end_date):
+        # Daily bars the scan would get, from the archive only, today's bars are never marked as fetched
+        daily_data = self.client.store.read(obj.symbol, start_date, end_date, 'day', 1)
+        if daily_data is not None and obj.adjusted:
+            splits = self.client.store.get_splits(obj.symbol)
+            daily_data = adjust_for_splits(daily_data, splits[1] if splits is not None else [])
+        return daily_data
+
+    def get_rejected(self, scan_instances, symbols=None):
+        # Symbols whose archived daily bars rule them out for every scan
+        passed, seen = set(), set()
+        for obj in scan_instances:
+            if symbols is not None and obj.symbol not in symbols:
+                continue
+            fetch_range = obj.get_fetch_range()
+            if fetch_range is None:
+                continue
+            seen.add(obj.symbol)
+            summary = self.client.get_summary(obj.symbol, *fetch_range, adjusted=obj.adjusted)
+            if summary is not None and obj.get_summary_rejection(summary) is not None:
+                continue
+            if obj.get_daily_rejection(self.get_archived_daily(obj, *fetch_range)) is None:
+                passed.add(obj.symbol)
+        return seen - passed
+
+    def report(self, fetches, scan_instances):
+        # Requests, bytes and time of the fetches still missing, per time frame. Minute bars of symbols whose
+        # archived daily bars already fail the filters aren't counted, the others are.
+        costs = {key: self.estimate(fetch) for key, fetch in fetches.items()}
+        today = str(pd.Timestamp.now(tz=TZ).date())
+        daily_archived = {symbol for (symbol, time_frame), fetch in fetches.items() if time_frame == 'day' and
+                          all(start >= today for start, _ in self.get_missing(fetch))}
+        rejected = self.get_rejected(scan_instances, daily_archived) if daily_archived else set()
+        lines = [f'{"bars":<8}{"fetches":>9}{"archived":>10}{"skipped":>9}{"requests":>10}{"MB":>10}{"minutes":>9}']
+        total_requests = 0
+        for time_frame in ['day', 'minute']:
+            keys = [key for key in fetches if key[1] == time_frame]
+            skipped = [key for key in keys if time_frame == 'minute' and key[0] in rejected]
+            needed = [costs[key] for key in keys if key not in skipped]
+            requests = sum(cost[0] for cost in needed)
+            size = sum(cost[1] for cost in needed)
+            archived = sum(1 for cost in needed if not cost[0])
+            total_requests += requests
+            lines.append(f'{time_frame:<8}{len(keys):>9}{archived:>10}{len(skipped):>9}{requests:>10}'
+                         f'{size / 2 ** 20:>10.1f}{self.get_seconds(requests) / 60:>9.1f}')
+        lines.append(f'{"total":<8}{"":>38}{total_requests:>10}{"":>10}{self.get_seconds(total_requests) / 60:>9.1f}')
+        return '\n'.join(lines)
+
+    def fetch(self, fetches):
+        # Raw bars of every fetch into the archive, fewest requests first so most symbols are ready early
+        fetches = sorted((fetch for fetch in fetches if self.get_missing(fetch)),
+                         key=lambda fetch: self.estimate(fetch)[0])
+        if not fetches:
+            return
+
+        def run(fetch):
+            self.client.get_data(symbol=fetch.symbol, start_date=fetch.start_date, end_date=fetch.end_date,
+                                 time_frame=fetch.time_frame, multiplier=1)
+
+        with ThreadPoolExecutor(self.fetch_threads) as executor:
+            list(executor.map(run, fetches))
+
+    def execute(self, fetches, scan_instances):
+        self.fetch([fetch for fetch in fetches.values() if fetch.time_frame == 'day'])
+        adjusted = sorted({obj.symbol for obj in scan_instances if obj.adjusted})
+        with ThreadPoolExecutor(self.fetch_threads) as executor:
+            list(executor.map(self.client.get_splits, adjusted))
+        rejected = self.get_rejected(scan_instances)
+        minute = [fetch for fetch in fetches.values() if fetch.time_frame == 'minute' and fetch.symbol not in rejected]
+        logger.debug(f'Daily bars fetched, {len(rejected)} symbols ruled out, fetching minute bars of {len(minute)}')
+        self.fetch(minute)
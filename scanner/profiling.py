@@ -0,0 +1,119 @@
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import time as t
+from collections import Counter, defaultdict
+
+from scanner.settings import logger, PROFILES_DIR
+
+# Profiles kept by this process, {directory: heap of (seconds, path)}
+kept = dict()
+# Paths of a folded stack taking less than this share of all time are left out of the flamegraph file
+MIN_STACK_SHARE = 1e-4
+MAX_STACK_DEPTH = 64
+
+
+def get_profile_dir(scan_name, run_id):
+    return PROFILES_DIR / f'{scan_name}_{run_id}'
+
+
+def run_profiled(obj):
+    # Runs a scan instance under cProfile, obj.profile is (directory, n). Each process keeps the profiles of its n
+    # slowest symbols in the directory, named by their seconds so the parent can pick the slowest of all.
+    directory, top_n = obj.profile
+    profile = cProfile.Profile()
+    start = t.perf_counter()
+    profile.enable()
+    try:
+        return obj.run()
+    finally:
+        profile.disable()
+        keep(profile, directory, top_n, t.perf_counter() - start, f'{type(obj).__name__}_{obj.symbol}')
+
+
+def keep(profile, directory, top_n, seconds, name):
+    heap = kept.setdefault(directory, [])
+    if len(heap) >= top_n and seconds <= heap[0][0]:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{seconds:.6f}_{name.replace("/", "-")}_{os.getpid()}.prof')
+    profile.dump_stats(path)
+    heapq.heappush(heap, (seconds, path))
+    if len(heap) > top_n:
+        _, dropped = heapq.heappop(heap)
+        try:
+            os.remove(dropped)
+        except FileNotFoundError:
+            pass
+
+
+def get_label(func):
+    file_name, line, name = func
+    return f'{name} ({os.path.basename(file_name)}:{line})'.replace(';', ',')
+
+
+def get_folded_stacks(stats):
+    # {stack: seconds} in the folded format of flamegraph tools. cProfile only keeps the time of every caller ->
+    # callee pair, not whole stacks, so stacks are rebuilt from the roots down: a function's callees get its time on
+    # a path in proportion to its time from that caller. Recursive calls end a stack.
+    children = defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[2], edge[3]))
+    total = sum(stats[func][3] for func in roots)
+    folded = Counter()
+
+    def walk(func, stack, on_stack, own, cumulative):
+        stack = stack + [get_label(func)]
+        if own > 0:
+            folded[';'.join(stack)] += own
+        share = cumulative / stats[func][3] if stats[func][3] else 0
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for child, child_own, child_cumulative in children[func]:
+            if child in on_stack or child_cumulative * share < total * MIN_STACK_SHARE:
+                continue
+            walk(child, stack, on_stack | {child}, child_own * share, child_cumulative * share)
+
+    for root in roots:
+        walk(root, [], {root}, stats[root][2], stats[root][3])
+    return folded
+
+
+def report(directory, top_n, lines=40):
+    # Joins the profiles of the top_n slowest symbols of a run into report.txt and profile.folded (for flamegraph.pl,
+    # speedscope, ...) in the directory, profiles of faster symbols are removed. Returns the report path, None
+    # without profiles.
+    if not os.path.exists(directory):
+        return None
+    profiles = sorted((entry for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+                      key=lambda entry: float(entry.name.split('_', 1)[0]), reverse=True)
+    for entry in profiles[top_n:]:
+        os.remove(entry.path)
+    profiles = profiles[:top_n]
+    if not profiles:
+        return None
+    stream = io.StringIO()
+    stream.write(f'Slowest {len(profiles)} symbols (seconds, profiled):\n')
+    for entry in profiles:
+        seconds, name = entry.name[:-len('.prof')].split('_', 1)
+        stream.write(f'  {float(seconds):10.3f}  {name.rsplit("_", 1)[0]}\n')
+    stats = pstats.Stats(*[entry.path for entry in profiles], stream=stream)
+    stream.write('\n')
+    stats.sort_stats('cumulative').print_stats(lines)
+    stats.sort_stats('tottime').print_stats(lines)
+    report_path = os.path.join(directory, 'report.txt')
+    with open(report_path, 'w') as f:
+        f.write(stream.getvalue())
+    with open(os.path.join(directory, 'profile.folded'), 'w') as f:
+        for stack, seconds in sorted(get_folded_stacks(stats.stats).items()):
+            if int(seconds * 10 ** 6):
+                f.write(f'{stack} {int(seconds * 10 ** 6)}\n')
+    logger.debug(f'Profiles of the {len(profiles)} slowest symbols joined in {report_path}, flamegraph stacks '
+                 f'(microseconds) in profile.folded')
+    return report_path
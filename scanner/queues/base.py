@@ -0,0 +1,22 @@
+from abc import ABCMeta, abstractmethod
+
+
+class QueueTimeout(Exception):
+    # No worker took or finished any work for too long
+    pass
+
+
+class WorkQueue(metaclass=ABCMeta):
+
+    @abstractmethod
+    def submit(self, units):
+        # units: list of work units, each a list of (index, scan instance, result cache or None) tasks
+        pass
+
+    @abstractmethod
+    def results(self):
+        # Yields (index, result, elapsed, stage metrics) for every submitted task as it completes
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,163 @@
+import copy
+import os
+import pickle
+import socket
+import time as t
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from scanner.queues.base import QueueTimeout, WorkQueue
+from scanner.settings import logger, QUEUE_WORKER_TIMEOUT
+
+# Seconds between the heartbeats of a worker, well below any sensible worker timeout
+HEARTBEAT_INTERVAL = 30
+
+
+def get_worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class FileQueue(WorkQueue):
+    # Work queue on a shared directory, units move pending -> claimed -> results with atomic renames so
+    # any number of workers on any number of hosts can pull from it. Workers touch a file under workers/ while
+    # they run, the controller gives up once none has for worker_timeout seconds.
+    def __init__(self, queue_dir, poll_interval: float = 1, claim_timeout: float = 3600,
+                 worker_timeout: float = QUEUE_WORKER_TIMEOUT):
+        self.queue_dir = Path(queue_dir)
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.worker_timeout = worker_timeout
+        self.pending_dir = self.queue_dir / 'pending'
+        self.claimed_dir = self.queue_dir / 'claimed'
+        self.results_dir = self.queue_dir / 'results'
+        self.workers_dir = self.queue_dir / 'workers'
+        for directory in [self.pending_dir, self.claimed_dir, self.results_dir, self.workers_dir]:
+            os.makedirs(directory, exist_ok=True)
+        self.job_id = None
+        self.unit_ids = []
+
+    @staticmethod
+    def write_file(path, obj):
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, path)
+
+    def submit(self, units):
+        if self.job_id is None:
+            self.job_id = f'{datetime.now().strftime("%Y%m%d%H%M%S")}_{uuid.uuid4().hex[:8]}'
+        for unit in units:
+            tasks = []
+            for index, obj, result_cache in unit:
+                # Workers attach their own data client, api keys never land on the shared directory
+                obj = copy.copy(obj)
+                obj.client = None
+                tasks.append((index, obj, result_cache))
+            unit_id = f'{self.job_id}-{len(self.unit_ids):06d}'
+            self.write_file(self.pending_dir / f'{unit_id}.pickle', tasks)
+            self.unit_ids.append(unit_id)
+        logger.debug(f'Job {self.job_id}: {len(self.unit_ids)} work units queued in {self.queue_dir}')
+
+    def results(self):
+        remaining = set(self.unit_ids)
+        last_alive = t.time()
+        while remaining:
+            for name in os.listdir(self.results_dir):
+                unit_id = name[:-len('.pickle')]
+                if not name.endswith('.pickle') or unit_id not in remaining:
+                    continue
+                path = self.results_dir / name
+                with open(path, 'rb') as f:
+                    unit_results = pickle.load(f)
+                os.remove(path)
+                remaining.discard(unit_id)
+                for res in unit_results:
+                    yield res
+            if remaining:
+                self.requeue_stale_units(remaining)
+                if self.live_workers():
+                    last_alive = t.time()
+                elif self.worker_timeout and t.time() - last_alive > self.worker_timeout:
+                    raise QueueTimeout(f'No worker has been running on {self.queue_dir} for '
+                                       f'{self.worker_timeout:.0f}s, {len(remaining)} work units left. Start one '
+                                       f'with: python -m scanner.worker {self.queue_dir}')
+                t.sleep(self.poll_interval)
+        self.unit_ids = []
+
+    def requeue_stale_units(self, unit_ids):
+        # Units claimed by a worker that died are put back for someone else to pick up
+        now = t.time()
+        for name in os.listdir(self.claimed_dir):
+            unit_id = name.split('@')[0]
+            path = self.claimed_dir / name
+            try:
+                if unit_id in unit_ids and now - path.stat().st_mtime > self.claim_timeout:
+                    os.replace(path, self.pending_dir / f'{unit_id}.pickle')
+                    logger.debug(f'Work unit {unit_id} claimed by {name.split("@")[1]} timed out, requeued')
+            except FileNotFoundError:
+                pass
+
+    def live_workers(self):
+        # Workers whose last heartbeat is within the worker timeout
+        now = t.time()
+        alive = []
+        for entry in os.scandir(self.workers_dir):
+            try:
+                if not self.worker_timeout or now - entry.stat().st_mtime <= self.worker_timeout:
+                    alive.append(entry.name)
+            except FileNotFoundError:
+                pass
+        return alive
+
+    def heartbeat(self):
+        # Worker side: marks this worker as running
+        (self.workers_dir / get_worker_id()).touch()
+
+    def leave(self):
+        # Worker side: a worker that stops is no longer counted as running
+        try:
+            os.remove(self.workers_dir / get_worker_id())
+        except FileNotFoundError:
+            pass
+
+    def claim(self, limit: int = 1):
+        # Worker side: atomically take up to limit pending units
+        claimed = []
+        worker_id = get_worker_id()
+        for name in sorted(os.listdir(self.pending_dir)):
+            if len(claimed) >= limit:
+                break
+            if not name.endswith('.pickle'):
+                continue
+            unit_id = name[:-len('.pickle')]
+            claimed_path = self.claimed_dir / f'{unit_id}@{worker_id}'
+            try:
+                os.rename(self.pending_dir / name, claimed_path)
+            except FileNotFoundError:
+                continue  # Another worker was faster
+            os.utime(claimed_path)
+            with open(claimed_path, 'rb') as f:
+                claimed.append((unit_id, pickle.load(f)))
+        return claimed
+
+    def complete(self, unit_id, unit_results):
+        self.write_file(self.results_dir / f'{unit_id}.pickle', unit_results)
+        for name in os.listdir(self.claimed_dir):
+            if name.split('@')[0] == unit_id:
+                try:
+                    os.remove(self.claimed_dir / name)
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        # Drop anything of this job still lying around, e.g. after an interrupted run
+        if self.job_id is None:
+            return
+        for directory in [self.pending_dir, self.claimed_dir, self.results_dir]:
+            for name in os.listdir(directory):
+                if name.startswith(self.job_id):
+                    try:
+                        os.remove(directory / name)
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,43 @@
+import multiprocessing
+
+from scanner.governor import get_governor, governed_imap
+from scanner.log import init_worker_logging, log_listener
+from scanner.queues.base import WorkQueue
+from scanner.scheduler import run_timed_task
+from scanner.settings import logger
+
+
+class LocalQueue(WorkQueue):
+    def __init__(self, processes=None, memory_budget=None):
+        self.processes = processes or multiprocessing.cpu_count()  # Use all available CPU cores
+        # Bytes the workers may take together, SCANNER_MEMORY_BUDGET_MB when None, see scanner.governor
+        self.memory_budget = memory_budget
+        self.tasks = []
+
+    def submit(self, units):
+        for unit in units:
+            self.tasks.extend(unit)
+
+    def results(self):
+        with log_listener(logger) as log_queue:
+            pool = multiprocessing.Pool(processes=self.processes, initializer=init_worker_logging,
+                                        initargs=(log_queue,))
+            governor = get_governor(self.processes, self.memory_budget)
+            try:
+                # Tasks handed out one at a time so a slow symbol never holds back a chunk of others
+                if governor is None:
+                    results = pool.imap_unordered(run_timed_task, self.tasks, chunksize=1)
+                else:
+                    results = governed_imap(pool, self.tasks, governor)
+                for res in results:
+                    yield res
+            except BaseException:
+                pool.terminate()
+                raise
+            else:
+                pool.close()
+            finally:
+                pool.join()
+                if governor is not None:
+                    logger.debug(governor.report())
+        self.tasks = []
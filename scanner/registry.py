@@ -0,0 +1,27 @@
+import functools
+import importlib
+import os
+
+from scanner.settings import DEFINITIONS_DIR
+
+# Filter name -> scanner class in scanner.scanner, kept free of heavy imports so listing filters and parsing
+# command line arguments doesn't load pandas
+scanner_class_names = {'candle_breakout': 'CandleBreakOut', 'multi_day_runners': 'MultiDayRunners',
+                       'dip_buy_days': 'DipBuyDays', 'pm_am_breakout': 'PreMarketAfterMarketBreakout',
+                       'gap_down_dip_bought': 'GapDownDipBought', 'dip_buys_intraday': 'DipBuysIntraday',
+                       'delisting_pre_notice': 'DelistingPreNotice', 'delisting_post_notice': 'DelistingPostNotice',
+                       'reverse_split': 'ReverseSplit'}
+
+
+def definition_names():
+    # Scans of definitions/<name>.json, run by scanner.rules.RuleScanner with the params of parameters/<name>.xlsx
+    if not os.path.exists(DEFINITIONS_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(DEFINITIONS_DIR)
+                  if name.endswith('.json') and name[:-5] not in scanner_class_names)
+
+
+def get_scanner_class(filter_name):
+    if filter_name not in scanner_class_names:
+        return functools.partial(importlib.import_module('scanner.rules').RuleScanner, definition=filter_name)
+    return getattr(importlib.import_module('scanner.scanner'), scanner_class_names[filter_name])
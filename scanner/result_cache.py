@@ -0,0 +1,41 @@
+import os
+import pickle
+import uuid
+
+from scanner.settings import logger, RESULTS_CACHE_DIR
+
+
+class ResultCache:
+    # Per-symbol scan results stored under scanner class / parameter hash / symbol, valid as long as the
+    # fingerprint of the bars the scan read hasn't changed
+    def __init__(self, params_hash, cache_dir=RESULTS_CACHE_DIR):
+        self.params_hash = params_hash
+        self.cache_dir = cache_dir
+
+    def get_path(self, obj):
+        return self.cache_dir / type(obj).__name__ / self.params_hash / f'{obj.symbol.replace("/", "-")}.pickle'
+
+    def get(self, obj):
+        data_version = obj.get_data_version()
+        if data_version is None:
+            return False, None
+        try:
+            with open(self.get_path(obj), 'rb') as f:
+                cached_version, res = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False, None
+        if cached_version != data_version:
+            return False, None
+        logger.debug('%s: bars and parameters unchanged, using cached results', obj.symbol)
+        return True, res
+
+    def put(self, obj, res):
+        data_version = obj.get_data_version()
+        if data_version is None:
+            return
+        path = self.get_path(obj)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((data_version, res), f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from scanner.settings import logger, TZ, RECORDS_DIR, RESULTS_DB_FILE
+
+# Scanners name their main timestamp and price differently, first column found is used
+TIME_COLUMNS = ['time', 'breakout_time', 'reverse_time', 'move_end_time']
+PRICE_COLUMNS = ['price', 'breakout_price', 'reverse_price', 'move_end_price']
+PERIOD_FORMATS = {'day': '%Y-%m-%d', 'week': '%Y-%W', 'month': '%Y-%m'}
+
+
+class ResultsDB:
+    def __init__(self, path=RESULTS_DB_FILE):
+        self.path = path
+        if not os.path.exists(RECORDS_DIR):
+            os.mkdir(RECORDS_DIR)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT, filter_name TEXT, params_hash TEXT, output_file TEXT, started_at TEXT,
+                PRIMARY KEY (run_id, filter_name));
+            CREATE TABLE IF NOT EXISTS hits (
+                id INTEGER PRIMARY KEY, run_id TEXT, filter_name TEXT, scan_name TEXT, symbol TEXT,
+                time TEXT, price REAL, record TEXT);
+            CREATE INDEX IF NOT EXISTS hits_symbol ON hits (symbol, time);
+            CREATE INDEX IF NOT EXISTS hits_scan_name ON hits (scan_name, time);
+            CREATE INDEX IF NOT EXISTS hits_time ON hits (time);
+            CREATE INDEX IF NOT EXISTS hits_run ON hits (run_id, filter_name, symbol);
+        ''')
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, run_id, filter_name, params_hash, output_file):
+        self.connection.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+                                (run_id, filter_name, params_hash, output_file, str(datetime.now(tz=TZ))))
+        self.connection.commit()
+
+    @staticmethod
+    def to_local_time(value):
+        # Stored as naive US/Eastern text so ordering and day/week bucketing work with plain sqlite functions
+        try:
+            ts = pd.Timestamp(value)
+        except (ValueError, TypeError):
+            return None
+        if ts is pd.NaT:
+            return None
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(TZ).tz_localize(None)
+        return ts.strftime('%Y-%m-%d %H:%M:%S')
+
+    def add_hits(self, run_id, filter_name, df):
+        time_column = next((c for c in TIME_COLUMNS if c in df.columns), None)
+        price_column = next((c for c in PRICE_COLUMNS if c in df.columns), None)
+        records = json.loads(df.to_json(orient='records', date_format='iso'))
+        rows = []
+        for record in records:
+            price = record.get(price_column) if price_column else None
+            rows.append((run_id, filter_name, record.get('scan_name'), record.get('symbol'),
+                         self.to_local_time(record.get(time_column)) if time_column else None,
+                         price if isinstance(price, (int, float)) else None, json.dumps(record)))
+        # Resumed runs export journaled symbols again, replace instead of duplicating them
+        self.connection.executemany('DELETE FROM hits WHERE run_id = ? AND filter_name = ? AND symbol = ?',
+                                    {(run_id, filter_name, row[3]) for row in rows})
+        self.connection.executemany('INSERT INTO hits (run_id, filter_name, scan_name, symbol, time, price, record) '
+                                    'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        self.connection.commit()
+
+    @staticmethod
+    def get_conditions(symbols=None, scan_names=None, run_ids=None, start=None, end=None):
+        conditions, args = [], []
+        for column, values in [('symbol', symbols), ('scan_name', scan_names), ('run_id', run_ids)]:
+            if values:
+                conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+                args.extend(values)
+        if start:
+            conditions.append('time >= ?')
+            args.append(str(start))
+        if end:
+            # Plain dates include the whole end day
+            conditions.append('time <= ?')
+            args.append(f'{end} 23:59:59' if len(str(end)) == 10 else str(end))
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', args
+
+    def query(self, symbols=None, scan_names=None, run_ids=None, start=None, end=None, limit=None,
+              full_records=False):
+        where, args = self.get_conditions(symbols, scan_names, run_ids, start, end)
+        sql = f'SELECT run_id, filter_name, scan_name, symbol, time, price, record FROM hits{where} ORDER BY time'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        df = pd.read_sql_query(sql, self.connection, params=args)
+        if full_records and len(df):
+            details = pd.DataFrame([json.loads(r) for r in df['record']], index=df.index)
+            details = details.drop(columns=[c for c in details.columns if c in df.columns])
+            df = pd.concat([df, details], axis=1)
+        return df.drop(columns=['record'])
+
+    def co_occurrence(self, scan_names, period='week', start=None, end=None, symbols=None):
+        # Symbols that triggered every one of scan_names within the same day/week/month
+        where, args = self.get_conditions(symbols, scan_names, None, start, end)
+        sql = f'''
+            SELECT symbol, strftime('{PERIOD_FORMATS[period]}', time) AS period, COUNT(*) AS hits,
+                   MIN(time) AS first_time, MAX(time) AS last_time, GROUP_CONCAT(DISTINCT scan_name) AS scan_names
+            FROM hits{where}
+            GROUP BY symbol, period
+            HAVING COUNT(DISTINCT scan_name) = ?
+            ORDER BY period, symbol'''
+        return pd.read_sql_query(sql, self.connection, params=args + [len(set(scan_names))])
+
+    def runs(self):
+        return pd.read_sql_query('SELECT r.*, COUNT(h.id) AS hits FROM runs r LEFT JOIN hits h '
+                                 'ON h.run_id = r.run_id AND h.filter_name = r.filter_name '
+                                 'GROUP BY r.run_id, r.filter_name ORDER BY r.started_at', self.connection)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query scan results of all past runs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ['hits', 'together']:
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--symbol', nargs='+', dest='symbols')
+        sub.add_argument('--start')
+        sub.add_argument('--end')
+        sub.add_argument('--csv', help='write results to this csv file instead of printing them')
+    subparsers.choices['hits'].add_argument('--scan', nargs='+', dest='scan_names')
+    subparsers.choices['hits'].add_argument('--run', nargs='+', dest='run_ids')
+    subparsers.choices['hits'].add_argument('--limit', type=int)
+    subparsers.choices['hits'].add_argument('--full', action='store_true', help='include every result column')
+    subparsers.choices['together'].add_argument('--scan', nargs='+', dest='scan_names', required=True)
+    subparsers.choices['together'].add_argument('--period', choices=list(PERIOD_FORMATS), default='week')
+    subparsers.add_parser('runs')
+    args = parser.parse_args(argv)
+
+    db = ResultsDB()
+    try:
+        if args.command == 'hits':
+            df = db.query(symbols=args.symbols, scan_names=args.scan_names, run_ids=args.run_ids, start=args.start,
+                          end=args.end, limit=args.limit, full_records=args.full)
+        elif args.command == 'together':
+            df = db.co_occurrence(args.scan_names, period=args.period, start=args.start, end=args.end,
+                                  symbols=args.symbols)
+        else:
+            df = db.runs()
+    finally:
+        db.close()
+    if getattr(args, 'csv', None):
+        df.to_csv(args.csv, index=False)
+        logger.debug(f'{len(df)} rows written to {args.csv}')
+    else:
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+            print(df.to_string(index=False) if len(df) else 'No results')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import hashlib
+import json
+import sys
+import time as t
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scanner.features import feature_kinds
+from scanner.scanner import BaseScanner
+from scanner.settings import logger, TZ, DEFINITIONS_DIR
+from scanner.timeindex import day_keys, key_to_date
+from scanner.trading_calendar import get_calendar
+
+# Scans as data: conditions and output columns are python expressions over whole arrays of bars, so every scan
+# is vectorized by construction. Keys of a definition:
+#   bars     'day' (daily bars, minute bars aren't fetched) or 'minute'
+#   params   names of the params sheet values the expressions use, besides the ones every scanner has
+#   scans    one output scan_name each, optionally 'resample' ('week' or 'month', daily bars only) and 'let'
+#   let      name -> expression, evaluated in order after the scan's own let, for later expressions to use
+#   where    rows that may be hits at all
+#   sides    side -> condition, a row is a hit of the first side whose condition holds, or instead of sides
+#   condition
+#   columns  output column -> expression, after symbol and scan_name, ticker details are added after them
+# Names available: open, high, low, close, volume, time, day (day key), index (position), side, all params, the
+# functions below and for minute bars also minute (wall clock minute of the day) and the session bounds
+# pre_open, regular_open, regular_close and post_close. The two built in definitions re-express scanners of
+# scanner.scanner and are compared with them by `run.py rules check`, more are read from definitions/*.json.
+DEFINITIONS = {
+    'multi_day_runners': {
+        'bars': 'day',
+        'params': ['multi_day_runners_period'],
+        'scans': [{'scan_name': 'Multiday-Runners'}],
+        'where': 'index >= multi_day_runners_period',
+        'sides': {'upper': 'streak(close > open) >= multi_day_runners_period',
+                  'lower': 'streak(open > close) >= multi_day_runners_period'},
+        'columns': {'time': 'time', 'price': 'close', 'side': 'side', 'candles': 'multi_day_runners_period',
+                    'start_time': 'shift(time, multi_day_runners_period - 1)',
+                    'start_price': 'shift(open, multi_day_runners_period - 1)'},
+    },
+    # Days, weeks and months breaking out of the range of the ones before, the daily part of CandleBreakOut
+    'candle_breakout': {
+        'bars': 'day',
+        'params': ['daily_breakout_period', 'weekly_breakout_period', 'monthly_breakout_period'],
+        'scans': [{'scan_name': 'Multi-day-breakout', 'let': {'period': 'daily_breakout_period'}},
+                  {'scan_name': 'Multi-week-breakout', 'resample': 'week', 'let': {'period': 'weekly_breakout_period'}},
+                  {'scan_name': 'Multi-month-breakout', 'resample': 'month',
+                   'let': {'period': 'monthly_breakout_period'}}],
+        'let': {'range_high': 'shift(rolling_max(high, period))', 'range_low': 'shift(rolling_min(low, period))'},
+        'where': 'index > period',
+        'sides': {'upper': 'high > range_high', 'lower': 'low < range_low'},
+        'columns': {'side': 'side', 'range_high': 'range_high', 'range_low': 'range_low',
+                    'range_start_time': 'shift(time, period)', 'range_end_time': 'shift(time)',
+                    'price': "where(side == 'upper', where(open > range_high, open, high), "
+                             "where(open < range_low, open, low))"},
+    },
+}
+
+TICKER_DETAIL_COLUMNS = ['sector', 'industry', 'market_cap', 'share_class_shares_outstanding',
+                         'weighted_shares_outstanding']
+BASE_PARAMS = ['start_date', 'end_date', 'minimum_price', 'maximum_price', 'minimum_average_turnover',
+               'minimum_average_volume', 'adjusted', 'outside_normal_session']
+
+
+class Times(np.ndarray):
+    # Epoch ns of bars, written out like str(timestamp) of US/Eastern time, NaT (shifted in) as empty
+    pass
+
+
+def shift(values, periods=1):
+    # Value `periods` rows earlier (later when negative), NaN, None or NaT where there is none
+    values = np.asanyarray(values)
+    periods = int(periods)
+    if not isinstance(values, Times) and values.dtype.kind in 'biu':
+        values = values.astype(np.float64)
+    fill = np.iinfo(np.int64).min if isinstance(values, Times) else None if values.dtype == object else np.nan
+    result = np.full_like(values, fill)
+    if 0 < periods < len(values):
+        result[periods:] = values[:-periods]
+    elif 0 < -periods < len(values):
+        result[:periods] = values[-periods:]
+    elif not periods:
+        result[:] = values
+    return result
+
+
+def rolling(values, periods, reduce):
+    # reduce over the last `periods` values, NaN until there are that many like pandas rolling
+    values = np.asarray(values, dtype=np.float64)
+    periods = int(periods)
+    result = np.full(len(values), np.nan)
+    if 0 < periods <= len(values):
+        result[periods - 1:] = reduce(sliding_window_view(values, periods), axis=1)
+    return result
+
+
+def rolling_max(values, periods):
+    return rolling(values, periods, np.max)
+
+
+def rolling_min(values, periods):
+    return rolling(values, periods, np.min)
+
+
+def rolling_sum(values, periods):
+    return rolling(values, periods, np.sum)
+
+
+def rolling_mean(values, periods):
+    return rolling(values, periods, np.mean)
+
+
+def streak(condition):
+    # Number of rows in a row the condition has held, through this one
+    condition = np.asarray(condition, dtype=bool)
+    positions = np.arange(len(condition))
+    last_false = np.maximum.accumulate(np.where(condition, -1, positions))
+    return positions - last_false
+
+
+def get_day_functions(day_start):
+    # Functions over the bars of each day given the position of every day's first bar (plus the end), the
+    # result repeated for every bar of the day
+    counts = np.diff(day_start)
+    first = day_start[:-1]
+
+    def per_day(values, reduce):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return values
+        return np.repeat(reduce.reduceat(values, first), counts)
+
+    def running(values, accumulate):
+        # Loops over days, not bars
+        values = np.asarray(values, dtype=np.float64)
+        result = np.empty(len(values))
+        for start, stop in zip(first, day_start[1:]):
+            result[start:stop] = accumulate(values[start:stop])
+        return result
+
+    return {'day_max': lambda values: per_day(values, np.maximum),
+            'day_min': lambda values: per_day(values, np.minimum),
+            'day_sum': lambda values: per_day(values, np.add),
+            'day_first': lambda values: np.repeat(np.asarray(values)[first], counts),
+            'day_last': lambda values: np.repeat(np.asarray(values)[day_start[1:] - 1], counts),
+            'day_cummax': lambda values: running(values, np.maximum.accumulate),
+            'day_cummin': lambda values: running(values, np.minimum.accumulate)}
+
+
+functions = {'shift': shift, 'rolling_max': rolling_max, 'rolling_min': rolling_min, 'rolling_sum': rolling_sum,
+             'rolling_mean': rolling_mean, 'streak': streak, 'where': np.where, 'abs': np.abs, 'round': np.round,
+             'minimum': np.minimum, 'maximum': np.maximum, 'isnan': np.isnan, 'nan': np.nan, **feature_kinds}
+
+
+@lru_cache(maxsize=None)
+def compile_expression(expression):
+    return compile(expression, f'<{expression}>', 'eval')
+
+
+def evaluate(expression, namespace, length=None):
+    # Expression (or a plain number) -> array of length rows, its value as is without length
+    if isinstance(expression, str):
+        expression = eval(compile_expression(expression), {'__builtins__': {}}, namespace)
+    if length is None:
+        return expression
+    value = np.asanyarray(expression)
+    return value if value.shape == (length,) else np.broadcast_to(value, (length,))
+
+
+def resample(df, period):
+    # Weekly or monthly bars labelled by their first day, like CandleBreakOut makes them
+    df = df.resample('W' if period == 'week' else 'M').agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    if period == 'week':
+        df.index -= pd.tseries.frequencies.to_offset('6D')
+    else:
+        df.index -= pd.tseries.frequencies.to_offset('1M')
+        df.index += pd.tseries.frequencies.to_offset('1D')
+    return df
+
+
+def get_daily_frame(df):
+    days = day_keys(df.index)
+    return {'open': df['open'].to_numpy(np.float64), 'high': df['high'].to_numpy(np.float64),
+            'low': df['low'].to_numpy(np.float64), 'close': df['close'].to_numpy(np.float64),
+            'volume': df['volume'].to_numpy(np.float64), 'time': df.index.asi8.view(Times), 'day': days,
+            'index': np.arange(len(df)), **get_day_functions(np.arange(len(df) + 1))}
+
+
+def get_minute_frame(bars):
+    days = np.repeat(bars.day, np.diff(bars.day_start))
+    pre_open, regular_open, regular_close, post_close = get_calendar().session_minutes(days)
+    return {'open': bars.open, 'high': bars.high, 'low': bars.low, 'close': bars.close,
+            'volume': bars.volume.astype(np.float64), 'time': bars.time.view(Times), 'day': days,
+            'index': np.arange(len(bars)), 'minute': bars.minutes(), 'pre_open': pre_open,
+            'regular_open': regular_open, 'regular_close': regular_close, 'post_close': post_close,
+            **get_day_functions(bars.day_start)}
+
+
+def evaluate_scan(definition, scan, frame, params):
+    # Positions of the hits in the frame and the output columns at them
+    length = len(frame['index'])
+    namespace = {**functions, **params, **frame}
+    for name, expression in {**scan.get('let', {}), **definition.get('let', {})}.items():
+        namespace[name] = evaluate(expression, namespace)
+    if 'sides' in definition:
+        side = np.full(length, None, dtype=object)
+        # Last assignment wins, so the first side listed takes precedence
+        for name, condition in reversed(list(definition['sides'].items())):
+            side[evaluate(condition, namespace, length).astype(bool)] = name
+        namespace['side'] = side
+        hit = np.not_equal(side, None)
+    else:
+        hit = evaluate(definition['condition'], namespace, length).astype(bool)
+    if 'where' in definition:
+        hit &= evaluate(definition['where'], namespace, length).astype(bool)
+    positions = np.flatnonzero(hit)
+    return positions, {name: evaluate(expression, namespace, length)[positions]
+                       for name, expression in definition['columns'].items()}
+
+
+def format_column(values):
+    if isinstance(values, Times):
+        index = pd.DatetimeIndex(values.view(np.ndarray), tz='UTC').tz_convert(TZ)
+        return [None if value is pd.NaT else str(value) for value in index]
+    return np.asarray(values)
+
+
+@lru_cache(maxsize=None)
+def load_definition(name):
+    with open(DEFINITIONS_DIR / f'{name}.json') as f:
+        return json.load(f)
+
+
+def get_definition(name):
+    return DEFINITIONS[name] if name in DEFINITIONS else load_definition(name)
+
+
+class RuleScanner(BaseScanner):
+    # Runs a scan definition, given by name (DEFINITIONS or definitions/<name>.json) or as a dict
+    def __init__(self, client, symbol: str, start_date: str, end_date: str, minimum_price: float, maximum_price: float,
+                 minimum_average_turnover: float, minimum_average_volume: int, adjusted: bool = False,
+                 outside_normal_session: bool = True, definition=None, **params):
+        super().__init__(client, symbol, start_date, end_date, minimum_price, maximum_price, minimum_average_turnover,
+                         minimum_average_volume, adjusted, outside_normal_session)
+        self.definition = get_definition(definition) if isinstance(definition, str) else definition
+        missing = [name for name in self.definition.get('params', []) if name not in params]
+        if missing:
+            raise TypeError(f'{definition} definition needs params {missing}')
+        self.params = params
+        self.time_frames = ('day',) if self.definition['bars'] == 'day' else ('day', 'minute')
+        self.records = pd.DataFrame(columns=['symbol', 'scan_name', *self.definition['columns'],
+                                             *TICKER_DETAIL_COLUMNS])
+
+    def get_data_version(self):
+        # Cached results are of the definition as well as of the bars
+        version = super().get_data_version()
+        if version is None:
+            return None
+        definition = hashlib.sha1(json.dumps(self.definition, sort_keys=True).encode()).hexdigest()
+        return f'{version}|definition:{definition}'
+
+    def run(self):
+        self.get_candles_data()
+        if self.daily_data is None or not len(self.daily_data) or \
+                ('minute' in self.time_frames and (self.minute_bars is None or not len(self.minute_bars))):
+            logger.debug('%s: No Data Found, check inputs again!', self.symbol)
+            return
+        with self.stage('run_scan'):
+            frames = [self.run_scan(scan) for scan in self.definition.get('scans', [{'scan_name': 'Rules'}])]
+        frames = [df for df in frames if len(df)]
+        if frames:
+            self.records = pd.concat(frames, ignore_index=True)
+        return self.records
+
+    def run_scan(self, scan):
+        if self.definition['bars'] == 'day':
+            df = resample(self.daily_data, scan['resample']) if scan.get('resample') else self.daily_data
+            frame = get_daily_frame(df)
+        else:
+            frame = get_minute_frame(self.minute_bars)
+        params = {name: getattr(self, name) for name in BASE_PARAMS}
+        params.update(self.params)
+        positions, columns = evaluate_scan(self.definition, scan, frame, params)
+        records = pd.DataFrame({'symbol': self.symbol, 'scan_name': scan['scan_name'],
+                                **{name: format_column(values) for name, values in columns.items()}},
+                               index=range(len(positions)))
+        details = []
+        for day in frame['day'][positions]:
+            try:
+                details.append(self.client.get_ticker_details(symbol=self.symbol, date=str(key_to_date(day))))
+            except Exception as e:
+                logger.exception(e)
+                break
+        records = records.iloc[:len(details)]
+        if len(details):
+            records = pd.concat([records, pd.DataFrame(details, index=records.index)], axis=1)
+        return records
+
+
+def check(name, size_name='small', seed=0):
+    # Hits of a built in definition against those of the scanner it re-expresses on the same synthetic bars, in
+    # the columns both have. Prices and turnover aren't filtered so every symbol gets scanned.
+    from scanner.benchmark import BENCHMARK_PARAMS, get_client
+    from scanner.registry import get_scanner_class
+
+    client = get_client(size_name, seed)
+    params = dict(BENCHMARK_PARAMS[name], start_date=client.history_start, end_date=client.history_end,
+                  adjusted=False, minimum_price=0, maximum_price=10 ** 9, minimum_average_turnover=0,
+                  minimum_average_volume=0)
+    results, seconds = dict(), dict()
+    for label, scanner_class, extra in [('original', get_scanner_class(name), {}),
+                                        ('rules', RuleScanner, {'definition': name})]:
+        start = t.perf_counter()
+        frames = [scanner_class(client=client, symbol=symbol, **params, **extra).run() for symbol in client.symbols]
+        seconds[label] = t.perf_counter() - start
+        frames = [df for df in frames if df is not None and len(df)]
+        results[label] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    original, rules = results['original'], results['rules']
+    columns = [c for c in rules.columns if c in original.columns and c not in TICKER_DETAIL_COLUMNS]
+    differing = abs(len(original) - len(rules))
+    if len(original) and len(rules):
+        rows = min(len(original), len(rules))
+        differing += int((original[columns].iloc[:rows].astype(str).reset_index(drop=True) !=
+                          rules[columns].iloc[:rows].astype(str).reset_index(drop=True)).any(axis=1).sum())
+    logger.info(f'{name}: {len(rules)} hits, {len(original)} by {get_scanner_class(name).__name__}, '
+                f'{differing} differ in {", ".join(columns)}; {seconds["rules"]:.3f}s against '
+                f'{seconds["original"]:.3f}s')
+    return differing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py rules', description='Scans defined as expressions over bars')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='built in and definitions/*.json definitions')
+    sub = subparsers.add_parser('check', help='compare built in definitions with the scanners they re-express')
+    sub.add_argument('names', nargs='*', metavar='name',
+                     help=f'some of {", ".join(DEFINITIONS)}, all by default')
+    sub.add_argument('--size', default='small', help='synthetic data size, see run.py bench')
+    sub.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        from scanner.registry import definition_names
+        for name in [*DEFINITIONS, *definition_names()]:
+            print(name)
+        return
+    unknown = [name for name in args.names if name not in DEFINITIONS]
+    if unknown:
+        parser.error(f'no built in definitions {unknown}')
+    differing = sum(check(name, args.size, args.seed) for name in args.names or DEFINITIONS)
+    sys.exit(1 if differing else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import time as t
+
+from scanner.metrics import metrics
+from scanner.profiling import run_profiled
+from scanner.settings import logger, DATA_DIR, TIMINGS_FILE
+
+
+class TaskScheduler:
+    def __init__(self, scan_name, client=None, timings_file=TIMINGS_FILE, smoothing=0.5):
+        self.scan_name = scan_name
+        self.client = client
+        self.timings_file = timings_file
+        self.smoothing = smoothing
+        self.timings = self.load_timings().get(scan_name, {})
+        self.new_timings = dict()
+
+    def load_timings(self):
+        try:
+            with open(self.timings_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict()
+
+    def estimate_costs(self, symbols):
+        # Prior run timings are the best estimate, archived bar sizes scaled to seconds are next,
+        # symbols we know nothing about are assumed heavy so they don't end up at the tail
+        sizes = self.client.get_archive_sizes(time_frame='minute') if self.client is not None else {}
+        rates = [self.timings[s] / sizes[s] for s in self.timings if sizes.get(s)]
+        seconds_per_byte = statistics.median(rates) if rates else None
+        costs = dict()
+        for symbol in symbols:
+            if symbol in self.timings:
+                costs[symbol] = self.timings[symbol]
+            elif sizes.get(symbol) and (seconds_per_byte is not None or not self.timings):
+                costs[symbol] = sizes[symbol] * (seconds_per_byte or 1)
+        default_cost = max(costs.values(), default=0)
+        return {symbol: costs.get(symbol, default_cost) for symbol in symbols}
+
+    def order(self, scan_instances):
+        # Indices of scan instances, heaviest first
+        costs = self.estimate_costs([obj.symbol for obj in scan_instances])
+        return sorted(range(len(scan_instances)), key=lambda i: costs[scan_instances[i].symbol], reverse=True)
+
+    def record(self, symbol, elapsed):
+        if elapsed is None:
+            return
+        prior = self.timings.get(symbol)
+        if prior is not None:
+            elapsed = self.smoothing * elapsed + (1 - self.smoothing) * prior
+        self.timings[symbol] = self.new_timings[symbol] = round(elapsed, 4)
+
+    def save(self):
+        if not self.new_timings:
+            return
+        # Create data directory if not already exists
+        if not os.path.exists(DATA_DIR):
+            os.mkdir(DATA_DIR)
+        # Reload before writing so concurrent runs of other scanners aren't overwritten
+        timings = self.load_timings()
+        timings.setdefault(self.scan_name, {}).update(self.new_timings)
+        tmp_file = f'{self.timings_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(timings, f)
+        os.replace(tmp_file, self.timings_file)
+        logger.debug(f'Saved task timings of {len(self.new_timings)} symbols to {self.timings_file}')
+
+
+def run_timed_task(task):
+    # Returns the stage metrics recorded while running the task as well, so workers can report them to the parent
+    index, obj, result_cache = task
+    with metrics.task(type(obj).__name__, obj.symbol):
+        if result_cache is not None:
+            with metrics.stage('result_cache_lookup'):
+                hit, res = result_cache.get(obj)
+            if hit:
+                metrics.incr('result_cache_hit')
+                # No timing, a cache hit says nothing about how heavy the symbol is to scan
+                return index, res, None, metrics.snapshot()
+        start = t.perf_counter()
+        with metrics.stage('task'):
+            res = obj.run() if obj.profile is None else run_profiled(obj)
+        elapsed = t.perf_counter() - start
+        if result_cache is not None:
+            result_cache.put(obj, res)
+    return index, res, elapsed, metrics.snapshot()
@@ -0,0 +1,195 @@
+import argparse
+import json
+import sys
+import threading
+import time as t
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from scanner.clients.polygon import PolygonClient
+from scanner.controller import get_api_key, get_params, get_reference_data, get_reverse_split_df, scanner_class_dict
+from scanner.settings import logger, TZ
+
+
+class BarCache:
+    # Data client wrapper keeping the frames of recent get_data calls in memory, least recently used ones are
+    # dropped once they take more than max_bytes. Ranges reaching today expire after max_age seconds since their
+    # bars are still coming in. Everything else is handed to the wrapped client.
+    def __init__(self, client, max_bytes=2 ** 30, max_age=60):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_summary(self, *args, **kwargs):
+        return self.client.get_summary(*args, **kwargs)
+
+    def get_data(self, symbol, start_date, end_date, time_frame, multiplier, limit=50000, adjusted=False, sort='asc',
+                 outside_normal_session=True):
+        key = (symbol, str(start_date), str(end_date), time_frame, multiplier, adjusted, sort, outside_normal_session)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[2] is None or entry[2] > t.monotonic()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        df = self.client.get_data(symbol=symbol, start_date=start_date, end_date=end_date, time_frame=time_frame,
+                                  multiplier=multiplier, limit=limit, adjusted=adjusted, sort=sort,
+                                  outside_normal_session=outside_normal_session)
+        if df is None:
+            return df
+        size = int(df.memory_usage(index=True).sum())
+        today = str(pd.Timestamp.now(tz=TZ).date())
+        expires = t.monotonic() + self.max_age if str(end_date)[:10] >= today else None
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.entries[key] = (df, size, expires)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, dropped, _) = self.entries.popitem(last=False)
+                self.bytes -= dropped
+        return df
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'symbols': len({key[0] for key in self.entries}),
+                    'mb': round(self.bytes / 2 ** 20, 1), 'max_mb': round(self.max_bytes / 2 ** 20, 1),
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class ScanServer(ThreadingHTTPServer):
+    # Resident scanner answering scan requests over http. Reference data and the bars of recently scanned symbols
+    # stay in memory between requests, symbols of all requests are scanned by one shared pool of threads.
+    daemon_threads = True
+
+    def __init__(self, address, client, workers=8):
+        super().__init__(address, ScanRequestHandler)
+        self.client = client
+        self.executor = ThreadPoolExecutor(workers)
+        self.started = t.time()
+        self.requests = 0
+
+    def scan(self, request):
+        # request: {"filter": name, "symbols": [...] (default all of the ticker types), "params": {...}}, params
+        # replace values of the filter's params sheet like --set does
+        started = t.perf_counter()
+        filter_name = request.get('filter')
+        if filter_name not in scanner_class_dict:
+            raise ValueError(f'filter must be one of {list(scanner_class_dict)}')
+        loaded = get_params(filter_name, request.get('params_file'), request.get('params'))
+        if loaded is None:
+            raise ValueError(f'params of {filter_name} could not be read, see the server log')
+        _, params = loaded
+        params.pop('output_file')
+        params.pop('output_formats')
+        ticker_types = params.pop('ticker_types')
+
+        tickers, exchanges = get_reference_data(self.client, ticker_types)
+        symbols = request.get('symbols') or [s['symbol'] for s in tickers]
+        if filter_name == 'reverse_split':
+            reverse_split_df = get_reverse_split_df()
+            if reverse_split_df is None:
+                raise ValueError('rs_list.xlsx could not be read, see the server log')
+            symbols = [s for s in symbols if s in reverse_split_df.index]
+            params['rs_split_df'] = reverse_split_df
+
+        scanner_class = scanner_class_dict[filter_name]
+        scan_instances = [scanner_class(client=self.client, symbol=s, **params) for s in symbols]
+        results = [future.result() for future in [self.executor.submit(obj.run) for obj in scan_instances]]
+        frames = [result for result in results if result is not None and len(result)]
+        hits = []
+        if frames:
+            tickers_df = pd.merge(pd.DataFrame(data=tickers), exchanges, how='inner', on='exchange')
+            df = pd.merge(tickers_df, pd.concat(frames, ignore_index=True), on='symbol', how='inner')
+            hits = json.loads(df.to_json(orient='records', date_format='iso'))
+        seconds = t.perf_counter() - started
+        logger.debug(f'Served {filter_name} for {len(scan_instances)} symbols, {len(hits)} hits in {seconds:.3f}s')
+        return {'filter': filter_name, 'symbols': len(scan_instances), 'hits': hits, 'seconds': round(seconds, 3)}
+
+    def status(self):
+        return {'uptime': round(t.time() - self.started), 'requests': self.requests,
+                'filters': list(scanner_class_dict), 'cache': self.client.stats()}
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+class ScanRequestHandler(BaseHTTPRequestHandler):
+    # POST /scan with a json request, GET /status for uptime and cache usage
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/status':
+            self.send_json(200, self.server.status())
+        else:
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/scan':
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+            return
+        self.server.requests += 1
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            self.send_json(200, self.server.scan(request))
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception(e)
+            self.send_json(500, {'error': str(e)})
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='run.py serve',
+                                     description='Keep a scanner running and answer scan requests over http')
+    parser.add_argument('--host', default='127.0.0.1', help='only local clients by default')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=8, help='threads scanning symbols, shared by all requests')
+    parser.add_argument('--cache-mb', type=int, default=1024, help='bars kept in memory between requests')
+    parser.add_argument('--max-age', type=float, default=60,
+                        help='seconds bars of ranges ending today are kept, they are still coming in')
+    args = parser.parse_args(argv)
+
+    api_key = get_api_key()
+    if api_key is None:
+        return
+    client = BarCache(PolygonClient(api_key=api_key, archive_data=True, use_archived_data=True),
+                      max_bytes=args.cache_mb * 2 ** 20, max_age=args.max_age)
+    server = ScanServer((args.host, args.port), client, workers=args.workers)
+    logger.debug(f'Scan server listening on http://{args.host}:{args.port}, POST /scan, GET /status')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,41 +1,76 @@
-import logging
-import os
-import warnings
-from datetime import datetime
-from pathlib import Path
-
-import pytz
-
-warnings.filterwarnings('ignore')
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-CONFIG_DIR = BASE_DIR / 'config'
-LOGS_DIR = BASE_DIR / 'logs'
-RECORDS_DIR = BASE_DIR / 'records'
-DATA_DIR = BASE_DIR / 'data'
-TZ = pytz.timezone('US/Eastern')
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s:%(message)s')
-
-if not os.path.exists(LOGS_DIR):
-    os.mkdir(LOGS_DIR)
-file_handler = logging.FileHandler(BASE_DIR / f'logs/{datetime.now(tz=TZ).date()}_run.log')
-
-file_handler.setFormatter(formatter)
-
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
-
-
-def customTime(*args):
-    utc_dt = pytz.utc.localize(datetime.utcnow())
-    converted = utc_dt.astimezone(TZ)
-    return converted.timetuple()
-
-
-logging.Formatter.converter = customTime
+import logging
+import os
+import warnings
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import pytz
+
+from scanner.log import JsonFormatter, LazyFileHandler, SamplingFilter, parse_sampling
+
+warnings.filterwarnings('ignore')
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CONFIG_DIR = BASE_DIR / 'config'
+LOGS_DIR = BASE_DIR / 'logs'
+RECORDS_DIR = BASE_DIR / 'records'
+JOURNAL_DIR = BASE_DIR / 'journal'
+METRICS_DIR = BASE_DIR / 'metrics'
+BENCHMARKS_DIR = BASE_DIR / 'benchmarks'
+PROFILES_DIR = BASE_DIR / 'profiles'
+RESULTS_DB_FILE = RECORDS_DIR / 'results.sqlite'
+# Point SCANNER_DATA_DIR at a shared mount so workers on several hosts use one bar archive
+DATA_DIR = Path(os.environ.get('SCANNER_DATA_DIR', BASE_DIR / 'data'))
+TIMINGS_FILE = DATA_DIR / 'task_timings.json'
+BARS_DIR = DATA_DIR / 'bars'
+RESULTS_CACHE_DIR = DATA_DIR / 'results'
+# Disk budget of the bar archive in MB and days partitions are kept without being read, 0 for no limit
+ARCHIVE_BUDGET_MB = int(os.environ.get('SCANNER_ARCHIVE_BUDGET_MB', 0))
+ARCHIVE_MAX_AGE_DAYS = int(os.environ.get('SCANNER_ARCHIVE_MAX_AGE_DAYS', 0))
+# Scans defined as expressions, see scanner.rules
+DEFINITIONS_DIR = BASE_DIR / 'definitions'
+# Shared directory work units are queued in for workers on other hosts, run locally when not set
+QUEUE_DIR = os.environ.get('SCANNER_QUEUE_DIR')
+# Seconds a run waits on a queue without any live worker before giving up, 0 to wait forever
+QUEUE_WORKER_TIMEOUT = int(os.environ.get('SCANNER_QUEUE_WORKER_TIMEOUT', 300))
+TZ = pytz.timezone('US/Eastern')
+# Polygon requests per minute of each process (0 for plans without a limit) and threads fetching a long range
+API_REQUESTS_PER_MINUTE = int(os.environ.get('SCANNER_API_RATE_LIMIT', 0))
+FETCH_THREADS = int(os.environ.get('SCANNER_FETCH_THREADS', 4))
+# Memory the pool workers of a process may take together in MB, 0 for three quarters of physical memory
+MEMORY_BUDGET_MB = int(os.environ.get('SCANNER_MEMORY_BUDGET_MB', 0))
+# text or json, json writes one object per line
+LOG_FORMAT = os.environ.get('SCANNER_LOG_FORMAT', 'text')
+# e.g. DEBUG=20 keeps the first few of each debug message and then one in 20, most of them are per symbol
+LOG_SAMPLING = parse_sampling(os.environ.get('SCANNER_LOG_SAMPLING'))
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+formatter = JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter('%(asctime)s:%(message)s')
+if LOG_SAMPLING:
+    logger.addFilter(SamplingFilter(LOG_SAMPLING))
+
+# Log file and its folder are only created once something gets logged
+file_handler = LazyFileHandler(LOGS_DIR / f'{datetime.now(tz=TZ).date()}_run.log')
+
+file_handler.setFormatter(formatter)
+
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(formatter)
+
+logger.addHandler(file_handler)
+logger.addHandler(stream_handler)
+
+
+@lru_cache(maxsize=64)
+def eastern_time(second):
+    return datetime.fromtimestamp(second, tz=TZ).timetuple()
+
+
+def customTime(secs):
+    # Time the record was created rather than formatted, milliseconds are added by the formatter
+    return eastern_time(int(secs))
+
+
+logging.Formatter.converter = staticmethod(customTime)
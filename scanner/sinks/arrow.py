@@ -0,0 +1,11 @@
+from scanner.sinks.base import ColumnarSink
+
+
+class ArrowSink(ColumnarSink):
+    extension = 'arrow'
+
+    def append(self, df):
+        table = self.to_table(df)
+        if self.writer is None:
+            self.writer = self.pa.ipc.new_file(self.file, self.schema)
+        self.writer.write_table(table)
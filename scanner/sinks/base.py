@@ -0,0 +1,82 @@
+from abc import ABCMeta, abstractmethod
+
+import pandas as pd
+
+from scanner.settings import logger
+
+
+class OutputSink(metaclass=ABCMeta):
+    extension = None
+
+    def __init__(self, path):
+        # path without extension, files are only created once the first rows arrive
+        self.path = path
+        self.file = f'{path}.{self.extension}'
+        self.columns = None
+        self.dropped_columns = set()
+        self.rows = 0
+
+    def conform(self, df):
+        # Column set is fixed by the first batch, later batches are aligned to it
+        if self.columns is None:
+            self.columns = list(df.columns)
+        else:
+            extra = [c for c in df.columns if c not in self.columns and c not in self.dropped_columns]
+            if extra:
+                logger.debug(f'{self.file}: dropping columns {extra} not present in first results')
+                self.dropped_columns.update(extra)
+            df = df.reindex(columns=self.columns)
+        return df
+
+    def write(self, df: pd.DataFrame):
+        if df is None or not len(df):
+            return
+        self.append(self.conform(df))
+        self.rows += len(df)
+
+    @abstractmethod
+    def append(self, df: pd.DataFrame):
+        pass
+
+    def write_params(self, params_df: pd.DataFrame):
+        if self.rows:
+            params_df.to_csv(f'{self.path}_parameters.csv', index=False)
+
+    def close(self):
+        pass
+
+
+class ColumnarSink(OutputSink, metaclass=ABCMeta):
+    # Arrow based formats need a fixed type per column: numbers become float64 and everything else strings
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            import pyarrow
+        except ImportError as e:
+            logger.exception(e)
+            logger.debug(f'pyarrow is required to write {self.extension} files, install it with pip install pyarrow')
+            raise
+        self.pa = pyarrow
+        self.schema = None
+        self.writer = None
+
+    def to_table(self, df):
+        if self.schema is None:
+            fields = []
+            for column in df.columns:
+                numeric = pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+                fields.append(self.pa.field(str(column), self.pa.float64() if numeric else self.pa.string()))
+            self.schema = self.pa.schema(fields)
+        data = dict()
+        for field in self.schema:
+            values = df[field.name]
+            if field.type == self.pa.float64():
+                data[field.name] = pd.to_numeric(values, errors='coerce').astype('float64')
+            else:
+                data[field.name] = values.map(lambda x: None if pd.isna(x) else str(x))
+        return self.pa.Table.from_pandas(pd.DataFrame(data), schema=self.schema, preserve_index=False)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
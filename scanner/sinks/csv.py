@@ -0,0 +1,8 @@
+from scanner.sinks.base import OutputSink
+
+
+class CsvSink(OutputSink):
+    extension = 'csv'
+
+    def append(self, df):
+        df.to_csv(self.file, mode='a', header=not self.rows, index=False)
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from scanner.settings import logger
+from scanner.sinks.base import OutputSink
+
+EXCEL_MAX_ROWS = 1048576
+
+
+class ExcelSink(OutputSink):
+    extension = 'xlsx'
+
+    def __init__(self, path):
+        super().__init__(path)
+        from openpyxl import Workbook
+        # Write-only workbooks stream rows out instead of keeping every cell object in memory
+        self.Workbook = Workbook
+        self.workbook = None
+        self.sheet = None
+        self.truncated = False
+
+    @staticmethod
+    def to_cell(value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        return value.item() if hasattr(value, 'item') else value
+
+    def append(self, df):
+        if self.workbook is None:
+            self.workbook = self.Workbook(write_only=True)
+            self.sheet = self.workbook.create_sheet('Results')
+            self.sheet.append(list(df.columns))
+        if self.rows + len(df) >= EXCEL_MAX_ROWS:
+            if not self.truncated:
+                logger.debug(f'{self.file}: more results than excel can hold, use csv, parquet, arrow or sqlite '
+                             f'output for the complete results')
+                self.truncated = True
+            df = df.iloc[:max(EXCEL_MAX_ROWS - 1 - self.rows, 0)]
+        for row in df.itertuples(index=False, name=None):
+            self.sheet.append([self.to_cell(v) for v in row])
+
+    def write_params(self, params_df):
+        if self.workbook is None:
+            return
+        sheet = self.workbook.create_sheet('Parameters')
+        sheet.append(list(params_df.columns))
+        for row in params_df.itertuples(index=False, name=None):
+            sheet.append([self.to_cell(v) for v in row])
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.save(self.file)
+            self.workbook = None
@@ -0,0 +1,12 @@
+from scanner.sinks.base import ColumnarSink
+
+
+class ParquetSink(ColumnarSink):
+    extension = 'parquet'
+
+    def append(self, df):
+        table = self.to_table(df)
+        if self.writer is None:
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(self.file, self.schema)
+        self.writer.write_table(table)
@@ -0,0 +1,36 @@
+import sqlite3
+
+from scanner.sinks.base import OutputSink
+
+
+class SqliteSink(OutputSink):
+    extension = 'sqlite'
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.connection = None
+
+    def conform(self, df):
+        # SQLite columns can be added later, so nothing is dropped
+        return df
+
+    def append(self, df):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.file)
+        else:
+            existing = {row[1] for row in self.connection.execute('PRAGMA table_info(results)')}
+            for column in df.columns:
+                if column not in existing:
+                    self.connection.execute(f'ALTER TABLE results ADD COLUMN "{column}"')
+        df.to_sql('results', self.connection, if_exists='append', index=False)
+        self.connection.commit()
+
+    def write_params(self, params_df):
+        if self.connection is not None:
+            params_df.astype(str).to_sql('parameters', self.connection, if_exists='replace', index=False)
+            self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,405 @@
+import hashlib
+import json
+import os
+import pickle
+import time as t
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from scanner.settings import BARS_DIR, TZ
+from scanner.timeindex import NS_PER_DAY, NS_PER_MINUTE
+from scanner.trading_calendar import get_calendar
+
+
+def adjust_for_splits(df, splits):
+    # Raw bars -> split adjusted ones. splits is [(ex date, ratio)], ratio is what prices before the ex date are
+    # multiplied by, 0.5 for a 2 for 1 split and 10 for a 1 for 10 reverse split
+    if not splits or not len(df):
+        return df
+    ex_dates = pd.DatetimeIndex([pd.Timestamp(ex_date, tz=TZ) for ex_date, _ in splits])
+    ratios = np.array([ratio for _, ratio in splits], dtype=np.float64)
+    order = np.argsort(ex_dates.asi8)
+    # Factor of a bar is the product of the ratios of all splits after it
+    factors = np.concatenate([np.cumprod(ratios[order][::-1])[::-1], [1]])
+    factor = factors[np.searchsorted(ex_dates.asi8[order], df.index.asi8, 'right')]
+    if (factor == 1).all():
+        return df
+    df = df.copy()
+    for column in ['open', 'high', 'low', 'close']:
+        df[column] = df[column] * factor
+    df['volume'] = df['volume'] / factor
+    return df
+
+
+def regular_session(df, time_frame):
+    # Bars of the regular session of each day, up to 13:00 on early close days. Hour bars start at the hour the
+    # session opens in, so 09:00 is kept.
+    if time_frame not in ['minute', 'hour'] or not len(df):
+        return df
+    wall = df.index.tz_convert(TZ).tz_localize(None).asi8
+    minutes = (wall % NS_PER_DAY) // NS_PER_MINUTE
+    _, opens, closes, _ = get_calendar().session_minutes(wall // NS_PER_DAY)
+    if time_frame == 'hour':
+        opens = opens // 60 * 60
+    return df[(minutes >= opens) & (minutes < closes)]
+
+
+def summarize(df):
+    # Summary of a month of raw daily bars, what scanner prefilters need without loading the bars
+    if not len(df):
+        return {'bars': 0}
+    days = df.index.tz_convert(TZ).strftime('%Y-%m-%d')
+    sub_dollar = np.flatnonzero(df['high'].to_numpy() < 1)
+    return {'bars': len(df), 'first_day': days[0], 'last_day': days[-1], 'last_close': float(df['close'].iloc[-1]),
+            'volume_sum': float(df['volume'].sum()), 'close_sum': float(df['close'].sum()),
+            'min_low': float(df['low'].min()), 'max_high': float(df['high'].max()),
+            'min_high': float(df['high'].min()), 'sub_dollar_days': len(sub_dollar),
+            'first_sub_dollar_day': days[sub_dollar[0]] if len(sub_dollar) else None,
+            'last_sub_dollar_day': days[sub_dollar[-1]] if len(sub_dollar) else None}
+
+
+def month_names(index):
+    # 'YYYY-MM' of every timestamp, by its US/Eastern date
+    return index.tz_convert(TZ).tz_localize(None).values.astype('datetime64[M]').astype(str)
+
+
+def merge_ranges(ranges):
+    # Inclusive (start, end) date ranges -> sorted ranges, overlapping and adjacent ones joined
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_range(ranges, start, end):
+    # Sorted inclusive date ranges with start - end taken out
+    result = []
+    for range_start, range_end in ranges:
+        if range_end < start or range_start > end:
+            result.append((range_start, range_end))
+            continue
+        if range_start < start:
+            result.append((range_start, start - timedelta(days=1)))
+        if range_end > end:
+            result.append((end + timedelta(days=1), range_end))
+    return result
+
+
+def months(start, end):
+    # 'YYYY-MM' of every month from start to end
+    return [str(month) for month in pd.period_range(start, end, freq='M')]
+
+
+def partition_range(name):
+    # First and last day of a partition, a month ('YYYY-MM') or a compacted year ('YYYY')
+    if len(name) == 4:
+        return date(int(name), 1, 1), date(int(name), 12, 31)
+    start = date.fromisoformat(f'{name}-01')
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def parse_ranges(ranges):
+    return [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in ranges]
+
+
+class BarStore:
+    # Single canonical copy of the bars of every symbol, unadjusted and with all sessions, in monthly partitions
+    # under {time frame}/{symbol}/{YYYY-MM}.pickle, past years can be compacted into one {YYYY}.pickle. The date
+    # ranges fetched so far and the size and checksum of every partition are in catalog.json. Split adjustment and
+    # the regular session are applied when reading, so every combination of params shares it.
+    def __init__(self, root=BARS_DIR):
+        self.root = root
+
+    def get_dir(self, symbol, time_frame, multiplier):
+        return self.root / f'{multiplier}{time_frame}' / symbol.replace('/', '-')
+
+    @staticmethod
+    def dump(obj, path, text=False):
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        data = None
+        with open(tmp_path, 'w' if text else 'wb') as f:
+            if text:
+                json.dump(obj, f)
+            else:
+                data = pickle.dumps(obj)
+                f.write(data)
+        os.replace(tmp_path, path)
+        # [bytes, sha1] of a partition, for the catalog
+        return None if text else [len(data), hashlib.sha1(data).hexdigest()]
+
+    @staticmethod
+    def touch(path):
+        # Marks a partition as read for eviction. The access time is set explicitly since file systems mounted with
+        # noatime or relatime don't, the modification time stays as data versions depend on it.
+        try:
+            os.utime(path, ns=(t.time_ns(), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+
+    def get_catalog(self, directory):
+        # {'coverage': [[start, end]], 'partitions': {file name: [bytes, sha1]}} of a symbol and time frame. Archives
+        # from before the catalog only have coverage.json, their partitions get checksums once written or verified.
+        try:
+            with open(directory / 'catalog.json') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        try:
+            with open(directory / 'coverage.json') as f:
+                coverage = json.load(f)
+        except (FileNotFoundError, ValueError):
+            coverage = []
+        return {'coverage': coverage, 'partitions': {}}
+
+    def put_catalog(self, directory, catalog):
+        self.dump(catalog, directory / 'catalog.json', text=True)
+        try:
+            os.remove(directory / 'coverage.json')
+        except FileNotFoundError:
+            pass
+
+    def get_coverage(self, symbol, time_frame, multiplier):
+        return parse_ranges(self.get_catalog(self.get_dir(symbol, time_frame, multiplier))['coverage'])
+
+    @staticmethod
+    def get_partition_path(directory, month):
+        # File the bars of a month are in, the year's when it has been compacted
+        year_path = directory / f'{month[:4]}.pickle'
+        return year_path if os.path.exists(year_path) else directory / f'{month}.pickle'
+
+    def get_partitions(self, directory, start_date, end_date):
+        # Stored partition files holding start_date through end_date, in order
+        paths = []
+        for month in months(start_date, end_date):
+            path = self.get_partition_path(directory, month)
+            if (not paths or path != paths[-1]) and os.path.exists(path):
+                paths.append(path)
+        return paths
+
+    def missing(self, symbol, start_date, end_date, time_frame, multiplier):
+        # Date ranges within start_date - end_date that haven't been fetched yet
+        start, end = date.fromisoformat(str(start_date)[:10]), date.fromisoformat(str(end_date)[:10])
+        gaps = []
+        for covered_start, covered_end in self.get_coverage(symbol, time_frame, multiplier):
+            if covered_end < start:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > start:
+                gaps.append((start, covered_start - timedelta(days=1)))
+            start = covered_end + timedelta(days=1)
+        if start <= end:
+            gaps.append((start, end))
+        return [(str(gap_start), str(gap_end)) for gap_start, gap_end in gaps]
+
+    def read(self, symbol, start_date, end_date, time_frame, multiplier):
+        # Stored raw bars from start_date through end_date, None when there are none
+        directory = self.get_dir(symbol, time_frame, multiplier)
+        frames = []
+        for path in self.get_partitions(directory, start_date, end_date):
+            try:
+                with open(path, 'rb') as f:
+                    frames.append(pickle.load(f))
+            except FileNotFoundError:
+                continue
+            self.touch(path)
+        if not frames:
+            return None
+        df = pd.concat(frames)
+        return df[(df.index >= pd.Timestamp(start_date, tz=TZ)) &
+                  (df.index < pd.Timestamp(end_date, tz=TZ) + pd.Timedelta(days=1))]
+
+    def write(self, symbol, df, start_date, end_date, time_frame, multiplier):
+        # Merges fetched raw bars into the partitions and marks start_date - end_date as covered. Today is only
+        # marked once after hours are over, its bars are still coming in until then.
+        directory = self.get_dir(symbol, time_frame, multiplier)
+        summaries = dict()
+        written = dict()
+        if len(df):
+            months_of_bars = month_names(df.index)
+            paths = dict()
+            for month in np.unique(months_of_bars):
+                paths.setdefault(self.get_partition_path(directory, month), []).append(month)
+            for path, path_months in paths.items():
+                part = df[np.isin(months_of_bars, path_months)]
+                try:
+                    with open(path, 'rb') as f:
+                        part = pd.concat([pickle.load(f), part])
+                except FileNotFoundError:
+                    pass
+                part = part[~part.index.duplicated(keep='last')].sort_index()
+                written[path.name] = self.dump(part, path)
+                if time_frame == 'day' and multiplier == 1:
+                    part_months = month_names(part.index)
+                    for month in path_months:
+                        summaries[month] = summarize(part[part_months == month])
+        if summaries:
+            self.put_summaries(symbol, summaries)
+        now = pd.Timestamp.now(tz=TZ)
+        today = now.date() if now.hour >= 20 else now.date() - timedelta(days=1)
+        end = min(date.fromisoformat(str(end_date)[:10]), today)
+        start = date.fromisoformat(str(start_date)[:10])
+        if start > end and not written:
+            return
+        # Reload before writing so ranges and partitions stored by other workers meanwhile aren't lost
+        catalog = self.get_catalog(directory)
+        catalog['partitions'].update(written)
+        if start <= end:
+            coverage = merge_ranges(parse_ranges(catalog['coverage']) + [(start, end)])
+            catalog['coverage'] = [[str(s), str(e)] for s, e in coverage]
+        self.put_catalog(directory, catalog)
+
+    def remove_partition(self, directory, name):
+        # Deletes a partition file and takes its days out of the coverage, they are fetched again when needed.
+        # Monthly summaries of daily bars stay, they are still right.
+        try:
+            os.remove(directory / name)
+        except FileNotFoundError:
+            pass
+        catalog = self.get_catalog(directory)
+        catalog['partitions'].pop(name, None)
+        start, end = partition_range(name[:-len('.pickle')])
+        coverage = subtract_range(parse_ranges(catalog['coverage']), start, end)
+        catalog['coverage'] = [[str(s), str(e)] for s, e in coverage]
+        self.put_catalog(directory, catalog)
+
+    def compact(self, directory, year):
+        # Joins the monthly partitions of a past year into one file, one read instead of twelve. Bars written into
+        # the year by another process while this runs may be lost, years before the current one rarely get any.
+        paths = sorted(directory.glob(f'{year}-[0-9][0-9].pickle'))
+        year_path = directory / f'{year}.pickle'
+        frames = []
+        for path in ([year_path] if os.path.exists(year_path) else []) + paths:
+            with open(path, 'rb') as f:
+                frames.append(pickle.load(f))
+        if directory.parent.name == '1day':
+            # Summaries are kept per month, made here for months archived before they were
+            summaries = self.load_summaries(directory / 'summary.json')
+            missing = {path.stem: summarize(frame) for path, frame in zip(paths, frames[-len(paths):])
+                       if path.stem not in summaries}
+            if missing:
+                summaries.update(missing)
+                self.dump(summaries, directory / 'summary.json', text=True)
+        df = pd.concat(frames)
+        entry = self.dump(df[~df.index.duplicated(keep='last')].sort_index(), year_path)
+        catalog = self.get_catalog(directory)
+        for path in paths:
+            catalog['partitions'].pop(path.name, None)
+        catalog['partitions'][year_path.name] = entry
+        self.put_catalog(directory, catalog)
+        for path in paths:
+            os.remove(path)
+
+    def get_summary_path(self, symbol):
+        return self.get_dir(symbol, 'day', 1) / 'summary.json'
+
+    def get_summaries(self, symbol):
+        return self.load_summaries(self.get_summary_path(symbol))
+
+    @staticmethod
+    def load_summaries(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict()
+
+    def put_summaries(self, symbol, summaries):
+        # Reload before writing, like the coverage
+        stored = self.get_summaries(symbol)
+        stored.update(summaries)
+        self.dump(stored, self.get_summary_path(symbol), text=True)
+
+    def summary(self, symbol, start_date, end_date):
+        # Monthly summaries of the daily bars joined over the months start_date - end_date touches. exact is True
+        # when all their bars are within the range, otherwise the numbers are those of a wider range. Summaries of
+        # partitions archived before they were kept are made on the fly.
+        summaries = self.get_summaries(symbol)
+        directory = self.get_dir(symbol, 'day', 1)
+        missing = dict()
+        for month in months(start_date, end_date):
+            if month not in summaries and os.path.exists(directory / f'{month}.pickle'):
+                with open(directory / f'{month}.pickle', 'rb') as f:
+                    missing[month] = summarize(pickle.load(f))
+        if missing:
+            self.put_summaries(symbol, missing)
+            summaries.update(missing)
+        parts = [summaries[month] for month in months(start_date, end_date) if summaries.get(month, {}).get('bars')]
+        start, end = str(start_date)[:10], str(end_date)[:10]
+        sub_dollar = [part for part in parts if part['sub_dollar_days']]
+        return {'exact': all(start <= part['first_day'] and part['last_day'] <= end for part in parts),
+                'bars': sum(part['bars'] for part in parts),
+                'last_close': parts[-1]['last_close'] if parts else None,
+                'volume_sum': sum(part['volume_sum'] for part in parts),
+                'close_sum': sum(part['close_sum'] for part in parts),
+                'min_low': min((part['min_low'] for part in parts), default=None),
+                'max_high': max((part['max_high'] for part in parts), default=None),
+                'min_high': min((part['min_high'] for part in parts), default=None),
+                'sub_dollar_days': sum(part['sub_dollar_days'] for part in parts),
+                'first_sub_dollar_day': sub_dollar[0]['first_sub_dollar_day'] if sub_dollar else None,
+                'last_sub_dollar_day': sub_dollar[-1]['last_sub_dollar_day'] if sub_dollar else None}
+
+    def get_splits_path(self, symbol):
+        return self.root / 'splits' / f'{symbol.replace("/", "-")}.json'
+
+    def get_splits(self, symbol):
+        # (date the table was last fetched, [(ex date, ratio)]), None when it never was
+        try:
+            with open(self.get_splits_path(symbol)) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return data['updated'], [tuple(split) for split in data['splits']]
+
+    def put_splits(self, symbol, splits, updated):
+        self.dump({'updated': str(updated), 'splits': [list(split) for split in splits]},
+                  self.get_splits_path(symbol), text=True)
+
+    def version(self, symbol, start_date, end_date, time_frame, multiplier, adjusted=False):
+        # Fingerprint of the partitions (and split table) a read of the range uses, None unless all of it is stored
+        if self.missing(symbol, start_date, end_date, time_frame, multiplier):
+            return None
+        directory = self.get_dir(symbol, time_frame, multiplier)
+        parts = []
+        for path in self.get_partitions(directory, start_date, end_date):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            parts.append(f'{path.stem}:{stat.st_size}-{stat.st_mtime_ns}')
+        if adjusted:
+            splits = self.get_splits(symbol)
+            if splits is None:
+                return None
+            parts.append(json.dumps(splits[1]))
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def size(self, symbol, start_date, end_date, time_frame, multiplier):
+        # Bytes of the partitions holding start_date through end_date
+        directory = self.get_dir(symbol, time_frame, multiplier)
+        size = 0
+        for path in self.get_partitions(directory, start_date, end_date):
+            try:
+                size += os.stat(path).st_size
+            except FileNotFoundError:
+                continue
+        return size
+
+    def sizes(self, time_frame='minute', multiplier=1):
+        # Bytes stored per symbol
+        sizes = dict()
+        directory = self.root / f'{multiplier}{time_frame}'
+        if not os.path.exists(directory):
+            return sizes
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                sizes[entry.name] = sum(part.stat().st_size for part in os.scandir(entry.path)
+                                        if part.name.endswith('.pickle'))
+        return sizes
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+# Integer keys for days and epoch ns arrays for bars, so windows are searchsorted positions on sorted arrays
+# instead of date strings compared over the whole frame
+NS_PER_MINUTE = 60 * 10 ** 9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+EPOCH = date(1970, 1, 1)
+
+
+def day_key(value):
+    # Date (or 'YYYY-MM-DD' string) -> days since epoch, the key of a day in Bars.day
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return (value - EPOCH).days
+
+
+def key_to_date(key):
+    return EPOCH + timedelta(days=int(key))
+
+
+def day_keys(index):
+    # Day key of every timestamp of a DatetimeIndex, by its wall clock date when it's tz-aware
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.asi8 // NS_PER_DAY
+
+
+def day_table(days):
+    # Sorted day keys of consecutive bars -> (keys, position of the first bar of every key plus the end)
+    day_start = np.concatenate([[0], np.flatnonzero(np.diff(days)) + 1, [len(days)]]).astype(np.int64)
+    return days[day_start[:-1]], day_start
+
+
+def window(days, day_start, first_day, last_day=None):
+    # Positions (start, stop) of the bars of every day with first_day <= key <= last_day, open ended without
+    # last_day, given a day table
+    first = np.searchsorted(days, first_day, 'left')
+    last = len(days) if last_day is None else np.searchsorted(days, last_day, 'right')
+    last = max(first, last)
+    return int(day_start[first]), int(day_start[last])
+
+
+def closest(values, price, start=0, stop=None):
+    # Position of the first value closest to price within values[start:stop]
+    return start + int(np.abs(values[start:stop] - price).argmin())
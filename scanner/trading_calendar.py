@@ -0,0 +1,133 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday,
+                                    sunday_to_monday)
+
+from scanner.timeindex import day_key, day_keys, key_to_date
+
+# Wall clock minutes of the day, US/Eastern
+PRE_MARKET_OPEN = 4 * 60
+REGULAR_OPEN = 9 * 60 + 30
+REGULAR_CLOSE = 16 * 60
+EARLY_CLOSE = 13 * 60
+# After hours last as long after an early close as after a regular one
+POST_MARKET_MINUTES = 4 * 60
+
+CALENDAR_START = '2000-01-01'
+
+# Days the exchanges were closed outside the holiday rules
+SPECIAL_CLOSURES = ['2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', '2004-06-11', '2007-01-02',
+                    '2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09']
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    # New Year's Day falling on a Saturday isn't moved to the Friday before
+    rules = [
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def get_early_closes(sessions):
+    # 13:00 closes on July 3rd, the day after Thanksgiving and Christmas Eve, when those are sessions
+    july_3rd = (sessions.month == 7) & (sessions.day == 3)
+    christmas_eve = (sessions.month == 12) & (sessions.day == 24)
+    black_friday = (sessions.month == 11) & (sessions.dayofweek == 4) & (sessions.day >= 23) & (sessions.day <= 29)
+    return july_3rd | christmas_eve | black_friday
+
+
+class TradingCalendar:
+    # NYSE/Nasdaq sessions as sorted day keys (scanner.timeindex) with their session bounds, plus for every
+    # calendar day in range the ordinal of the last session on or before it, so previous and next session
+    # lookups are a single index. Days outside the range fall back to weekdays with regular hours.
+    def __init__(self, start=CALENDAR_START, end=None):
+        end = end or f'{pd.Timestamp.now().year + 1}-12-31'
+        holidays = NYSEHolidayCalendar().holidays(start, end).union(pd.DatetimeIndex(SPECIAL_CLOSURES))
+        sessions = pd.bdate_range(start, end).difference(holidays)
+        self.sessions = day_keys(sessions).astype(np.int32)
+        self.close = np.where(get_early_closes(sessions), EARLY_CLOSE, REGULAR_CLOSE).astype(np.int16)
+        self.first_day = int(self.sessions[0])
+        self.last_day = int(self.sessions[-1])
+        is_session = np.zeros(self.last_day - self.first_day + 1, dtype=bool)
+        is_session[self.sessions - self.first_day] = True
+        self.ordinal = (np.cumsum(is_session) - 1).astype(np.int32)
+        self.is_session_day = is_session
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def in_range(self, day):
+        return self.first_day <= day <= self.last_day
+
+    def is_session(self, day):
+        if not self.in_range(day):
+            return bool(np.is_busday(key_to_date(day)))
+        return bool(self.is_session_day[day - self.first_day])
+
+    def previous_session(self, day):
+        # Key of the last session before the day
+        if not self.in_range(day - 1):
+            return day_key(np.busday_offset(key_to_date(day), -1, roll='forward').item())
+        return int(self.sessions[self.ordinal[day - 1 - self.first_day]])
+
+    def next_session(self, day):
+        # Key of the first session after the day
+        if not self.in_range(day) or day >= self.last_day:
+            return day_key(np.busday_offset(key_to_date(day), 1, roll='backward').item())
+        return int(self.sessions[self.ordinal[day - self.first_day] + 1])
+
+    def sessions_after(self, days, n=1):
+        # Key of the nth session after every day of an array of day keys
+        days = np.asarray(days, dtype=np.int64)
+        result = np.empty(days.shape, dtype=np.int64)
+        ordinal = np.searchsorted(self.sessions, days, 'right') + n - 1
+        inside = (days >= self.first_day) & (ordinal < len(self.sessions))
+        result[inside] = self.sessions[ordinal[inside]]
+        if not inside.all():
+            dates = days[~inside].astype('datetime64[D]')
+            result[~inside] = np.busday_offset(dates, n, roll='backward').astype(np.int64)
+        return result
+
+    def sessions_between(self, first_day, last_day):
+        # Keys of the sessions from first_day through last_day
+        sessions = self.sessions[np.searchsorted(self.sessions, first_day, 'left'):
+                                 np.searchsorted(self.sessions, last_day, 'right')]
+        if first_day < self.first_day or last_day > self.last_day:
+            weekdays = day_keys(pd.bdate_range(key_to_date(first_day), key_to_date(last_day))).astype(np.int32)
+            outside = weekdays[(weekdays < self.first_day) | (weekdays > self.last_day)]
+            sessions = np.sort(np.concatenate([sessions, outside]))
+        return sessions
+
+    def session_minutes(self, days):
+        # (pre market open, open, close, after hours close) wall clock minutes of every day in an array of day
+        # keys, regular hours for days that aren't sessions
+        days = np.asarray(days)
+        close = np.full(days.shape, REGULAR_CLOSE, dtype=np.int16)
+        inside = (days >= self.first_day) & (days <= self.last_day)
+        positions = days[inside] - self.first_day
+        session = self.is_session_day[positions]
+        close_inside = close[inside]
+        close_inside[session] = self.close[self.ordinal[positions[session]]]
+        close[inside] = close_inside
+        return (np.full(days.shape, PRE_MARKET_OPEN), np.full(days.shape, REGULAR_OPEN), close,
+                close + POST_MARKET_MINUTES)
+
+    def session_bounds(self, day):
+        # Same for a single day, as ints
+        return tuple(int(minutes[0]) for minutes in self.session_minutes([day]))
+
+
+@lru_cache(maxsize=None)
+def get_calendar():
+    return TradingCalendar()
@@ -0,0 +1,16 @@
+import hashlib
+
+import pandas as pd
+
+
+def get_params_hash(params: dict) -> str:
+    # Stable hash of a scanner parameter set, independent of key order and of how the sheet stored numbers
+    items = []
+    for key in sorted(params):
+        value = params[key]
+        if isinstance(value, pd.DataFrame):
+            value = int(pd.util.hash_pandas_object(value).sum())
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        items.append(f'{key}={value}')
+    return hashlib.sha1('|'.join(items).encode()).hexdigest()[:12]
@@ -0,0 +1,98 @@
+import argparse
+import multiprocessing
+import threading
+import time as t
+from contextlib import contextmanager
+
+from scanner.clients.polygon import PolygonClient
+from scanner.controller import get_api_key
+from scanner.governor import get_governor, governed_imap
+from scanner.log import init_worker_logging, log_listener
+from scanner.queues.filesystem import HEARTBEAT_INTERVAL, FileQueue
+from scanner.scheduler import run_timed_task
+from scanner.settings import logger
+
+
+@contextmanager
+def heartbeat(queue, interval=HEARTBEAT_INTERVAL):
+    # Marks the worker as running from a thread, so a long task doesn't make the controller think it died
+    stop = threading.Event()
+
+    def beat():
+        while True:
+            queue.heartbeat()
+            if stop.wait(interval):
+                return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        queue.leave()
+
+
+def work(queue, client, processes, poll_interval=5, once=False, memory_budget=None):
+    governor = get_governor(processes, memory_budget)
+    with log_listener(logger) as log_queue, heartbeat(queue):
+        pool = multiprocessing.Pool(processes=processes, initializer=init_worker_logging, initargs=(log_queue,))
+        try:
+            while True:
+                units = queue.claim(limit=processes)
+                if not units:
+                    if once:
+                        break
+                    t.sleep(poll_interval)
+                    continue
+                tasks = []
+                unit_results = dict()
+                for unit_id, unit in units:
+                    unit_results[unit_id] = []
+                    for index, obj, result_cache in unit:
+                        obj.client = client
+                        tasks.append(((unit_id, index), obj, result_cache))
+                logger.debug(f'Claimed {len(units)} work units with {len(tasks)} symbols')
+                remaining = {unit_id: len(unit) for unit_id, unit in units}
+                if governor is None:
+                    results = pool.imap_unordered(run_timed_task, tasks, chunksize=1)
+                else:
+                    results = governed_imap(pool, tasks, governor)
+                for (unit_id, index), res, elapsed, stats in results:
+                    unit_results[unit_id].append((index, res, elapsed, stats))
+                    remaining[unit_id] -= 1
+                    if not remaining[unit_id]:
+                        queue.complete(unit_id, unit_results.pop(unit_id))
+        except BaseException:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+            if governor is not None:
+                logger.debug(governor.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pull scan work units from a shared queue directory and run them')
+    parser.add_argument('queue_dir', help='queue directory shared with the controller')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--poll-interval', type=float, default=5)
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    parser.add_argument('--memory-mb', type=int, default=0,
+                        help='memory budget of all processes, SCANNER_MEMORY_BUDGET_MB or 3/4 of physical memory')
+    args = parser.parse_args(argv)
+
+    api_key = get_api_key()
+    if api_key is None:
+        return
+    client = PolygonClient(api_key=api_key, archive_data=True, use_archived_data=True)
+    logger.debug(f'Worker started on queue {args.queue_dir} with {args.processes} processes')
+    work(FileQueue(args.queue_dir), client, args.processes, poll_interval=args.poll_interval, once=args.once,
+         memory_budget=args.memory_mb * 2 ** 20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import json
+import os
+import time as t
+
+import numpy as np
+import pandas as pd
+
+from scanner.archive import ArchiveManager
+from scanner.settings import TZ
+from scanner.store import BarStore
+from scanner.timeindex import NS_PER_DAY
+
+
+def make_bars(start, end):
+    index = pd.date_range(start, end, freq='15min', tz=TZ)
+    index = index[(index.hour >= 9) & (index.hour < 16)]
+    return pd.DataFrame({'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': np.arange(len(index), dtype=np.float64),
+                         'volume': 100.0}, index=index)
+
+
+def make_store(tmp_path, symbols=('AAA', 'BBB')):
+    store = BarStore(tmp_path)
+    for symbol in symbols:
+        store.write(symbol, make_bars('2023-01-03', '2024-03-28'), '2023-01-01', '2024-03-31', 'minute', 1)
+    return store
+
+
+def partition_names(store, symbol):
+    return sorted(name for name in os.listdir(store.get_dir(symbol, 'minute', 1)) if name.endswith('.pickle'))
+
+
+def set_read_time(store, symbol, days_ago):
+    # Reads of a symbol's partitions some days back, instead of waiting for the clock
+    directory = store.get_dir(symbol, 'minute', 1)
+    accessed = t.time_ns() - int(days_ago * NS_PER_DAY)
+    for name in partition_names(store, symbol):
+        os.utime(directory / name, ns=(accessed, os.stat(directory / name).st_mtime_ns))
+
+
+def test_compaction_keeps_reads_the_same(tmp_path):
+    store = make_store(tmp_path)
+    before = store.read('AAA', '2023-02-10', '2024-02-10', 'minute', 1)
+    manager = ArchiveManager(store, budget=0, max_age=0)
+    # Both years are past ones
+    assert manager.stats()['1minute']['compactable'] == 30
+    assert manager.compact(dry_run=True) == 4
+    assert len(partition_names(store, 'AAA')) == 15
+    assert manager.compact() == 4
+    assert partition_names(store, 'AAA') == ['2023.pickle', '2024.pickle']
+    pd.testing.assert_frame_equal(store.read('AAA', '2023-02-10', '2024-02-10', 'minute', 1), before)
+    assert store.missing('AAA', '2023-01-01', '2024-03-31', 'minute', 1) == []
+    assert manager.verify() == {'ok': 4, 'untracked': 0, 'corrupt': 0, 'missing': 0}
+    assert manager.compact() == 0
+
+
+def test_writes_go_into_a_compacted_year(tmp_path):
+    store = make_store(tmp_path, ['AAA'])
+    ArchiveManager(store).compact()
+    may = make_bars('2023-05-01', '2023-05-31 23:59').assign(close=-1.0)
+    store.write('AAA', may, '2023-05-01', '2023-05-31', 'minute', 1)
+    assert partition_names(store, 'AAA') == ['2023.pickle', '2024.pickle']
+    assert (store.read('AAA', '2023-05-01', '2023-05-31', 'minute', 1)['close'] == -1).all()
+    assert ArchiveManager(store).verify()['corrupt'] == 0
+
+
+def test_eviction_drops_least_recently_read_first(tmp_path):
+    store = make_store(tmp_path)
+    set_read_time(store, 'AAA', 2)
+    set_read_time(store, 'BBB', 3)
+    # BBB read since, only its January
+    store.read('BBB', '2024-01-10', '2024-01-20', 'minute', 1)
+    manager = ArchiveManager(store, budget=0, max_age=0)
+    partitions = manager.get_partitions()
+    manager.budget = sum(partition.bytes for partition in partitions) - 1
+    removed, removed_bytes = manager.evict()
+    assert removed == 1
+    # BBB's months other than January were read longest ago, one of them is enough to fit
+    remaining = partition_names(store, 'BBB')
+    assert len(remaining) == 14 and '2024-01.pickle' in remaining
+    assert len(partition_names(store, 'AAA')) == 15
+    evicted = [partition for partition in partitions if partition.name not in remaining and
+               partition.directory.name == 'BBB']
+    assert removed_bytes == evicted[0].bytes
+    # Its days are fetched again when needed
+    month = evicted[0].name[:-len('.pickle')]
+    assert store.missing('BBB', '2023-01-01', '2024-03-31', 'minute', 1)[0][0].startswith(month)
+
+
+def test_eviction_within_budget(tmp_path):
+    store = make_store(tmp_path)
+    manager = ArchiveManager(store, budget=0, max_age=0)
+    total = sum(partition.bytes for partition in manager.get_partitions())
+    assert manager.evict() == (0, 0)
+    manager.budget = total // 3
+    manager.evict(dry_run=True)
+    assert sum(partition.bytes for partition in manager.get_partitions()) == total
+    manager.evict()
+    assert sum(partition.bytes for partition in manager.get_partitions()) <= total // 3
+
+
+def test_eviction_by_age(tmp_path):
+    store = make_store(tmp_path)
+    set_read_time(store, 'AAA', 10)
+    manager = ArchiveManager(store, budget=0, max_age=7)
+    assert manager.evict()[0] == 15
+    assert partition_names(store, 'AAA') == []
+    assert len(partition_names(store, 'BBB')) == 15
+    assert store.get_coverage('AAA', 'minute', 1) == []
+
+
+def test_verify_and_repair(tmp_path):
+    store = make_store(tmp_path)
+    manager = ArchiveManager(store)
+    directory = store.get_dir('BBB', 'minute', 1)
+    data = bytearray((directory / '2023-06.pickle').read_bytes())
+    data[100] ^= 1
+    (directory / '2023-06.pickle').write_bytes(bytes(data))
+    os.remove(directory / '2023-07.pickle')
+    assert manager.verify() == {'ok': 28, 'untracked': 0, 'corrupt': 1, 'missing': 1}
+    manager.verify(repair=True)
+    assert manager.verify() == {'ok': 28, 'untracked': 0, 'corrupt': 0, 'missing': 0}
+    # Both months are fetched again
+    assert store.missing('BBB', '2023-01-01', '2024-03-31', 'minute', 1) == [('2023-06-01', '2023-07-31')]
+
+
+def test_archives_from_before_the_catalog(tmp_path):
+    store = make_store(tmp_path, ['AAA'])
+    directory = store.get_dir('AAA', 'minute', 1)
+    os.remove(directory / 'catalog.json')
+    with open(directory / 'coverage.json', 'w') as f:
+        json.dump([['2023-01-01', '2024-03-31']], f)
+    assert store.missing('AAA', '2023-01-01', '2024-03-31', 'minute', 1) == []
+    manager = ArchiveManager(store)
+    assert manager.verify(repair=True) == {'ok': 0, 'untracked': 15, 'corrupt': 0, 'missing': 0}
+    # Checksums are recorded and the catalog replaces coverage.json
+    assert not os.path.exists(directory / 'coverage.json')
+    assert manager.verify() == {'ok': 15, 'untracked': 0, 'corrupt': 0, 'missing': 0}
+    assert store.missing('AAA', '2023-01-01', '2024-03-31', 'minute', 1) == []
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scanner.bars import Bars
+from scanner.features import FEATURES, backward_change, backward_sum, compute_feature, forward_change, forward_sum
+from scanner.settings import TZ
+
+CLOSE = np.array([10.0, 10.5, 10.2, 11.0, 0.0, 12.0, 12.5, 11.8, 13.1, 13.0])
+VOLUME = np.array([100, 250, 80, 400, 0, 1200, 300, 90, 5000, 10], dtype=np.int64)
+
+
+@pytest.mark.parametrize('periods', [1, 5, 15])
+def test_forward_change_matches_pandas(periods):
+    expected = (pd.Series(CLOSE).pct_change(periods).shift(-periods) * 100).round(3).to_numpy()
+    np.testing.assert_array_equal(forward_change(CLOSE, periods), expected)
+
+
+@pytest.mark.parametrize('periods', [1, 5, 15])
+def test_forward_sum_matches_pandas(periods):
+    expected = pd.Series(VOLUME).rolling(periods, min_periods=1).sum().shift(-periods).to_numpy()
+    np.testing.assert_array_equal(forward_sum(VOLUME, periods), expected)
+
+
+@pytest.mark.parametrize('periods', [1, 5, 15])
+def test_backward_change_matches_pandas(periods):
+    expected = (pd.Series(CLOSE).pct_change(periods) * 100).round(3).to_numpy()
+    np.testing.assert_array_equal(backward_change(CLOSE, periods), expected)
+
+
+@pytest.mark.parametrize('periods', [1, 5, 15])
+def test_backward_sum_matches_pandas(periods):
+    expected = pd.Series(VOLUME).rolling(periods).sum().shift(1).to_numpy()
+    np.testing.assert_array_equal(backward_sum(VOLUME, periods), expected)
+
+
+def test_change_from_zero_is_inf_not_an_error():
+    assert forward_change(CLOSE, 1)[4] == np.inf
+
+
+def make_bars():
+    index = pd.date_range('2024-01-02 09:30', periods=len(CLOSE), freq='min', tz=TZ)
+    df = pd.DataFrame({'open': CLOSE, 'high': CLOSE, 'low': CLOSE, 'close': CLOSE, 'volume': VOLUME}, index=index)
+    return Bars.from_frame(df)
+
+
+def test_features_are_computed_once_and_shared_by_slices():
+    bars = make_bars()
+    spec = FEATURES['breakout']['price_change_5min']
+    part = bars[1:4]
+    np.testing.assert_array_equal(part.feature(spec), compute_feature(bars, spec)[1:4])
+    # Computed over all bars of the symbol, the end of the slice doesn't cut the horizon short
+    assert part.feature(spec)[-1] == round((CLOSE[8] / CLOSE[3] - 1) * 100, 3)
+    assert list(bars.features) == [spec]
+    assert part.features == {}
+
+
+def test_features_at():
+    bars = make_bars()
+    values = bars.features_at(0, FEATURES['dip_buy'])
+    assert list(values) == list(FEATURES['dip_buy'])
+    assert values['first_5min_volume_after_dip'] == VOLUME[1:6].sum()
+    assert values['price_change_first_5min_after_dip'] == round((CLOSE[5] / CLOSE[0] - 1) * 100, 3)
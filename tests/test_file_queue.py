@@ -0,0 +1,124 @@
+import os
+import threading
+import time as t
+
+import pytest
+
+from scanner.queues.base import QueueTimeout
+from scanner.queues.filesystem import FileQueue
+from scanner.worker import heartbeat
+
+
+class FakeScan:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.client = 'api client'
+
+
+def submit(queue, symbols, unit_size=2):
+    tasks = [(index, FakeScan(symbol), None) for index, symbol in enumerate(symbols)]
+    queue.submit([tasks[i:i + unit_size] for i in range(0, len(tasks), unit_size)])
+
+
+def work_off(queue):
+    # What a worker does with the units it claims, minus the pool
+    while True:
+        units = queue.claim(limit=1)
+        if not units:
+            return
+        for unit_id, unit in units:
+            queue.complete(unit_id, [(index, obj.symbol, 0.0, None) for index, obj, _ in unit])
+
+
+def test_round_trip(tmp_path):
+    queue = FileQueue(tmp_path, poll_interval=0.01)
+    submit(queue, ['AAA', 'BBB', 'CCC'])
+    assert len(os.listdir(queue.pending_dir)) == 2
+    work_off(queue)
+    results = sorted(queue.results())
+    assert [(index, res) for index, res, _, _ in results] == [(0, 'AAA'), (1, 'BBB'), (2, 'CCC')]
+    assert not os.listdir(queue.pending_dir) and not os.listdir(queue.claimed_dir)
+
+
+def test_submitted_units_carry_no_client(tmp_path):
+    queue = FileQueue(tmp_path)
+    submit(queue, ['AAA'])
+    [(_, unit)] = queue.claim()
+    assert unit[0][1].symbol == 'AAA'
+    assert unit[0][1].client is None
+
+
+def test_units_are_claimed_once(tmp_path):
+    queue = FileQueue(tmp_path)
+    submit(queue, ['AAA', 'BBB', 'CCC', 'DDD'], unit_size=1)
+    first = queue.claim(limit=3)
+    second = queue.claim(limit=3)
+    assert len(first) == 3 and len(second) == 1
+    assert not {unit_id for unit_id, _ in first} & {unit_id for unit_id, _ in second}
+
+
+def test_stale_claims_are_requeued(tmp_path):
+    queue = FileQueue(tmp_path, claim_timeout=0)
+    submit(queue, ['AAA'])
+    [(unit_id, _)] = queue.claim()
+    # The worker died with the unit, it goes back to pending once the claim times out
+    t.sleep(0.01)
+    queue.requeue_stale_units({unit_id})
+    assert os.listdir(queue.pending_dir) == [f'{unit_id}.pickle']
+    assert not os.listdir(queue.claimed_dir)
+
+
+def test_close_drops_the_job(tmp_path):
+    queue = FileQueue(tmp_path)
+    submit(queue, ['AAA', 'BBB', 'CCC'])
+    queue.claim()
+    queue.close()
+    assert not os.listdir(queue.pending_dir) and not os.listdir(queue.claimed_dir)
+
+
+def test_timeout_without_workers(tmp_path):
+    queue = FileQueue(tmp_path, poll_interval=0.01, worker_timeout=0.1)
+    submit(queue, ['AAA', 'BBB', 'CCC'])
+    with pytest.raises(QueueTimeout, match='2 work units left'):
+        list(queue.results())
+
+
+def test_timeout_after_the_last_worker_left(tmp_path):
+    queue = FileQueue(tmp_path, poll_interval=0.01, worker_timeout=0.1)
+    submit(queue, ['AAA', 'BBB', 'CCC'])
+    with heartbeat(queue, interval=0.02):
+        results = queue.results()
+        # Worker took one unit and stopped
+        [(unit_id, unit)] = queue.claim()
+        queue.complete(unit_id, [(index, obj.symbol, 0.0, None) for index, obj, _ in unit])
+        assert [res for _, res, _, _ in [next(results), next(results)]] == ['AAA', 'BBB']
+    assert not queue.live_workers()
+    with pytest.raises(QueueTimeout, match='1 work units left'):
+        list(results)
+
+
+def test_heartbeat_keeps_a_slow_run_alive(tmp_path):
+    queue = FileQueue(tmp_path, poll_interval=0.01, worker_timeout=0.1)
+    submit(queue, ['AAA', 'BBB', 'CCC'])
+
+    def slow_worker():
+        with heartbeat(queue, interval=0.02):
+            t.sleep(0.3)
+            work_off(queue)
+
+    thread = threading.Thread(target=slow_worker)
+    thread.start()
+    try:
+        assert len(list(queue.results())) == 3
+    finally:
+        thread.join()
+    assert not os.listdir(queue.workers_dir)
+
+
+def test_no_timeout_when_disabled(tmp_path):
+    queue = FileQueue(tmp_path, poll_interval=0.01, worker_timeout=0)
+    submit(queue, ['AAA'])
+    timer = threading.Timer(0.2, work_off, (queue,))
+    timer.start()
+    assert len(list(queue.results())) == 1
+    timer.join()
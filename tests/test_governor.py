@@ -0,0 +1,89 @@
+from multiprocessing.pool import ThreadPool
+
+import scanner.governor as governor
+from scanner.governor import MemoryGovernor, get_governor, governed_imap
+
+MB = 2 ** 20
+
+
+class FakeScan:
+    profile = None
+    time_frames = ('day', 'minute')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.client = None
+
+    def get_fetch_range(self):
+        return None
+
+    def run(self):
+        return self.symbol
+
+
+def pending(*estimates):
+    return [((i, FakeScan(f'S{i}'), None), estimate * MB) for i, estimate in enumerate(estimates)]
+
+
+def no_rss(monkeypatch):
+    monkeypatch.setattr(governor, 'get_rss', lambda pid=None: None)
+
+
+def test_no_governor_without_rss(monkeypatch):
+    no_rss(monkeypatch)
+    assert get_governor(4, budget=1000 * MB) is None
+
+
+def test_governor_with_rss(monkeypatch):
+    monkeypatch.setattr(governor, 'get_rss', lambda pid=None: 100 * MB)
+    assert get_governor(4, budget=1000 * MB).workers == 4
+
+
+def test_admits_up_to_the_pool_size(monkeypatch):
+    no_rss(monkeypatch)
+    memory_governor = MemoryGovernor(1000 * MB, workers=3)
+    tasks = pending(10, 10, 10, 10)
+    started = 0
+    while tasks and memory_governor.admit(tasks) is not None:
+        _, estimate = tasks.pop(0)
+        memory_governor.start(started, estimate)
+        started += 1
+    assert started == 3
+
+
+def test_defers_to_a_smaller_task(monkeypatch):
+    no_rss(monkeypatch)
+    memory_governor = MemoryGovernor(100 * MB, workers=4)
+    memory_governor.start(0, 60 * MB)
+    assert memory_governor.admit(pending(50, 30)) == 1
+    assert memory_governor.deferred == 1
+    assert memory_governor.admit(pending(50, 45)) is None
+
+
+def test_oversized_task_runs_alone(monkeypatch):
+    no_rss(monkeypatch)
+    memory_governor = MemoryGovernor(100 * MB, workers=4)
+    assert memory_governor.admit(pending(500)) == 0
+    assert memory_governor.alone == 1
+
+
+def test_learns_from_reported_peaks(monkeypatch):
+    no_rss(monkeypatch)
+    memory_governor = MemoryGovernor(1000 * MB, workers=2)
+    memory_governor.idle = 200 * MB
+    memory_governor.start(0, 10 * MB)
+    # (stage, scanner, symbol, count, wall, cpu, peak rss, rss sum), 30 MB above the idle 100 MB of a worker
+    stats = [('task', 'FakeScan', 'S0', 1, 1.0, 1.0, 130 * MB, 130 * MB),
+             ('run_scan', 'FakeScan', 'S0', 1, 1.0, 1.0, 130 * MB, 130 * MB)]
+    memory_governor.finish(0, 10 * MB, stats)
+    assert memory_governor.scale > 1
+    assert not memory_governor.running
+
+
+def test_governed_imap_runs_every_task(monkeypatch):
+    no_rss(monkeypatch)
+    tasks = [(i, FakeScan(f'S{i}'), None) for i in range(6)]
+    with ThreadPool(2) as pool:
+        results = list(governed_imap(pool, tasks, MemoryGovernor(1000 * MB, workers=2)))
+    assert sorted(index for index, *_ in results) == list(range(6))
+    assert {res for _, res, *_ in results} == {f'S{i}' for i in range(6)}
@@ -0,0 +1,60 @@
+import os
+import pickle
+
+import pandas as pd
+
+from scanner.journal import RunJournal
+
+
+def make_journal(tmp_path, params_hash='abc'):
+    return RunJournal(run_id='20240102_093000', scan_name='Gappers', params_hash=params_hash, journal_dir=tmp_path)
+
+
+def test_nothing_done_without_a_journal(tmp_path):
+    assert make_journal(tmp_path).load() == {}
+
+
+def test_resume_from_appended_results(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append('AAA', pd.DataFrame({'symbol': ['AAA'], 'gap': [0.3]}))
+    journal.append('BBB', None)
+    journal.close()
+    done = make_journal(tmp_path).load()
+    assert list(done) == ['AAA', 'BBB']
+    assert done['AAA']['gap'].tolist() == [0.3]
+    assert done['BBB'] is None
+
+
+def test_other_params_start_over(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append('AAA', None)
+    journal.close()
+    assert make_journal(tmp_path, params_hash='def').load() == {}
+
+
+def test_partial_entry_is_truncated(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append('AAA', 1)
+    journal.append('BBB', 2)
+    journal.close()
+    size = os.path.getsize(journal.path)
+    # A crash in the middle of writing the next entry
+    with open(journal.path, 'ab') as f:
+        f.write(pickle.dumps(('CCC', 3))[:-4])
+    resumed = make_journal(tmp_path)
+    assert resumed.load() == {'AAA': 1, 'BBB': 2}
+    assert os.path.getsize(journal.path) == size
+    # Entries written after the cut are read back
+    resumed.append('CCC', 3)
+    resumed.close()
+    assert make_journal(tmp_path).load() == {'AAA': 1, 'BBB': 2, 'CCC': 3}
+
+
+def test_garbage_tail_is_truncated(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append('AAA', 1)
+    journal.close()
+    with open(journal.path, 'ab') as f:
+        f.write(b'\x00\xff garbage')
+    assert make_journal(tmp_path).load() == {'AAA': 1}
+    assert make_journal(tmp_path).load() == {'AAA': 1}
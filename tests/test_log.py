@@ -0,0 +1,37 @@
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from scanner.log import LazyFileHandler
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_folder_created_with_the_first_record(tmp_path):
+    path = tmp_path / 'logs' / 'run.log'
+    handler = LazyFileHandler(path)
+    assert not os.path.exists(path.parent)
+    handler.emit(logging.LogRecord('test', logging.DEBUG, __file__, 1, 'message', None, None))
+    handler.close()
+    assert path.read_text().strip() == 'message'
+
+
+def test_listing_filters_creates_no_folders():
+    # Fresh interpreter, so settings are imported with os.mkdir and os.makedirs watched, and every folder looking
+    # missing whether or not the checkout has one
+    code = """
+import os, sys
+made = []
+os.path.exists = lambda path: False
+os.mkdir = lambda *args, **kwargs: made.append(args[0])
+os.makedirs = lambda *args, **kwargs: made.append(args[0])
+from scanner.cli import main
+main(['list'])
+sys.stderr.write(repr(made))
+"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'multi_day_runners' in result.stdout
+    assert result.stderr == '[]'
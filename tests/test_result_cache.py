@@ -0,0 +1,49 @@
+from scanner.result_cache import ResultCache
+from scanner.scanner import BaseScanner
+
+
+class FakeClient:
+    def __init__(self, versions):
+        self.versions = versions
+
+    def get_data_version(self, symbol, start_date, end_date, time_frame, multiplier, adjusted=False,
+                         outside_normal_session=True):
+        return self.versions.get(time_frame)
+
+
+def get_scan(versions, symbol='AAA'):
+    return BaseScanner(client=FakeClient(versions), symbol=symbol, start_date='2024-01-01', end_date='2024-03-31',
+                       minimum_price=1, maximum_price=100, minimum_average_turnover=0, minimum_average_volume=0)
+
+
+def test_data_version_of_every_time_frame():
+    assert get_scan({'day': 'd1', 'minute': 'm1'}).get_data_version() == 'day:d1|minute:m1'
+
+
+def test_no_data_version_unless_every_time_frame_is_archived():
+    assert get_scan({'day': 'd1', 'minute': None}).get_data_version() is None
+    assert get_scan({'day': None, 'minute': 'm1'}).get_data_version() is None
+
+
+def test_cached_result_while_bars_are_unchanged(tmp_path):
+    cache = ResultCache(params_hash='p1', cache_dir=tmp_path)
+    scan = get_scan({'day': 'd1', 'minute': 'm1'})
+    assert cache.get(scan) == (False, None)
+    cache.put(scan, ['hit'])
+    assert cache.get(scan) == (True, ['hit'])
+    # Other parameters don't share it
+    assert ResultCache(params_hash='p2', cache_dir=tmp_path).get(scan) == (False, None)
+
+
+def test_changed_bars_invalidate_the_result(tmp_path):
+    cache = ResultCache(params_hash='p1', cache_dir=tmp_path)
+    cache.put(get_scan({'day': 'd1', 'minute': 'm1'}), ['hit'])
+    assert cache.get(get_scan({'day': 'd1', 'minute': 'm2'})) == (False, None)
+
+
+def test_bars_from_the_api_are_never_cached(tmp_path):
+    cache = ResultCache(params_hash='p1', cache_dir=tmp_path)
+    scan = get_scan({'day': 'd1', 'minute': None})
+    cache.put(scan, ['hit'])
+    assert cache.get(scan) == (False, None)
+    assert not list(tmp_path.rglob('*.pickle'))
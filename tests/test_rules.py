@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scanner.rules import (DEFINITIONS, RuleScanner, check, evaluate, evaluate_scan, get_day_functions,
+                           rolling_max, rolling_mean, shift, streak)
+
+VALUES = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0])
+
+
+def test_shift():
+    np.testing.assert_array_equal(shift(VALUES, 2), pd.Series(VALUES).shift(2).to_numpy())
+    np.testing.assert_array_equal(shift(VALUES, -3), pd.Series(VALUES).shift(-3).to_numpy())
+    # Integers become floats to hold the NaN, labels get None
+    assert np.isnan(shift(np.arange(3))[0])
+    assert shift(np.array(['upper', 'lower'], dtype=object))[0] is None
+
+
+def test_rolling_matches_pandas():
+    np.testing.assert_array_equal(rolling_max(VALUES, 3), pd.Series(VALUES).rolling(3).max().to_numpy())
+    np.testing.assert_allclose(rolling_mean(VALUES, 4), pd.Series(VALUES).rolling(4).mean().to_numpy())
+    assert np.isnan(rolling_max(VALUES, 20)).all()
+
+
+def test_streak():
+    assert streak(VALUES > 2).tolist() == [1, 0, 1, 0, 1, 2, 0, 1]
+
+
+def test_day_functions():
+    # Two days, of three and five bars
+    day = get_day_functions(np.array([0, 3, 8]))
+    assert day['day_max'](VALUES).tolist() == [4.0] * 3 + [9.0] * 5
+    assert day['day_sum'](VALUES).tolist() == [8.0] * 3 + [23.0] * 5
+    assert day['day_first'](VALUES).tolist() == [3.0] * 3 + [1.0] * 5
+    assert day['day_last'](VALUES).tolist() == [4.0] * 3 + [6.0] * 5
+    assert day['day_cummax'](VALUES).tolist() == [3.0, 3.0, 4.0, 1.0, 5.0, 9.0, 9.0, 9.0]
+
+
+def test_evaluate():
+    namespace = {'close': VALUES, 'period': 2, 'rolling_max': rolling_max}
+    assert evaluate('period * 2', namespace) == 4
+    np.testing.assert_array_equal(evaluate('close > 3', namespace, len(VALUES)), VALUES > 3)
+    # Scalars are spread over all rows
+    assert evaluate(5, namespace, 3).tolist() == [5, 5, 5]
+    # Expressions can't reach builtins
+    with pytest.raises(NameError):
+        evaluate("open('x')", namespace)
+
+
+def test_evaluate_scan_sides_where_and_columns():
+    definition = {'let': {'high_mark': 'threshold + 2'},
+                  'where': 'index >= 1',
+                  'sides': {'upper': 'close > high_mark', 'lower': 'close > threshold'},
+                  'columns': {'price': 'close', 'side': 'side', 'previous': 'shift(close)'}}
+    frame = {'close': VALUES, 'index': np.arange(len(VALUES))}
+    positions, columns = evaluate_scan(definition, {'let': {'threshold': 3}}, frame, {'shift': shift})
+    # The first row is left out by where, the first side listed wins where both hold
+    assert positions.tolist() == [2, 4, 5, 7]
+    assert columns['side'].tolist() == ['lower', 'lower', 'upper', 'upper']
+    assert columns['previous'].tolist() == [1.0, 1.0, 5.0, 2.0]
+
+
+def test_definition_params_are_required():
+    with pytest.raises(TypeError, match='multi_day_runners_period'):
+        RuleScanner(client=None, symbol='AAA', start_date='2023-01-01', end_date='2023-12-31', minimum_price=1,
+                    maximum_price=100, minimum_average_turnover=0, minimum_average_volume=0,
+                    definition='multi_day_runners')
+
+
+@pytest.mark.parametrize('name', list(DEFINITIONS))
+def test_built_in_definitions_match_their_scanners(name):
+    assert check(name) == 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scanner.clients.polygon as polygon
+from scanner.clients.polygon import PolygonClient, get_split_ratio
+from scanner.settings import TZ
+from scanner.store import BarStore, adjust_for_splits
+
+# Results of Polygon's /v2/reference/splits/AAPL
+AAPL_SPLITS = [
+    {'ticker': 'AAPL', 'exDate': '2020-08-31', 'paymentDate': '2020-08-31', 'declaredDate': '2020-07-30',
+     'ratio': 0.25, 'tofactor': 4, 'forfactor': 1},
+    {'ticker': 'AAPL', 'exDate': '2014-06-09', 'paymentDate': '2014-06-09', 'declaredDate': '2014-04-23',
+     'ratio': 0.14285714285714285, 'tofactor': 7, 'forfactor': 1},
+]
+
+
+class FakeRESTClient:
+    def __init__(self, api_key):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def reference_stock_splits(self, symbol):
+        response = type('Response', (), {})()
+        response.results = AAPL_SPLITS
+        return response
+
+
+def test_split_ratio_of_a_forward_split():
+    assert get_split_ratio(AAPL_SPLITS[0]) == 0.25
+    assert get_split_ratio(AAPL_SPLITS[1]) == pytest.approx(1 / 7)
+
+
+def test_split_ratio_from_factors_without_ratio():
+    split = {key: value for key, value in AAPL_SPLITS[0].items() if key != 'ratio'}
+    assert get_split_ratio(split) == 0.25
+
+
+def test_client_splits_from_polygon_payload(tmp_path, monkeypatch):
+    monkeypatch.setattr(polygon, 'RESTClient', FakeRESTClient)
+    client = PolygonClient('key', archive_data=True, use_archived_data=True, store=BarStore(tmp_path))
+    splits = client.get_splits('AAPL')
+    assert splits[0] == ('2020-08-31', 0.25)
+    # Stored and read back as is
+    assert client.store.get_splits('AAPL')[1] == splits
+
+
+def test_adjust_for_aapl_2020_split():
+    index = pd.DatetimeIndex([pd.Timestamp('2020-08-28 10:00', tz=TZ), pd.Timestamp('2020-08-31 10:00', tz=TZ)])
+    df = pd.DataFrame({'open': [500.0, 127.0], 'high': [500.0, 127.0], 'low': [500.0, 127.0],
+                       'close': [500.0, 127.0], 'volume': [100.0, 400.0]}, index=index)
+    adjusted = adjust_for_splits(df, [('2020-08-31', get_split_ratio(AAPL_SPLITS[0]))])
+    assert np.allclose(adjusted['close'], [125.0, 127.0])
+    assert np.allclose(adjusted['volume'], [400.0, 400.0])
+
+
+def test_adjust_for_several_splits():
+    index = pd.DatetimeIndex([pd.Timestamp(day, tz=TZ) for day in ['2014-06-06', '2020-08-28', '2020-08-31']])
+    df = pd.DataFrame({column: [1.0, 1.0, 1.0] for column in ['open', 'high', 'low', 'close', 'volume']},
+                      index=index)
+    adjusted = adjust_for_splits(df, [(split['exDate'], split['ratio']) for split in AAPL_SPLITS])
+    assert np.allclose(adjusted['close'], [0.25 / 7, 0.25, 1.0])
@@ -0,0 +1,118 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from scanner.settings import TZ
+from scanner.store import BarStore, merge_ranges, regular_session, subtract_range
+
+
+def make_bars(start, periods, freq='min', price=10.0):
+    index = pd.date_range(start, periods=periods, freq=freq, tz=TZ)
+    values = np.arange(periods, dtype=np.float64) + price
+    return pd.DataFrame({'open': values, 'high': values + 1, 'low': values - 1, 'close': values,
+                         'volume': np.full(periods, 100.0)}, index=index)
+
+
+def test_bars_are_partitioned_by_month(tmp_path):
+    store = BarStore(tmp_path)
+    df = make_bars('2023-01-30', 5, freq='D')
+    store.write('AAA', df, '2023-01-30', '2023-02-03', 'day', 1)
+    directory = store.get_dir('AAA', 'day', 1)
+    assert sorted(name for name in os.listdir(directory) if name.endswith('.pickle')) == ['2023-01.pickle',
+                                                                                        '2023-02.pickle']
+    assert set(store.get_catalog(directory)['partitions']) == {'2023-01.pickle', '2023-02.pickle'}
+    pd.testing.assert_frame_equal(store.read('AAA', '2023-01-30', '2023-02-03', 'day', 1), df, check_freq=False)
+    # Only the days asked for
+    assert len(store.read('AAA', '2023-01-31', '2023-02-01', 'day', 1)) == 2
+    assert store.read('BBB', '2023-01-30', '2023-02-03', 'day', 1) is None
+
+
+def test_writes_merge_into_partitions(tmp_path):
+    store = BarStore(tmp_path)
+    store.write('AAA', make_bars('2023-03-01', 3, freq='D'), '2023-03-01', '2023-03-03', 'day', 1)
+    # Overlapping bars fetched again replace the stored ones
+    store.write('AAA', make_bars('2023-03-03', 3, freq='D', price=50.0), '2023-03-03', '2023-03-05', 'day', 1)
+    df = store.read('AAA', '2023-03-01', '2023-03-05', 'day', 1)
+    assert df['close'].tolist() == [10.0, 11.0, 50.0, 51.0, 52.0]
+
+
+def test_missing_ranges(tmp_path):
+    store = BarStore(tmp_path)
+    store.write('AAA', make_bars('2023-03-06', 1, freq='D'), '2023-03-06', '2023-03-10', 'day', 1)
+    store.write('AAA', make_bars('2023-03-20', 1, freq='D'), '2023-03-20', '2023-03-24', 'day', 1)
+    assert store.missing('AAA', '2023-03-01', '2023-03-31', 'day', 1) == [
+        ('2023-03-01', '2023-03-05'), ('2023-03-11', '2023-03-19'), ('2023-03-25', '2023-03-31')]
+    assert store.missing('AAA', '2023-03-07', '2023-03-09', 'day', 1) == []
+    # Ranges without any bars, e.g. a week of holidays, still count as fetched
+    store.write('AAA', make_bars('2023-03-11', 0, freq='D'), '2023-03-11', '2023-03-19', 'day', 1)
+    assert store.get_coverage('AAA', 'day', 1) == [(date(2023, 3, 6), date(2023, 3, 24))]
+
+
+def test_today_is_not_covered_before_after_hours_end(tmp_path):
+    store = BarStore(tmp_path)
+    now = pd.Timestamp.now(tz=TZ)
+    today = now.date()
+    store.write('AAA', make_bars(str(today), 1, freq='D'), str(today), str(today), 'day', 1)
+    assert store.missing('AAA', today, today, 'day', 1) == ([] if now.hour >= 20 else [(str(today), str(today))])
+
+
+def test_ranges():
+    ranges = merge_ranges([(date(2023, 1, 10), date(2023, 1, 20)), (date(2023, 1, 1), date(2023, 1, 9)),
+                           (date(2023, 2, 1), date(2023, 2, 5))])
+    assert ranges == [(date(2023, 1, 1), date(2023, 1, 20)), (date(2023, 2, 1), date(2023, 2, 5))]
+    assert subtract_range(ranges, date(2023, 1, 5), date(2023, 2, 2)) == [
+        (date(2023, 1, 1), date(2023, 1, 4)), (date(2023, 2, 3), date(2023, 2, 5))]
+
+
+def test_regular_session_with_early_close():
+    # The day after Thanksgiving closes at 13:00
+    df = pd.concat([make_bars('2023-11-22 04:00', 16 * 60), make_bars('2023-11-24 04:00', 16 * 60)])
+    session = regular_session(df, 'minute')
+    days = session.index.strftime('%Y-%m-%d')
+    first = session[days == '2023-11-22']
+    assert first.index[0].strftime('%H:%M') == '09:30' and first.index[-1].strftime('%H:%M') == '15:59'
+    early = session[days == '2023-11-24']
+    assert early.index[0].strftime('%H:%M') == '09:30' and early.index[-1].strftime('%H:%M') == '12:59'
+    # Daily bars are left alone
+    daily = make_bars('2023-11-22', 3, freq='D')
+    assert regular_session(daily, 'day') is daily
+
+
+def test_daily_summaries(tmp_path):
+    store = BarStore(tmp_path)
+    df = make_bars('2023-01-30', 5, freq='D', price=0.5)
+    store.write('AAA', df, '2023-01-30', '2023-02-03', 'day', 1)
+    summary = store.summary('AAA', '2023-01-01', '2023-02-28')
+    assert summary['exact'] is True
+    assert summary['bars'] == 5
+    assert summary['last_close'] == 4.5
+    assert summary['volume_sum'] == 500
+    assert summary['sub_dollar_days'] == 0 and summary['min_low'] == -0.5
+    # Numbers of whole months, the range cuts into both
+    assert store.summary('AAA', '2023-01-31', '2023-02-02')['exact'] is False
+
+
+def test_version_follows_stored_data(tmp_path):
+    store = BarStore(tmp_path)
+    assert store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1) is None
+    store.write('AAA', make_bars('2023-03-01', 3, freq='D'), '2023-03-01', '2023-03-03', 'day', 1)
+    version = store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1)
+    assert version is not None
+    assert store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1) == version
+    # Partly covered ranges have none
+    assert store.version('AAA', '2023-03-01', '2023-03-04', 'day', 1) is None
+    store.write('AAA', make_bars('2023-03-03', 1, freq='D', price=50.0), '2023-03-03', '2023-03-03', 'day', 1)
+    assert store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1) != version
+
+
+def test_adjusted_version_needs_splits(tmp_path):
+    store = BarStore(tmp_path)
+    store.write('AAA', make_bars('2023-03-01', 3, freq='D'), '2023-03-01', '2023-03-03', 'day', 1)
+    assert store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1, adjusted=True) is None
+    store.put_splits('AAA', [], '2023-03-04')
+    version = store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1, adjusted=True)
+    assert version is not None
+    store.put_splits('AAA', [('2023-03-02', 0.5)], '2023-03-05')
+    assert store.version('AAA', '2023-03-01', '2023-03-03', 'day', 1, adjusted=True) != version
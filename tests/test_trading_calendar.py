@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from scanner.timeindex import day_key, key_to_date
+from scanner.trading_calendar import EARLY_CLOSE, REGULAR_CLOSE, TradingCalendar, get_calendar
+
+HOLIDAYS_2023 = ['2023-01-02', '2023-01-16', '2023-02-20', '2023-04-07', '2023-05-29', '2023-06-19', '2023-07-04',
+                 '2023-09-04', '2023-11-23', '2023-12-25']
+
+
+def keys(*days):
+    return [day_key(day) for day in days]
+
+
+def dates(day_keys):
+    return [str(key_to_date(key)) for key in day_keys]
+
+
+def test_holidays_are_not_sessions():
+    calendar = get_calendar()
+    for day in HOLIDAYS_2023:
+        assert not calendar.is_session(day_key(day)), day
+    assert calendar.is_session(day_key('2023-07-03'))
+    # Weekends and days the exchanges closed outside the rules
+    assert not calendar.is_session(day_key('2023-07-01'))
+    assert not calendar.is_session(day_key('2012-10-29'))
+    assert not calendar.is_session(day_key('2025-01-09'))
+
+
+def test_sessions_of_a_year():
+    assert len(get_calendar().sessions_between(day_key('2023-01-01'), day_key('2023-12-31'))) == 250
+    # New Year's Day on a Saturday isn't observed on the Friday before
+    assert get_calendar().is_session(day_key('2021-12-31'))
+    assert len(get_calendar().sessions_between(day_key('2022-01-01'), day_key('2022-12-31'))) == 251
+
+
+@pytest.mark.parametrize('day, close', [('2023-07-03', EARLY_CLOSE), ('2023-11-24', EARLY_CLOSE),
+                                        ('2024-12-24', EARLY_CLOSE), ('2023-11-22', REGULAR_CLOSE),
+                                        ('2023-07-05', REGULAR_CLOSE), ('2023-07-01', REGULAR_CLOSE)])
+def test_early_closes(day, close):
+    _, regular_open, regular_close, post_market_close = get_calendar().session_bounds(day_key(day))
+    assert regular_open == 9 * 60 + 30
+    assert regular_close == close
+    assert post_market_close == close + 4 * 60
+
+
+def test_previous_and_next_session():
+    calendar = get_calendar()
+    # Over the Thanksgiving holiday and a weekend
+    assert dates([calendar.previous_session(day_key('2023-11-24'))]) == ['2023-11-22']
+    assert dates([calendar.next_session(day_key('2023-11-22'))]) == ['2023-11-24']
+    assert dates([calendar.previous_session(day_key('2023-11-27'))]) == ['2023-11-24']
+    assert dates([calendar.next_session(day_key('2023-11-25'))]) == ['2023-11-27']
+    # Days that aren't sessions themselves
+    assert dates([calendar.previous_session(day_key('2023-11-23'))]) == ['2023-11-22']
+
+
+def test_sessions_after():
+    calendar = get_calendar()
+    days = keys('2023-11-21', '2023-11-22', '2023-11-25')
+    assert dates(calendar.sessions_after(days)) == ['2023-11-22', '2023-11-24', '2023-11-27']
+    assert dates(calendar.sessions_after(days, n=2)) == ['2023-11-24', '2023-11-27', '2023-11-28']
+    assert dates(calendar.sessions_after(keys('2023-11-21'), n=3)) == ['2023-11-27']
+
+
+def test_sessions_between():
+    sessions = get_calendar().sessions_between(day_key('2023-11-20'), day_key('2023-11-28'))
+    assert dates(sessions) == ['2023-11-20', '2023-11-21', '2023-11-22', '2023-11-24', '2023-11-27', '2023-11-28']
+
+
+def test_weekdays_outside_the_range():
+    calendar = TradingCalendar(start='2023-01-01', end='2023-12-31')
+    # Regular weekdays before and after the holidays it knows
+    assert calendar.is_session(day_key('2024-01-01'))
+    assert not calendar.is_session(day_key('2024-01-06'))
+    assert dates([calendar.next_session(day_key('2023-12-29'))]) == ['2024-01-01']
+    # The observed New Year's Day is before the first session it knows
+    assert dates([calendar.previous_session(day_key('2023-01-03'))]) == ['2023-01-02']
+    assert dates(calendar.sessions_after(keys('2023-12-29', '2024-01-05'))) == ['2024-01-01', '2024-01-08']
+    sessions = calendar.sessions_between(day_key('2023-12-28'), day_key('2024-01-02'))
+    assert dates(sessions) == ['2023-12-28', '2023-12-29', '2024-01-01', '2024-01-02']
+    np.testing.assert_array_equal(calendar.session_minutes(keys('2024-07-03'))[2], [REGULAR_CLOSE])